@@ -0,0 +1,114 @@
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+from airflow.sdk import dag, task, Param
+
+
+#---- Pipeline code (mounted by docker-compose, see PIPELINE_PROJECTS_DIR)
+PROJECTS_DIR = os.environ.get("PIPELINE_PROJECTS_DIR", "/opt/airflow/projects")
+
+#-- Pools are created by airflow-init (docker-compose.yaml); per task rate / concurrency x pool slots = global bound
+LISTING_POOL = "listing_pool"
+BROWSER_POOL = "browser_pool"
+TRANSLATION_POOL = "translation_pool"
+LISTING_CONCURRENCY_PER_TASK = 4
+TRANSLATION_RATE_PER_TASK = 2.5
+
+
+def pipeline_tasks():
+    """Imported inside the tasks so DAG parsing never pulls in playwright / transformers"""
+    orchestration_dir = os.path.join(PROJECTS_DIR, "orchestration")
+    if orchestration_dir not in sys.path:
+        sys.path.append(orchestration_dir)
+    import pipeline_tasks
+    return pipeline_tasks
+
+
+@dag(
+    dag_id="news_sentiment_pipeline",
+    #-- 17:30 Asia/Ho_Chi_Minh, after the close
+    schedule="30 10 * * *",
+    start_date=datetime(2026, 1, 1),
+    catchup=False,
+    max_active_runs=1,
+    default_args={"retries": 2, "retry_delay": timedelta(minutes=5)},
+    params={
+        "max_pages": Param(50, type="integer", minimum=1, description="listing pages to scan (1001 for a full backfill)"),
+        "shard_size": Param(10, type="integer", minimum=1),
+        "batch_size": Param(100, type="integer", minimum=1, description="articles per content crawl task"),
+        "rows_per_batch": Param(500, type="integer", minimum=1, description="relevant rows per translation task"),
+        "max_sentences": Param(5, type="integer", minimum=1),
+        "watchlist_path": Param(None, type=["null", "string"], description="defaults to projects/data/watchlist.json"),
+    },
+    tags=["news", "sentiment"],
+)
+def news_sentiment_pipeline():
+    """vn.investing.com news -> contents -> watchlist sentences -> translation -> FinBERT -> daily features (runs after the 15:00 VN close)"""
+    
+    #-- One tag per DAG run, so a retried or cleared run reuses its listing files and data/runs/<tag> outputs
+    @task
+    def make_run_tag(logical_date=None, run_id=None):
+        if logical_date is not None:
+            return logical_date.strftime("%Y%m%d%H%M%S")
+        #-- Manually triggered runs can have no logical date; run ids carry ':' and '+'
+        return re.sub(r"[^0-9A-Za-z]+", "_", run_id).strip("_")
+    
+    @task
+    def plan_listing_shards(run_tag, params=None):
+        return pipeline_tasks().plan_listing_shards(run_tag, max_pages=params["max_pages"], shard_size=params["shard_size"])
+    
+    #-- Each shard has its own AdaptiveLimit, the pool keeps their sum at the per host limit
+    @task(pool=LISTING_POOL)
+    def crawl_listing_shard(run_tag, start, end):
+        return pipeline_tasks().crawl_listing_shard(run_tag, start, end, max_concurrency=LISTING_CONCURRENCY_PER_TASK)
+    
+    @task
+    def plan_article_batches(listing_manifests, params=None):
+        return pipeline_tasks().plan_article_batches(list(listing_manifests), batch_size=params["batch_size"])
+    
+    @task(pool=BROWSER_POOL, execution_timeout=timedelta(hours=2))
+    def crawl_article_batch(file_ids, num_items):
+        return pipeline_tasks().crawl_article_batch(file_ids, num_items=num_items)
+    
+    #-- A failed article batch should not hold back the articles that did arrive (everything downstream is incremental)
+    @task(trigger_rule="all_done")
+    def select_relevant_sentences(run_tag, article_manifests, params=None):
+        tasks = pipeline_tasks()
+        return tasks.select_relevant_sentences(
+            run_tag,
+            watchlist_path=params["watchlist_path"] or tasks.WATCHLIST_PATH,
+            max_sentences=params["max_sentences"],
+            rows_per_batch=params["rows_per_batch"],
+        )
+    
+    @task
+    def plan_translation_batches(relevant_manifest):
+        return relevant_manifest["batches"]
+    
+    @task(pool=TRANSLATION_POOL, execution_timeout=timedelta(hours=3))
+    def translate_batch(path, start, end):
+        return pipeline_tasks().translate_batch(path, start, end, rate=TRANSLATION_RATE_PER_TASK)
+    
+    @task
+    def fetch_price_history():
+        return pipeline_tasks().fetch_price_history()
+    
+    @task(trigger_rule="all_done")
+    def score_sentiment(relevant_manifest, translation_manifests):
+        return pipeline_tasks().score_sentiment(relevant_manifest["path"])
+    
+    @task
+    def write_daily_features(sentiment_manifest, price_manifest):
+        return pipeline_tasks().write_daily_features(realign=True)
+    
+    run_tag = make_run_tag()
+    listing_manifests = crawl_listing_shard.expand_kwargs(plan_listing_shards(run_tag))
+    article_manifests = crawl_article_batch.expand_kwargs(plan_article_batches(listing_manifests))
+    relevant_manifest = select_relevant_sentences(run_tag, article_manifests)
+    translation_manifests = translate_batch.expand_kwargs(plan_translation_batches(relevant_manifest))
+    sentiment_manifest = score_sentiment(relevant_manifest, translation_manifests)
+    write_daily_features(sentiment_manifest, fetch_price_history())
+
+
+news_sentiment_pipeline()
@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import time
+import joblib
+import argparse
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score
+
+TRAINING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(TRAINING_DIR, "preprocessing"))
+from text_cleaning import preprocess_series
+
+
+#---- Default locations
+SAVE_DIR = os.path.join(TRAINING_DIR, "save")
+DATA_DIR = os.path.join(TRAINING_DIR, "data")
+MODEL_PATH = os.path.join(SAVE_DIR, "random_forest_model.pkl")
+TFIDF_PATH = os.path.join(SAVE_DIR, "tfidf.pkl")
+LINEAR_DIR = os.path.join(SAVE_DIR, "distilled_linear")
+
+
+#---- Array helpers
+def save_arrays(directory, arrays, meta):
+    """One .npy per array so each can be memory mapped on load"""
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as file:
+        json.dump(meta, file, indent=3)
+
+
+def load_arrays(directory, names, mmap_mode="r"):
+    arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in names}
+    with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as file:
+        meta = json.load(file)
+    return arrays, meta
+
+
+#---- Distilled linear model
+class LinearModel():
+    """Multinomial logistic regression over the same TF-IDF features: one sparse matmul per batch"""
+    def __init__(self, coef, intercept, classes):
+        self.coef = coef
+        self.intercept = intercept
+        self.classes = classes
+    
+    @classmethod
+    def distill(cls, teacher, X, C=10.0, max_iter=1000):
+        """Fit on the teacher's labels, so unlabeled corpus text can be used as transfer data"""
+        teacher_labels = teacher.predict(X)
+        student = LogisticRegression(C=C, max_iter=max_iter)
+        student.fit(X, teacher_labels)
+        return cls(student.coef_.astype(np.float32), student.intercept_.astype(np.float32), student.classes_)
+    
+    def save(self, directory=LINEAR_DIR):
+        save_arrays(directory, {"coef": self.coef, "intercept": self.intercept, "classes": self.classes}, meta={"n_features": int(self.coef.shape[1])})
+    
+    @classmethod
+    def load(cls, directory=LINEAR_DIR, mmap_mode="r"):
+        arrays, _ = load_arrays(directory, ["coef", "intercept", "classes"], mmap_mode=mmap_mode)
+        return cls(arrays["coef"], arrays["intercept"], arrays["classes"])
+    
+    def decision_function(self, X):
+        return np.asarray(sp.csr_matrix(X) @ np.asarray(self.coef).T) + self.intercept
+    
+    def predict(self, X):
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            return np.asarray(self.classes)[(scores[:, 0] > 0).astype(int)]
+        return np.asarray(self.classes)[scores.argmax(axis=1)]
+
+
+#---- Report
+def timed(function, *args):
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+
+def load_split(name, data_dir=DATA_DIR):
+    df = pd.read_csv(os.path.join(data_dir, f"{name}.csv"))
+    return df["title"].astype(str).tolist(), df["label"].to_numpy()
+
+
+def evaluate(model, vectorizer, linear, texts, labels):
+    """Accuracy / agreement with the forest / throughput of each inference path on the same features"""
+    X = vectorizer.transform(texts)
+    forest_pred = model.predict(X)
+    report = {}
+    for name, predict in [("random_forest", model.predict), ("distilled_linear", linear.predict)]:
+        pred, seconds = timed(predict, X)
+        report[name] = {
+            "accuracy": round(float(accuracy_score(labels, pred)), 4),
+            "agreement_with_forest": round(float((pred == forest_pred).mean()), 4),
+            "seconds": round(seconds, 4),
+            "rows_per_second": round(len(texts) / seconds, 1) if seconds > 0 else None,
+        }
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Distill the TF-IDF + RandomForest baseline into a linear model and report the tradeoff on test.csv")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--tfidf-path", default=TFIDF_PATH)
+    parser.add_argument("--linear-dir", default=LINEAR_DIR)
+    parser.add_argument("--transfer-path", default=None, help="extra unlabeled texts (csv with a title column) for distillation")
+    return parser.parse_args()
+
+
+if __name__=="__main__":
+    args = parse_args()
+    model = joblib.load(args.model_path)
+    vectorizer = joblib.load(args.tfidf_path)
+    
+    #-- Distill, then reload memory mapped as a serving process would
+    train_texts, _ = load_split("train")
+    if args.transfer_path is not None:
+        transfer_df = pd.read_csv(args.transfer_path)
+        train_texts = train_texts + preprocess_series(transfer_df["title"].astype(str)).tolist()
+    LinearModel.distill(model, vectorizer.transform(train_texts)).save(args.linear_dir)
+    _, forest_load_seconds = timed(joblib.load, args.model_path)
+    linear, linear_load_seconds = timed(LinearModel.load, args.linear_dir)
+    
+    test_texts, test_labels = load_split("test")
+    report = evaluate(model, vectorizer, linear, test_texts, test_labels)
+    report["random_forest"]["load_seconds"] = round(forest_load_seconds, 4)
+    report["distilled_linear"]["load_seconds"] = round(linear_load_seconds, 4)
+    print(json.dumps(report, indent=3))
@@ -0,0 +1,229 @@
+import os
+import re
+import sys
+import glob
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+
+#---- Defaults of data_cleaning.ipynb
+DEFAULT_METHODS = ['rmv_link', 'rmv_punc', 'lower', 'rmv_space']
+DEFAULT_PUNCTUATION = '!"#$%&\'()*+,.-:;<=>?@[\\]^_/`{|}~”“'
+PREPROCESSING_PUNCTUATION = "#$}{!)(?|-#$%&<=>?@[\\]^_/`{|}~”“"
+LINK_PATTERN = 'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
+
+#-- Python's \s and str.strip() use the unicode whitespace set; spelled out so the
+#-- Arrow (RE2) regex engine behind pandas string columns matches exactly the same characters
+WHITESPACE = "".join(chr(code) for code in range(sys.maxunicode + 1) if chr(code).isspace())
+NON_TEXT_PATTERN = "[^a-zA-Z0-9" + WHITESPACE + "\\.,!?\\-\\%\\$€£]"
+EDGE_SPACE_PATTERN = "^[" + WHITESPACE + "]+|[" + WHITESPACE + "]+$"
+
+#---- Precompiled patterns
+LINK_REGEX = re.compile(LINK_PATTERN)
+SPACE_REGEX = re.compile(' +')
+NON_TEXT_REGEX = re.compile(NON_TEXT_PATTERN)
+
+
+@lru_cache(maxsize=None)
+def punctuation_pattern(custom_punctuation):
+    return '[%s]' % re.escape(custom_punctuation)
+
+
+@lru_cache(maxsize=None)
+def punctuation_regex(custom_punctuation):
+    return re.compile(punctuation_pattern(custom_punctuation))
+
+
+#---- Single string (same results as data_cleaning.ipynb)
+def clean_text(
+        text,
+        methods=DEFAULT_METHODS,
+        custom_punctuation=DEFAULT_PUNCTUATION,
+    ):
+    cleaned_text = text
+    for method in methods:
+        if method == 'rmv_link':
+            cleaned_text = LINK_REGEX.sub('', cleaned_text)
+        elif method == 'rmv_punc':
+            cleaned_text = punctuation_regex(custom_punctuation).sub('', cleaned_text)
+        elif method == 'lower':
+            cleaned_text = cleaned_text.lower()
+        elif method == 'rmv_space':
+            cleaned_text = SPACE_REGEX.sub(' ', cleaned_text)
+            cleaned_text = cleaned_text.strip()
+    return cleaned_text
+
+
+def preprocessing_text(text):
+    text = text.replace("'s", "")
+    text = NON_TEXT_REGEX.sub(' ', text)
+    text = clean_text(
+        text=text,
+        custom_punctuation=PREPROCESSING_PUNCTUATION
+    )
+    return text
+
+
+#---- Whole columns
+def as_string_series(texts):
+    """Series / Arrow array / list -> Arrow backed string Series, so .str ops run vectorized"""
+    if not isinstance(texts, pd.Series):
+        texts = pd.Series(texts.to_pylist() if hasattr(texts, "to_pylist") else list(texts))
+    return texts.astype("string[pyarrow]")
+
+
+def restore_dtype(cleaned, texts):
+    if isinstance(texts, pd.Series) and texts.dtype == object:
+        return cleaned.astype(object).where(cleaned.notna(), texts)
+    return cleaned
+
+
+def lower_series(cleaned):
+    """Arrow lowercases ASCII like str.lower(); the few non ASCII rows go through str.lower() itself"""
+    lowered = cleaned.str.lower()
+    non_ascii = cleaned.str.contains("[^\\x00-\\x7f]", regex=True).fillna(False).astype(bool)
+    if non_ascii.any():
+        lowered = lowered.where(~non_ascii, cleaned[non_ascii].map(str.lower, na_action="ignore"))
+    return lowered
+
+
+def clean_series(
+        texts,
+        methods=DEFAULT_METHODS,
+        custom_punctuation=DEFAULT_PUNCTUATION,
+    ):
+    """clean_text over a whole column, one vectorized pass per method"""
+    cleaned = as_string_series(texts)
+    for method in methods:
+        if method == 'rmv_link':
+            cleaned = cleaned.str.replace(LINK_PATTERN, '', regex=True)
+        elif method == 'rmv_punc':
+            cleaned = cleaned.str.replace(punctuation_pattern(custom_punctuation), '', regex=True)
+        elif method == 'lower':
+            cleaned = lower_series(cleaned)
+        elif method == 'rmv_space':
+            cleaned = cleaned.str.replace(' +', ' ', regex=True)
+            cleaned = cleaned.str.replace(EDGE_SPACE_PATTERN, '', regex=True)
+    return restore_dtype(cleaned, texts)
+
+
+def preprocess_series(texts):
+    """preprocessing_text over a whole column"""
+    cleaned = as_string_series(texts)
+    cleaned = cleaned.str.replace("'s", "", regex=False)
+    cleaned = cleaned.str.replace(NON_TEXT_PATTERN, ' ', regex=True)
+    cleaned = clean_series(cleaned, custom_punctuation=PREPROCESSING_PUNCTUATION)
+    return restore_dtype(cleaned, texts)
+
+
+#---- Large corpora
+def preprocess_chunk(texts):
+    return preprocess_series(pd.Series(texts, dtype=object)).tolist()
+
+
+def preprocess_corpus(texts, num_workers=None, chunk_size=100000):
+    """preprocess_series split over worker processes; order is kept"""
+    texts = texts if isinstance(texts, pd.Series) else pd.Series(list(texts), dtype=object)
+    if len(texts) <= chunk_size:
+        return preprocess_series(texts)
+    chunks = [texts.iloc[start: start + chunk_size].tolist() for start in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        results = list(executor.map(preprocess_chunk, chunks))
+    cleaned = pd.Series([text for chunk in results for text in chunk], index=texts.index, dtype=object)
+    return cleaned if texts.dtype == object else cleaned.astype(texts.dtype)
+
+
+#---- Parity with the notebook
+def reference_clean_text(
+        text,
+        methods=['rmv_link', 'rmv_punc', 'lower', 'rmv_space'],
+        custom_punctuation = '!"#$%&\'()*+,.-:;<=>?@[\\]^_/`{|}~”“',
+    ):
+    """Verbatim copy of data_cleaning.ipynb, only used by check_parity"""
+    cleaned_text = text
+    for method in methods:
+        if method == 'rmv_link':
+            # Remove link
+            cleaned_text = re.sub('http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', cleaned_text)
+            cleaned_text = "".join(cleaned_text)
+        elif method == 'rmv_punc':
+            # Remove punctuation
+            cleaned_text = re.sub('[%s]' % re.escape(custom_punctuation), '' , cleaned_text)
+        elif method == 'lower':
+            # Lowercase
+            cleaned_text = cleaned_text.lower()
+        elif method == 'rmv_space':
+            # Remove extra space
+            cleaned_text = re.sub(' +', ' ', cleaned_text)
+            cleaned_text = cleaned_text.strip()
+    return cleaned_text
+
+
+def reference_preprocessing_text(text):
+    text = text.replace("'s", "")
+    text = re.sub(r'[^a-zA-Z0-9\s\.,!?\-\%\$€£]', ' ', text)
+    text = reference_clean_text(
+        text=text,
+        custom_punctuation="#$}{!)(?|-#$%&<=>?@[\\]^_/`{|}~”“"
+    )
+    return text
+
+
+def check_parity(texts):
+    """Texts where the scalar, column or multiprocess paths differ from the notebook"""
+    texts = [text for text in texts if isinstance(text, str)]
+    expected = [reference_preprocessing_text(text) for text in texts]
+    outputs = {
+        "preprocessing_text": [preprocessing_text(text) for text in texts],
+        "preprocess_series": preprocess_series(pd.Series(texts, dtype=object)).tolist(),
+        "preprocess_corpus": preprocess_corpus(texts, chunk_size=max(1, len(texts) // 4)).tolist(),
+        "clean_series": clean_series(pd.Series(texts, dtype=object)).tolist(),
+    }
+    expected_clean = [reference_clean_text(text) for text in texts]
+    mismatches = {}
+    for name, output in outputs.items():
+        reference = expected_clean if name == "clean_series" else expected
+        mismatches[name] = [(text, want, got) for text, want, got in zip(texts, reference, output) if want != got]
+    return mismatches
+
+
+def load_translated_sentences(translation_dir):
+    sentences = []
+    for path in glob.glob(os.path.join(translation_dir, "*.npy")):
+        translation_dict = np.load(path, allow_pickle=True).item()
+        sentences.extend(value for value in translation_dict.values() if isinstance(value, str))
+    return sentences
+
+
+if __name__=="__main__":
+    root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description="Check the column / multiprocess cleaning against data_cleaning.ipynb")
+    parser.add_argument("--data-path", default=os.path.join(root_dir, "project_2_training", "data", "all-data.csv"))
+    parser.add_argument("--translation-dir", default=os.path.join(root_dir, "projects", "data", "save_translation"))
+    args = parser.parse_args()
+    
+    df = pd.read_csv(args.data_path, encoding="ISO-8859-1", header=None)
+    texts = df[1].tolist()
+    if os.path.isdir(args.translation_dir):
+        texts.extend(load_translated_sentences(args.translation_dir))
+    
+    failed = False
+    for name, mismatches in check_parity(texts).items():
+        print(f"{name}: {len(mismatches)} mismatches / {len(texts)}")
+        for text, want, got in mismatches[:3]:
+            print(f"   {text!r}\n   expected {want!r}\n   got      {got!r}")
+        failed = failed or bool(mismatches)
+    
+    series = pd.Series(texts, dtype=object)
+    start_time = time.perf_counter()
+    series.apply(reference_preprocessing_text)
+    apply_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    preprocess_series(series)
+    series_seconds = time.perf_counter() - start_time
+    print(f"apply: {apply_seconds:.2f}s, preprocess_series: {series_seconds:.2f}s ({apply_seconds / series_seconds:.1f}x)")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,243 @@
+import os
+import sys
+import json
+import time
+import joblib
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingRandomSearchCV, RandomizedSearchCV
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.metrics import accuracy_score
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+#---- Default locations
+TRAINING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(TRAINING_DIR, "data")
+SAVE_DIR = os.path.join(TRAINING_DIR, "save")
+CACHE_DIR = os.path.join(TRAINING_DIR, "save", "pipeline_cache")
+PROFILE_LOG_PATH = os.path.join(TRAINING_DIR, "save", "search_profile.jsonl")
+
+#-- Read by the search workers, which are separate processes
+PROFILE_LOG_ENV = "TRAIN_SEARCH_PROFILE_LOG"
+MEMORY_BUDGET_ENV = "TRAIN_SEARCH_MEMORY_BUDGET_MB"
+
+PARAM_DISTRIBUTIONS = {
+    'tfidf__ngram_range': [(1, 1), (1, 2)],
+    'tfidf__min_df': [1, 2],
+    'rf__n_estimators': [100, 200],
+    'rf__max_depth': [None, 10, 20, 30, 40, 50],
+    'rf__min_samples_split': [2, 5],
+    'rf__max_features': ["sqrt", "log2"],
+    'rf__min_samples_leaf': [1, 2],
+    'rf__bootstrap': [True, False],
+}
+
+
+#---- Memory measurement
+def current_rss():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class PeakRSS():
+    """
+    Peak resident memory of the process while the block runs, sampled by a thread (C / Cython buffers included,
+    nothing traced). It is the whole worker's RSS: what a candidate needs on top of what the worker already holds.
+    """
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak_rss = None
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    def sample(self):
+        while not self.stop_event.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss())
+    
+    def __enter__(self):
+        self.peak_rss = current_rss()
+        if self.peak_rss is not None:
+            self.thread = threading.Thread(target=self.sample, daemon=True)
+            self.thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.peak_rss = max(self.peak_rss, current_rss())
+        return False
+
+
+class MemoryBudgetExceeded(Exception):
+    pass
+
+
+#---- Profiled pipeline
+class ProfiledPipeline(Pipeline):
+    """
+    Pipeline that appends wall time and peak RSS of every fit (one CV candidate / split) to a JSONL log.
+    A fit whose peak goes over the budget raises MemoryBudgetExceeded: the search scores it error_score (NaN)
+    and the candidate is dropped.
+    """
+    def fit(self, X, y=None, **params):
+        with PeakRSS() as memory:
+            start_time = time.perf_counter()
+            super().fit(X, y, **params)
+            fit_seconds = time.perf_counter() - start_time
+        peak_memory_mb = memory.peak_rss / 2**20 if memory.peak_rss is not None else None
+        budget_mb = float(os.environ.get(MEMORY_BUDGET_ENV) or 0)
+        over_budget = bool(budget_mb and peak_memory_mb is not None and peak_memory_mb > budget_mb)
+        log_path = os.environ.get(PROFILE_LOG_ENV)
+        if log_path:
+            pipeline_params = self.get_params()
+            record = {
+                "params": {key: pipeline_params[key] for key in PARAM_DISTRIBUTIONS},
+                "n_samples": len(X),
+                "fit_seconds": round(fit_seconds, 3),
+                "peak_memory_mb": round(peak_memory_mb, 1) if peak_memory_mb is not None else None,
+                "over_budget": over_budget,
+                "pid": os.getpid(),
+            }
+            with open(log_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record, default=str) + "\n")
+        if over_budget:
+            raise MemoryBudgetExceeded(f"fit peaked at {peak_memory_mb:.0f} MB, budget {budget_mb:.0f} MB")
+        return self
+
+
+def build_pipeline(cache_dir=CACHE_DIR):
+    """TF-IDF is fit inside each CV split; fitted vectorizers are cached and reused by candidates sharing its params"""
+    memory = joblib.Memory(cache_dir, verbose=0) if cache_dir else None
+    return ProfiledPipeline(
+        [
+            ("tfidf", TfidfVectorizer()),
+            ("rf", RandomForestClassifier(n_jobs=1)),
+        ],
+        memory=memory,
+    )
+
+
+def build_search(pipeline, search="halving", n_candidates=48, factor=3, cv=5, n_jobs=-1, random_state=42):
+    """
+    Candidates in parallel over all cores; halving drops the weak ones after fits on small subsets.
+    No refit: the best candidate is refit outside the memory budget (see __main__).
+    """
+    if search == "halving":
+        return HalvingRandomSearchCV(
+            pipeline,
+            PARAM_DISTRIBUTIONS,
+            n_candidates=n_candidates,
+            factor=factor,
+            resource="n_samples",
+            min_resources="exhaust",
+            cv=cv,
+            n_jobs=n_jobs,
+            random_state=random_state,
+            refit=False,
+            verbose=1,
+        )
+    return RandomizedSearchCV(
+        pipeline,
+        PARAM_DISTRIBUTIONS,
+        n_iter=n_candidates,
+        cv=cv,
+        n_jobs=n_jobs,
+        random_state=random_state,
+        refit=False,
+        verbose=1,
+    )
+
+
+def load_split(name, data_dir=DATA_DIR):
+    df = pd.read_csv(os.path.join(data_dir, f"{name}.csv"))
+    return df["title"].to_numpy(dtype=object), df["label"].to_numpy()
+
+
+def summarize_profile(log_path):
+    """Per candidate totals of the fit log"""
+    if not os.path.isfile(log_path):
+        return pd.DataFrame()
+    profile_df = pd.read_json(log_path, lines=True)
+    profile_df["candidate"] = profile_df["params"].apply(lambda params: json.dumps(params, sort_keys=True, default=str))
+    return profile_df.groupby(["candidate", "n_samples"]).agg(
+        fits=("fit_seconds", "size"),
+        fit_seconds=("fit_seconds", "sum"),
+        peak_memory_mb=("peak_memory_mb", "max"),
+        over_budget=("over_budget", "any"),
+    ).sort_values("fit_seconds", ascending=False)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Hyperparameter search for the TF-IDF + RandomForest baseline")
+    parser.add_argument("--search", default="halving", choices=["halving", "random"])
+    parser.add_argument("--n-candidates", type=int, default=48)
+    parser.add_argument("--factor", type=int, default=3)
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="empty string disables transformer caching")
+    parser.add_argument("--profile-log", default=PROFILE_LOG_PATH)
+    parser.add_argument("--memory-budget-mb", type=float, default=None, help="drop candidates whose fit peaks above this RSS")
+    parser.add_argument("--save-dir", default=SAVE_DIR)
+    parser.add_argument("--predictions-dir", default=os.path.join(TRAINING_DIR, "predictions"))
+    return parser.parse_args()
+
+
+if __name__=="__main__":
+    args = parse_args()
+    os.makedirs(args.save_dir, exist_ok=True)
+    if os.path.isfile(args.profile_log):
+        os.remove(args.profile_log)
+    os.environ[PROFILE_LOG_ENV] = args.profile_log
+    if args.memory_budget_mb:
+        os.environ[MEMORY_BUDGET_ENV] = str(args.memory_budget_mb)
+    
+    X_train, y_train = load_split("train")
+    X_test, y_test = load_split("test")
+    
+    search = build_search(
+        build_pipeline(cache_dir=args.cache_dir),
+        search=args.search,
+        n_candidates=args.n_candidates,
+        factor=args.factor,
+        cv=args.cv,
+        n_jobs=args.n_jobs,
+    )
+    start_time = time.perf_counter()
+    search.fit(X_train, y_train)
+    print(f"Search took {time.perf_counter() - start_time:.1f}s")
+    print(search.best_params_)
+    
+    #-- The budget is for the candidates; the chosen one is refit on the whole train split regardless
+    os.environ.pop(MEMORY_BUDGET_ENV, None)
+    best_pipeline = build_pipeline(cache_dir=args.cache_dir).set_params(**search.best_params_)
+    best_pipeline.fit(X_train, y_train)
+    pred = best_pipeline.predict(X_test)
+    print(f"Test accuracy: {accuracy_score(y_test, pred):.4f}")
+    
+    #-- Same artifacts as train.ipynb
+    model_path = os.path.join(args.save_dir, "random_forest_model.pkl")
+    tfidf_path = os.path.join(args.save_dir, "tfidf.pkl")
+    joblib.dump(best_pipeline.named_steps["rf"], model_path)
+    joblib.dump(best_pipeline.named_steps["tfidf"], tfidf_path)
+    np.save(os.path.join(args.predictions_dir, "rf_prediction.npy"), pred)
+    print(f"Model saved to: {model_path}")
+    print(f"TFIDF saved to: {tfidf_path}")
+    
+    pd.set_option("display.max_colwidth", 80)
+    print(summarize_profile(args.profile_log).head(10))
@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import aiohttp
+import pandas as pd
+from datetime import datetime
+
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT_DIR = os.path.dirname(PROJECTS_DIR)
+sys.path.append(os.path.join(PROJECTS_DIR, "newest_crawl"))
+sys.path.append(os.path.join(PROJECTS_DIR, "preprocessing"))
+sys.path.append(os.path.join(PROJECTS_DIR, "sentiment_analysis"))
+sys.path.append(os.path.join(ROOT_DIR, "project_2_training", "preprocessing"))
+sys.path.append(os.path.join(ROOT_DIR, "project_2_training", "inference"))
+from investing_crawling_async import Crawler
+from html_extract import parse_article, run_parser, PARSER_POOL
+from translation_service import TranslationService, LocalBackend
+from stub_server import StubSite, FIXTURES_DIR, load_pages
+
+
+#---- Default locations
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+TEST_PATH = os.path.join(ROOT_DIR, "project_2_training", "data", "test.csv")
+SAVE_DIR = os.path.join(ROOT_DIR, "project_2_training", "save")
+
+#-- Relative change beyond which a throughput drop is reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+class StubCrawler(Crawler):
+    """Crawler pointed at the local stub site"""
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url
+    
+    def get_page_url(self, page_id):
+        return f"{self.base_url}/indices/vn-news/{page_id}"
+
+
+def rate(count, seconds):
+    return round(count / seconds, 1) if seconds > 0 else None
+
+
+#---- Benchmarks
+async def bench_listing(site, num_pages=100, concurrency=8):
+    """Crawler.crawling_news_urls against the stub site"""
+    crawler = StubCrawler(site.base_url)
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def crawl(page_id):
+        async with semaphore:
+            return await crawler.crawling_news_urls(session, crawler.get_page_url(page_id))
+    
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await crawl(1)
+        start_time = time.perf_counter()
+        results = await asyncio.gather(*[crawl(page_id) for page_id in range(1, num_pages + 1)])
+        seconds = time.perf_counter() - start_time
+    num_items = sum(len(items) for items in results)
+    return {
+        "pages": num_pages,
+        "items": num_items,
+        "seconds": round(seconds, 3),
+        "pages_per_second": rate(num_pages, seconds),
+        "items_per_second": rate(num_items, seconds),
+    }
+
+
+async def bench_article_parse(pages, repeat=20):
+    """parse_article inline and through the off-loop parser pool (PlaywrightScrolling.parse_news_details)"""
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            parse_article(page)
+    inline_seconds = time.perf_counter() - start_time
+    
+    await run_parser(parse_article, pages[0])
+    start_time = time.perf_counter()
+    await asyncio.gather(*[run_parser(parse_article, page) for _ in range(repeat) for page in pages])
+    pool_seconds = time.perf_counter() - start_time
+    num_pages = len(pages) * repeat
+    return {
+        "pages": num_pages,
+        "inline_pages_per_second": rate(num_pages, inline_seconds),
+        "pool_pages_per_second": rate(num_pages, pool_seconds),
+    }
+
+
+async def bench_translation(pages, num_sentences=2000, latency=0.02, max_concurrency=50):
+    """TranslationService over a stub backend with a fixed per request latency; inputs repeat like real articles do"""
+    sentences = [line.strip() for page in pages for line in parse_article(page)["main_content"].split(" \n ") if line.strip()]
+    num_unique = max(1, num_sentences // 2)
+    sentences = [f"{sentences[i % num_unique % len(sentences)]} ({i % num_unique})" for i in range(num_sentences)]
+    service = TranslationService(
+        LocalBackend(latency=latency),
+        memory=None,
+        rate=10000,
+        burst=max_concurrency,
+        max_concurrency=max_concurrency,
+    )
+    await service.open()
+    start_time = time.perf_counter()
+    await service.translate_many(sentences)
+    seconds = time.perf_counter() - start_time
+    await service.close()
+    return {
+        "sentences": num_sentences,
+        "backend_requests": service.stats["requests"],
+        "backend_latency_ms": latency * 1000,
+        "sentences_per_second": rate(num_sentences, seconds),
+    }
+
+
+def bench_tfidf(test_path=TEST_PATH, save_dir=SAVE_DIR):
+    """TF-IDF (+ RandomForest / distilled linear when saved) sentences per second on test.csv"""
+    import joblib
+    texts = pd.read_csv(test_path)["title"].astype(str).tolist()
+    results = {"sentences": len(texts)}
+    vectorizer = joblib.load(os.path.join(save_dir, "tfidf.pkl"))
+    start_time = time.perf_counter()
+    X = vectorizer.transform(texts)
+    results["tfidf_sentences_per_second"] = rate(len(texts), time.perf_counter() - start_time)
+    
+    model_path = os.path.join(save_dir, "random_forest_model.pkl")
+    if os.path.isfile(model_path):
+        model = joblib.load(model_path)
+        start_time = time.perf_counter()
+        model.predict(X)
+        results["random_forest_sentences_per_second"] = rate(len(texts), time.perf_counter() - start_time)
+    linear_dir = os.path.join(save_dir, "distilled_linear")
+    if os.path.isdir(linear_dir):
+        from distilled_linear import LinearModel
+        linear = LinearModel.load(linear_dir)
+        start_time = time.perf_counter()
+        linear.predict(X)
+        results["distilled_linear_sentences_per_second"] = rate(len(texts), time.perf_counter() - start_time)
+    return results
+
+
+def bench_finbert(test_path=TEST_PATH, num_sentences=256, batch_size=32):
+    """FinBERT sentences per second without the cache, so every sentence hits the model"""
+    from finbert_inference import FinbertInference
+    texts = pd.read_csv(test_path)["title"].astype(str).tolist()[:num_sentences]
+    engine = FinbertInference(batch_size=batch_size, cache_path=None)
+    engine.predict(texts[:batch_size])
+    start_time = time.perf_counter()
+    engine.score_sentences(texts, show_progress=False)
+    seconds = time.perf_counter() - start_time
+    return {"sentences": len(texts), "sentences_per_second": rate(len(texts), seconds)}
+
+
+#---- Results
+def higher_is_better(metric):
+    return metric.endswith("_per_second")
+
+
+def compare(current, previous, threshold=REGRESSION_THRESHOLD):
+    """Throughput metrics that moved by more than `threshold` since the previous run"""
+    changes = []
+    for name, metrics in current["benchmarks"].items():
+        previous_metrics = previous.get("benchmarks", {}).get(name, {})
+        for metric, value in metrics.items():
+            old_value = previous_metrics.get(metric)
+            if not higher_is_better(metric) or not isinstance(value, (int, float)) or not old_value:
+                continue
+            change = (value - old_value) / old_value
+            if abs(change) > threshold:
+                changes.append({
+                    "benchmark": f"{name}.{metric}",
+                    "previous": old_value,
+                    "current": value,
+                    "change": round(change, 3),
+                    "regression": change < 0,
+                })
+    return changes
+
+
+def latest_result(results_dir):
+    paths = sorted(path for path in os.listdir(results_dir) if path.endswith(".json")) if os.path.isdir(results_dir) else []
+    if not paths:
+        return None
+    with open(os.path.join(results_dir, paths[-1]), "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_result(result, results_dir):
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"{result['run_at'].replace(':', '').replace('-', '')}.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(result, file, indent=3)
+    return path
+
+
+async def run(args):
+    site = StubSite(fixtures_dir=args.fixtures_dir, max_pages=args.pages, latency=args.server_latency)
+    article_pages = load_pages(args.fixtures_dir, "article")
+    benchmarks = {}
+    selected = set(args.only) if args.only else None
+    
+    def wanted(name):
+        return selected is None or name in selected
+    
+    await site.start()
+    try:
+        if wanted("listing"):
+            benchmarks["listing"] = await bench_listing(site, num_pages=args.pages, concurrency=args.concurrency)
+    finally:
+        await site.stop()
+    if wanted("article_parse"):
+        benchmarks["article_parse"] = await bench_article_parse(article_pages)
+    if wanted("translation"):
+        benchmarks["translation"] = await bench_translation(article_pages, latency=args.translation_latency)
+    if wanted("tfidf"):
+        benchmarks["tfidf"] = bench_tfidf()
+    if args.finbert and wanted("finbert"):
+        benchmarks["finbert"] = bench_finbert()
+    PARSER_POOL.close()
+    return benchmarks
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmarks for crawl -> translate -> score")
+    parser.add_argument("--fixtures-dir", default=FIXTURES_DIR)
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--server-latency", type=float, default=0.0, help="seconds the stub site waits per response")
+    parser.add_argument("--translation-latency", type=float, default=0.02)
+    parser.add_argument("--finbert", action="store_true", help="also benchmark FinBERT (downloads / loads the model)")
+    parser.add_argument("--only", nargs="+", default=None, choices=["listing", "article_parse", "translation", "tfidf", "finbert"])
+    return parser.parse_args()
+
+
+if __name__=="__main__":
+    args = parse_args()
+    previous = latest_result(args.results_dir)
+    result = {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "benchmarks": asyncio.run(run(args)),
+    }
+    print(json.dumps(result["benchmarks"], indent=3))
+    print(f"Saved to {save_result(result, args.results_dir)}")
+    
+    if previous is not None:
+        changes = compare(result, previous)
+        for change in changes:
+            tag = "REGRESSION" if change["regression"] else "improvement"
+            print(f"{tag}: {change['benchmark']} {change['previous']} -> {change['current']} ({change['change']:+.1%})")
+        if not changes:
+            print(f"No throughput change beyond {REGRESSION_THRESHOLD:.0%} since {previous['run_at']}")
@@ -0,0 +1,66 @@
+import os
+import re
+import glob
+import asyncio
+from aiohttp import web
+
+
+#---- Default locations
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(PROJECTS_DIR, "newest_crawl", "fixtures")
+
+
+def load_pages(fixtures_dir, kind):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, f"{kind}_*.html"))):
+        with open(path, "r", encoding="utf-8") as file:
+            pages.append(file.read())
+    return pages
+
+
+#---- Stub site
+class StubSite():
+    """Serves the recorded listing / article fixtures under vn.investing.com style paths"""
+    def __init__(self, fixtures_dir=FIXTURES_DIR, max_pages=100, latency=0.0):
+        self.listings = load_pages(fixtures_dir, "listing")
+        self.articles = load_pages(fixtures_dir, "article")
+        if not self.listings or not self.articles:
+            raise FileNotFoundError(f"No listing / article fixtures in {fixtures_dir} (run newest_crawl/bench_extract.py --synthesize)")
+        self.max_pages = max_pages
+        self.latency = latency
+        self.num_requests = 0
+        self.runner = None
+        self.base_url = None
+    
+    async def respond(self, body):
+        self.num_requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.Response(text=body, content_type="text/html")
+    
+    async def handle_listing(self, request):
+        page_id = int(request.match_info["page_id"])
+        if page_id > self.max_pages:
+            raise web.HTTPNotFound()
+        return await self.respond(self.listings[page_id % len(self.listings)])
+    
+    async def handle_article(self, request):
+        match = re.search(r"(\d+)$", request.match_info["slug"])
+        article_id = int(match.group(1)) if match else 0
+        return await self.respond(self.articles[article_id % len(self.articles)])
+    
+    async def start(self, host="127.0.0.1", port=0):
+        app = web.Application()
+        app.router.add_get("/indices/vn-news/{page_id}", self.handle_listing)
+        app.router.add_get("/news/{category}/{slug}", self.handle_article)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+    
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
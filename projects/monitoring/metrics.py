@@ -0,0 +1,352 @@
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+import urllib.request
+import numpy as np
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+#---- Defaults
+#-- none | file:///path/metrics.jsonl | statsd://host:8125/prefix | dogstatsd://host:8125/prefix | prometheus://0.0.0.0:9108 | pushgateway://host:9091/job
+METRICS_ENV = "PIPELINE_METRICS"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 5e6)
+STATSD_TYPES = {"counter": "c", "gauge": "g", "histogram": "h"}
+
+
+def tags_key(tags):
+    return tuple(sorted((str(key), str(value)) for key, value in tags.items())) if tags else ()
+
+
+#---- Sinks
+class NullSink():
+    """Drops everything (default, and for tests that do not look at metrics)"""
+    def emit(self, kind, name, value, tags):
+        pass
+    
+    def close(self):
+        pass
+
+
+class FileSink():
+    """One JSON line per observation, summarized by `python metrics.py <path>`"""
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8", buffering=1)
+    
+    def emit(self, kind, name, value, tags):
+        line = json.dumps({"ts": round(time.time(), 3), "kind": kind, "name": name, "value": value, "tags": dict(tags_key(tags))})
+        with self.lock:
+            self.file.write(line + "\n")
+    
+    def close(self):
+        self.file.close()
+
+
+class StatsdSink():
+    """
+    Fire and forget UDP datagrams. Plain StatsD (what Airflow's statsd_on speaks) has no tags,
+    so they are folded into the name; `dogstatsd=True` sends them as |#key:value instead.
+    """
+    def __init__(self, host="localhost", port=8125, prefix="pipeline", dogstatsd=False):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.dogstatsd = dogstatsd
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+    
+    def format(self, kind, name, value, tags):
+        name = f"{self.prefix}.{name}" if self.prefix else name
+        if tags and not self.dogstatsd:
+            name += "".join(f".{key}_{value}" for key, value in tags_key(tags))
+        if kind == "timing":
+            line = f"{name}:{value * 1000:.3f}|ms"
+        else:
+            line = f"{name}:{value:g}|{STATSD_TYPES[kind]}"
+        if tags and self.dogstatsd:
+            line += "|#" + ",".join(f"{key}:{value}" for key, value in tags_key(tags))
+        return line
+    
+    def emit(self, kind, name, value, tags):
+        try:
+            self.socket.sendto(self.format(kind, name, value, tags).encode("utf-8"), self.address)
+        except OSError:
+            #-- Metrics must never take the pipeline down
+            pass
+    
+    def close(self):
+        self.socket.close()
+
+
+class PrometheusSink():
+    """
+    Aggregates in process and serves the text exposition format on http://host:port/metrics.
+    The port is bound on the first observation, not on import. Processes sharing a host (sharded
+    workers, parallel Airflow tasks) each take the next free port of [port, port + port_range);
+    when none is free the sink keeps aggregating without serving.
+    """
+    def __init__(self, host="0.0.0.0", port=9108, serve=True, port_range=16):
+        self.lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.host = host
+        self.port = port
+        self.port_range = port_range
+        self.serve = serve
+        self.started = False
+        self.server = None
+    
+    @property
+    def bound_port(self):
+        return self.server.server_address[1] if self.server is not None else None
+    
+    def start(self):
+        with self.start_lock:
+            if self.started:
+                return
+            self.started = True
+            ports = [self.port] if self.port == 0 else range(self.port, self.port + self.port_range)
+            for port in ports:
+                try:
+                    self.server = ThreadingHTTPServer((self.host, port), self.handler_class())
+                    break
+                except OSError:
+                    continue
+            if self.server is None:
+                print(f"Metrics: no free port in {self.port}-{self.port + self.port_range - 1}, /metrics not served")
+                return
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def handler_class(self):
+        sink = self
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return MetricsHandler
+    
+    def emit(self, kind, name, value, tags):
+        if self.serve and not self.started:
+            self.start()
+        key = (name, tags_key(tags))
+        with self.lock:
+            if kind == "counter":
+                self.counters[key] = self.counters.get(key, 0) + value
+            elif kind == "gauge":
+                self.gauges[key] = value
+            else:
+                buckets = LATENCY_BUCKETS if kind == "timing" else SIZE_BUCKETS
+                histogram = self.histograms.setdefault(key, [kind, np.zeros(len(buckets), dtype=np.int64), 0.0, 0])
+                histogram[1] += value <= np.asarray(buckets)
+                histogram[2] += value
+                histogram[3] += 1
+    
+    @staticmethod
+    def metric_name(name, kind):
+        name = name.replace(".", "_").replace("-", "_")
+        if kind == "counter":
+            return name + "_total"
+        if kind == "timing" and not name.endswith("_seconds"):
+            return name + "_seconds"
+        return name
+    
+    @staticmethod
+    def labels(tags, extra=()):
+        pairs = list(tags) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{str(value)}"' for key, value in pairs) + "}"
+    
+    def render(self):
+        lines = []
+        with self.lock:
+            for kind, values in [("counter", self.counters), ("gauge", self.gauges)]:
+                for name in sorted(set(name for name, _ in values)):
+                    metric_name = self.metric_name(name, kind)
+                    lines.append(f"# TYPE {metric_name} {kind}")
+                    for (key_name, tags), value in sorted(values.items()):
+                        if key_name == name:
+                            lines.append(f"{metric_name}{self.labels(tags)} {value:g}")
+            for name in sorted(set(name for name, _ in self.histograms)):
+                series = [(tags, histogram) for (key_name, tags), histogram in sorted(self.histograms.items(), key=lambda entry: entry[0]) if key_name == name]
+                metric_name = self.metric_name(name, series[0][1][0])
+                lines.append(f"# TYPE {metric_name} histogram")
+                for tags, (kind, bucket_counts, total, count) in series:
+                    buckets = LATENCY_BUCKETS if kind == "timing" else SIZE_BUCKETS
+                    for bound, bucket_count in zip(buckets, bucket_counts):
+                        lines.append(f"{metric_name}_bucket{self.labels(tags, [('le', f'{bound:g}')])} {bucket_count}")
+                    lines.append(f"{metric_name}_bucket{self.labels(tags, [('le', '+Inf')])} {count}")
+                    lines.append(f"{metric_name}_sum{self.labels(tags)} {total:g}")
+                    lines.append(f"{metric_name}_count{self.labels(tags)} {count}")
+        return "\n".join(lines) + "\n"
+    
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class PushgatewaySink(PrometheusSink):
+    """
+    Same aggregation, pushed to a Prometheus Pushgateway every `interval` seconds and on close,
+    grouped by host / pid so short lived tasks and workers never overwrite each other.
+    """
+    def __init__(self, host="localhost", port=9091, job="pipeline", interval=15.0):
+        super().__init__(serve=False)
+        instance = f"{socket.gethostname()}-{os.getpid()}"
+        self.push_url = f"http://{host}:{port}/metrics/job/{job}/instance/{instance}"
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.pusher = None
+    
+    def emit(self, kind, name, value, tags):
+        if self.pusher is None:
+            with self.start_lock:
+                if self.pusher is None:
+                    self.pusher = threading.Thread(target=self.push_forever, daemon=True)
+                    self.pusher.start()
+        super().emit(kind, name, value, tags)
+    
+    def push(self):
+        request = urllib.request.Request(self.push_url, data=self.render().encode("utf-8"), method="PUT", headers={"Content-Type": "text/plain; version=0.0.4"})
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except OSError as e:
+            #-- Metrics must never take the pipeline down
+            print(f"Metrics push to {self.push_url} failed: {e}")
+    
+    def push_forever(self):
+        while not self.stopped.wait(self.interval):
+            self.push()
+    
+    def close(self):
+        self.stopped.set()
+        if self.pusher is not None:
+            self.push()
+
+
+def sink_from_url(url):
+    if not url or url == "none":
+        return NullSink()
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return FileSink(parsed.path)
+    if parsed.scheme in ("statsd", "dogstatsd"):
+        return StatsdSink(host=parsed.hostname or "localhost", port=parsed.port if parsed.port is not None else 8125, prefix=parsed.path.strip("/") or "pipeline", dogstatsd=parsed.scheme == "dogstatsd")
+    if parsed.scheme == "prometheus":
+        return PrometheusSink(host=parsed.hostname or "0.0.0.0", port=parsed.port if parsed.port is not None else 9108)
+    if parsed.scheme == "pushgateway":
+        return PushgatewaySink(host=parsed.hostname or "localhost", port=parsed.port if parsed.port is not None else 9091, job=parsed.path.strip("/") or "pipeline")
+    raise ValueError(f"Unknown metrics sink {url!r}")
+
+
+def safe_sink(url):
+    """sink_from_url that falls back to NullSink: a bad metrics setting must not stop the process"""
+    try:
+        return sink_from_url(url)
+    except (OSError, ValueError) as e:
+        print(f"Metrics disabled, cannot set up {url!r}: {e}")
+        return NullSink()
+
+
+#---- Facade
+class Metrics():
+    """Counters, gauges, latency / size histograms, all tagged by stage specific labels"""
+    def __init__(self, sink=None):
+        self.sink = sink if sink is not None else NullSink()
+    
+    def increment(self, name, value=1, tags=None):
+        self.sink.emit("counter", name, value, tags)
+    
+    def gauge(self, name, value, tags=None):
+        self.sink.emit("gauge", name, value, tags)
+    
+    def observe(self, name, value, tags=None):
+        """Size like distributions (bytes, batch sizes)"""
+        self.sink.emit("histogram", name, value, tags)
+    
+    def timing(self, name, seconds, tags=None):
+        self.sink.emit("timing", name, seconds, tags)
+    
+    @contextmanager
+    def timer(self, name, tags=None):
+        """Times the block; the yielded dict's tags can be updated inside (e.g. the outcome)"""
+        tags = dict(tags or {})
+        start_time = time.perf_counter()
+        try:
+            yield tags
+        except BaseException as e:
+            tags.setdefault("outcome", type(e).__name__)
+            raise
+        finally:
+            tags.setdefault("outcome", "ok")
+            self.timing(name, time.perf_counter() - start_time, tags)
+    
+    def close(self):
+        self.sink.close()
+
+
+METRICS = Metrics(safe_sink(os.environ.get(METRICS_ENV)))
+
+
+def configure(url):
+    """Swap the process wide sink (the instrumented modules all hold METRICS)"""
+    METRICS.sink.close()
+    METRICS.sink = safe_sink(url)
+    return METRICS
+
+
+#---- File sink report
+def summarize(path):
+    """Per metric / tag set: count, total, and latency percentiles for timings"""
+    series = {}
+    first_ts, last_ts = None, None
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            first_ts = record["ts"] if first_ts is None else min(first_ts, record["ts"])
+            last_ts = record["ts"] if last_ts is None else max(last_ts, record["ts"])
+            key = (record["kind"], record["name"], tuple(sorted(record["tags"].items())))
+            series.setdefault(key, []).append(record["value"])
+    elapsed = max((last_ts or 0) - (first_ts or 0), 1.0)
+    lines = []
+    for (kind, name, tags), values in sorted(series.items()):
+        label = name + ("{" + ",".join(f"{key}={value}" for key, value in tags) + "}" if tags else "")
+        values = np.asarray(values, dtype=np.float64)
+        if kind == "counter":
+            lines.append(f"{label}: total={values.sum():g} ({values.sum() / elapsed:.2f}/s)")
+        elif kind == "gauge":
+            lines.append(f"{label}: last={values[-1]:g} max={values.max():g}")
+        elif kind == "timing":
+            lines.append(f"{label}: n={len(values)} p50={np.percentile(values, 50) * 1000:.1f}ms p99={np.percentile(values, 99) * 1000:.1f}ms")
+        else:
+            lines.append(f"{label}: n={len(values)} mean={values.mean():.1f} max={values.max():g}")
+    return "\n".join(lines)
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Summarize a file sink (PIPELINE_METRICS=file:///path)")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    print(summarize(args.path))
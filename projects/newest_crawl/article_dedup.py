@@ -0,0 +1,250 @@
+import os
+import re
+import time
+import zlib
+import sqlite3
+import hashlib
+import argparse
+import unicodedata
+import numpy as np
+from datetime import datetime
+from crawl_index import saved_articles, CONTENTS_DIR, URLS_DIR
+
+
+#---- Default location
+DEDUP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "article_dedup.sqlite")
+
+#-- Per position multipliers for combining word hashes into k-gram hashes
+SHINGLE_MULTIPLIERS = np.array([0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F, 0x165667B1, 0xD3A2646C, 0xFD7046C5, 0xB55A4F09], dtype=np.uint64)
+WORD_PATTERN = re.compile(r"\w+")
+
+
+#---- Text -> shingles -> signature
+def normalize_content(text):
+    """NFC, lowercase, words only: markup / spacing differences between copies do not matter"""
+    return WORD_PATTERN.findall(unicodedata.normalize("NFC", text).lower())
+
+
+def content_hash(words):
+    return hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+
+
+def shingle_hashes(words, k=5):
+    """32 bit hashes of the word k-grams (the whole text when shorter than k words), combined in numpy from per word crc32"""
+    if len(words) < k:
+        return np.array([zlib.crc32(" ".join(words).encode("utf-8"))], dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+    num_shingles = len(words) - k + 1
+    combined = np.zeros(num_shingles, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for position in range(k):
+            combined = combined * np.uint64(1000003) ^ word_hashes[position: position+num_shingles] * SHINGLE_MULTIPLIERS[position % len(SHINGLE_MULTIPLIERS)]
+    return np.unique(combined >> np.uint64(32))
+
+
+class MinHasher():
+    """num_perm multiply-shift hashes ((a * x + b) mod 2^64 >> 32), fixed by the seed so signatures stay comparable across runs"""
+    def __init__(self, num_perm=128, seed=1):
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = generator.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) << np.uint64(1) | np.uint64(1)
+        self.b = generator.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64)
+    
+    def signature(self, hashes):
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(self.a, hashes) + self.b[:, None]) >> np.uint64(32)
+        return permuted.min(axis=1).astype(np.uint32)
+
+
+#---- Result
+class DedupResult():
+    def __init__(self, kind, duplicate_of=None, similarity=None):
+        self.kind = kind
+        self.duplicate_of = duplicate_of
+        self.similarity = similarity
+    
+    @property
+    def is_duplicate(self):
+        return self.kind in ("exact", "near")
+    
+    def to_dict(self):
+        return {"duplicate_kind": self.kind, "duplicate_of": self.duplicate_of, "similarity": self.similarity}
+
+
+#---- Index
+class DedupIndex():
+    """
+    Persistent MinHash LSH index over article contents. Buckets are kept in memory for
+    sub-millisecond lookups and written through to SQLite; duplicates point at the first
+    (canonical) copy so translations and scores can be reused from it.
+    """
+    def __init__(self, path=DEDUP_PATH, num_perm=128, bands=16, threshold=0.8, shingle_size=5, min_words=10):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        #-- Failed / empty extractions all hash alike: below this many words an article is "empty", never a duplicate
+        self.min_words = min_words
+        
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                article_id TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                duplicate_kind TEXT NOT NULL,
+                duplicate_of TEXT,
+                similarity REAL,
+                added_at TEXT NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_articles_content_hash ON articles (content_hash)")
+        self.connection.commit()
+        self.load()
+    
+    def load(self):
+        """Rebuild the in memory buckets from the canonical articles"""
+        self.signatures = {}
+        self.exact = {}
+        self.canonical = {}
+        self.records = {}
+        self.buckets = [dict() for _ in range(self.bands)]
+        rows = self.connection.execute("SELECT article_id, content_hash, signature, duplicate_kind, duplicate_of, similarity FROM articles")
+        for article_id, hash_value, signature_blob, kind, duplicate_of, similarity in rows:
+            self.canonical[article_id] = duplicate_of or article_id
+            self.records[article_id] = (hash_value, kind, duplicate_of, similarity)
+            if kind == "unique":
+                signature = np.frombuffer(signature_blob, dtype=np.uint32)
+                self.exact.setdefault(hash_value, article_id)
+                self.index_signature(article_id, signature)
+    
+    def band_keys(self, signature):
+        return [signature[band * self.rows: (band + 1) * self.rows].tobytes() for band in range(self.bands)]
+    
+    def index_signature(self, article_id, signature):
+        self.signatures[article_id] = signature
+        for band, key in enumerate(self.band_keys(signature)):
+            self.buckets[band].setdefault(key, []).append(article_id)
+    
+    def unindex_signature(self, article_id, hash_value):
+        if self.exact.get(hash_value) == article_id:
+            del self.exact[hash_value]
+        signature = self.signatures.pop(article_id, None)
+        if signature is not None:
+            for band, key in enumerate(self.band_keys(signature)):
+                self.buckets[band][key].remove(article_id)
+    
+    def fingerprint(self, text):
+        """(content hash, MinHash signature, number of words)"""
+        words = normalize_content(text)
+        return content_hash(words), self.hasher.signature(shingle_hashes(words, k=self.shingle_size)), len(words)
+    
+    def query(self, hash_value, signature, num_words=None):
+        if num_words is not None and num_words < self.min_words:
+            return DedupResult("empty")
+        if hash_value in self.exact:
+            return DedupResult("exact", self.exact[hash_value], 1.0)
+        candidates = set()
+        for band, key in enumerate(self.band_keys(signature)):
+            candidates.update(self.buckets[band].get(key, ()))
+        best_id, best_similarity = None, 0.0
+        for candidate in candidates:
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity > best_similarity:
+                best_id, best_similarity = candidate, similarity
+        if best_id is not None and best_similarity >= self.threshold:
+            return DedupResult("near", best_id, round(best_similarity, 4))
+        return DedupResult("unique")
+    
+    def check(self, text):
+        """Flag `text` against the index without adding it"""
+        return self.query(*self.fingerprint(text))
+    
+    def store(self, article_id, hash_value, signature, result):
+        self.records[article_id] = (hash_value, result.kind, result.duplicate_of, result.similarity)
+        self.canonical[article_id] = result.duplicate_of or article_id
+        if result.kind == "unique":
+            self.exact[hash_value] = article_id
+            self.index_signature(article_id, signature)
+        self.connection.execute(
+            """
+            INSERT INTO articles (article_id, content_hash, signature, duplicate_kind, duplicate_of, similarity, added_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (article_id) DO UPDATE SET content_hash = excluded.content_hash, signature = excluded.signature,
+                duplicate_kind = excluded.duplicate_kind, duplicate_of = excluded.duplicate_of, similarity = excluded.similarity
+            """,
+            (article_id, hash_value, signature.tobytes(), result.kind, result.duplicate_of, result.similarity, datetime.now().isoformat(timespec="seconds")),
+        )
+    
+    def check_and_add(self, article_id, text, fingerprint=None):
+        """
+        Flag the article and remember it. An id seen before with the same content keeps its stored
+        verdict; a refetch with new content is re-evaluated, and so are the copies that pointed at it.
+        """
+        hash_value, signature, num_words = fingerprint if fingerprint is not None else self.fingerprint(text)
+        record = self.records.get(article_id)
+        if record is not None and record[0] == hash_value:
+            return DedupResult(record[1], record[2], record[3])
+        if record is not None:
+            self.unindex_signature(article_id, record[0])
+        result = self.query(hash_value, signature, num_words)
+        self.store(article_id, hash_value, signature, result)
+        if record is not None and record[1] == "unique":
+            self.reassign_duplicates(article_id)
+        self.connection.commit()
+        return result
+    
+    def reassign_duplicates(self, article_id):
+        """Copies of an article whose content changed are matched again from their stored signatures"""
+        rows = self.connection.execute("SELECT article_id, content_hash, signature FROM articles WHERE duplicate_of = ?", (article_id,)).fetchall()
+        for duplicate_id, hash_value, signature_blob in rows:
+            signature = np.frombuffer(signature_blob, dtype=np.uint32)
+            self.store(duplicate_id, hash_value, signature, self.query(hash_value, signature))
+    
+    def canonical_id(self, article_id):
+        return self.canonical.get(article_id, article_id)
+    
+    def summary(self):
+        rows = self.connection.execute("SELECT duplicate_kind, COUNT(*) FROM articles GROUP BY duplicate_kind").fetchall()
+        return dict(rows)
+    
+    def close(self):
+        self.connection.close()
+
+
+def index_saved_pages(index, contents_dir=CONTENTS_DIR, urls_dir=URLS_DIR):
+    """Backfill from the per page JSON files, keyed by item_url like the crawl pipeline / DAG"""
+    fingerprint_latencies, lookup_latencies = [], []
+    for _, _, item_url, news_detail_dict in saved_articles(contents_dir, urls_dir):
+        if item_url is None:
+            continue
+        start_time = time.perf_counter()
+        fingerprint = index.fingerprint(news_detail_dict.get("main_content", ""))
+        fingerprint_time = time.perf_counter()
+        index.query(*fingerprint)
+        fingerprint_latencies.append(fingerprint_time - start_time)
+        lookup_latencies.append(time.perf_counter() - fingerprint_time)
+        index.check_and_add(item_url, news_detail_dict.get("main_content", ""), fingerprint=fingerprint)
+    return np.array(fingerprint_latencies), np.array(lookup_latencies)
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="MinHash LSH near duplicate index over crawled articles")
+    parser.add_argument("--path", default=DEDUP_PATH)
+    parser.add_argument("--contents-dir", default=CONTENTS_DIR)
+    parser.add_argument("--urls-dir", default=URLS_DIR)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+    
+    index = DedupIndex(path=args.path, threshold=args.threshold)
+    fingerprint_latencies, lookup_latencies = index_saved_pages(index, args.contents_dir, args.urls_dir)
+    for name, latencies in [("fingerprint", fingerprint_latencies), ("lookup", lookup_latencies)]:
+        if len(latencies):
+            print(f"{name}: {len(latencies)} articles, p50 {np.percentile(latencies, 50) * 1000:.3f} ms, p99 {np.percentile(latencies, 99) * 1000:.3f} ms")
+    print(index.summary())
+    index.close()
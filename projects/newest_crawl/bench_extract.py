@@ -0,0 +1,155 @@
+import os
+import glob
+import html
+import json
+import time
+import argparse
+from bs4 import BeautifulSoup
+from html_extract import parse_listing, parse_article
+
+
+#---- Default locations
+CRAWL_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(CRAWL_DIR, "fixtures")
+
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+#---- Reference (BeautifulSoup html.parser) parsers, as they were in the crawlers
+def bs4_parse_listing(source_content):
+    source_soup = BeautifulSoup(source_content, "html.parser")
+    all_news_html = source_soup.find_all("div", class_="block w-full sm:flex-1")
+    page_news_items = []
+    for new_html in all_news_html:
+        item_title_html = new_html.find("a", class_="block text-base font-bold leading-5 hover:underline sm:text-base sm:leading-6 md:text-lg md:leading-7")
+        item_url = item_title_html.get("href", "")
+        title = item_title_html.text
+        item_posted_time = new_html.find("li", class_="ml-2").text
+        if "•" in item_posted_time:
+            item_posted_time = item_posted_time.replace("•", "")
+        page_news_items.append({
+            "item_url": item_url.strip(),
+            "title": title.strip(),
+            "time": item_posted_time.strip(),
+        })
+    return page_news_items
+
+
+def bs4_parse_article(html_content):
+    soup = BeautifulSoup(html_content, "html.parser")
+    posted_date_html = soup.find("div", class_="flex flex-col gap-2 text-warren-gray-700 md:flex-row md:items-center md:gap-0")
+    posted_date_html = posted_date_html.find("div", class_="flex flex-row items-center")
+    main_content_html = soup.find("div", class_="article_WYSIWYG__O0uhw article_articlePage__UMz3q text-[18px] leading-8")
+    main_content = ""
+    for line in main_content_html.find_all("p"):
+        main_content += line.text.strip() + " \n "
+    return {
+        "posted_date": posted_date_html.text,
+        "main_content": main_content,
+    }
+
+
+#---- Fixtures
+def page_filler(num_blocks=300):
+    """Navigation / script noise so fixtures have the size of real pages"""
+    blocks = []
+    for i in range(num_blocks):
+        blocks.append(
+            f'<div class="flex items-center gap-2 px-4 py-2 text-sm hover:bg-gray-100"><a href="/markets/{i}" class="text-link">'
+            f'Thị trường {i}</a><span class="ml-auto text-xs text-gray-500">{i * 7 % 100}%</span></div>'
+        )
+    return f'<nav class="hidden md:block">{"".join(blocks)}</nav><script>window.__DATA__ = {json.dumps(list(range(2000)))};</script>'
+
+
+def render_listing(page_news_items):
+    items_html = "".join(
+        '<article class="flex py-6"><div class="block w-full sm:flex-1">'
+        f'<a class="block text-base font-bold leading-5 hover:underline sm:text-base sm:leading-6 md:text-lg md:leading-7" href="{html.escape(item["item_url"])}">{html.escape(item["title"])}</a>'
+        f'<ul class="mt-2 flex text-xs"><li>Vietstock</li><li class="ml-2">• {html.escape(item["time"])}</li></ul>'
+        '</div></article>'
+        for item in page_news_items
+    )
+    return f'<html><head><title>Tin tức</title></head><body>{page_filler()}<main>{items_html}</main>{page_filler()}</body></html>'
+
+
+def render_article(news_detail_dict):
+    lines = [line.strip() for line in news_detail_dict["main_content"].split(" \n ") if line.strip()]
+    lines_html = "".join(f"<p>{html.escape(line)}</p>" for line in lines)
+    return (
+        f'<html><head><title>{html.escape(news_detail_dict["title"])}</title></head><body>{page_filler()}'
+        '<div class="flex flex-col gap-2 text-warren-gray-700 md:flex-row md:items-center md:gap-0">'
+        f'<div class="flex flex-row items-center"><span>{html.escape(news_detail_dict["posted_date"])}</span></div></div>'
+        f'<div class="article_WYSIWYG__O0uhw article_articlePage__UMz3q text-[18px] leading-8">{lines_html}</div>'
+        f'{page_filler()}</body></html>'
+    )
+
+
+def synthesize_fixtures(fixtures_dir=FIXTURES_DIR, num_listings=3, num_articles=10):
+    """Rebuild listing / article pages from already crawled JSON using the site's markup"""
+    os.makedirs(fixtures_dir, exist_ok=True)
+    listing_paths = sorted(glob.glob(os.path.join(CRAWL_DIR, "save_news_urls", "*.json")))[:num_listings]
+    for i, path in enumerate(listing_paths):
+        with open(os.path.join(fixtures_dir, f"listing_{i}.html"), "w", encoding="utf-8") as file:
+            file.write(render_listing(load_json(path)))
+    
+    articles = []
+    for path in sorted(glob.glob(os.path.join(CRAWL_DIR, "save_news_contents", "*.json"))):
+        articles.extend(load_json(path))
+        if len(articles) >= num_articles:
+            break
+    for i, news_detail_dict in enumerate(articles[:num_articles]):
+        with open(os.path.join(fixtures_dir, f"article_{i}.html"), "w", encoding="utf-8") as file:
+            file.write(render_article(news_detail_dict))
+
+
+def load_fixtures(fixtures_dir, kind):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, f"{kind}_*.html"))):
+        with open(path, "r", encoding="utf-8") as file:
+            pages.append(file.read())
+    return pages
+
+
+#---- Benchmark
+def time_parser(parser, pages, repeat):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            parser(page)
+    elapsed = time.perf_counter() - start_time
+    return len(pages) * repeat / elapsed
+
+
+def bench(fixtures_dir=FIXTURES_DIR, repeat=5):
+    results = {}
+    for kind, reference, fast in [("listing", bs4_parse_listing, parse_listing), ("article", bs4_parse_article, parse_article)]:
+        pages = load_fixtures(fixtures_dir, kind)
+        if not pages:
+            continue
+        for page in pages:
+            if reference(page) != fast(page):
+                raise AssertionError(f"{kind} parsers disagree")
+        reference_rate = time_parser(reference, pages, repeat)
+        fast_rate = time_parser(fast, pages, repeat)
+        results[kind] = {
+            "pages": len(pages),
+            "bs4_pages_per_second": round(reference_rate, 1),
+            "lxml_pages_per_second": round(fast_rate, 1),
+            "speedup": round(fast_rate / reference_rate, 2),
+        }
+    return results
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the lxml extractors against the BeautifulSoup ones")
+    parser.add_argument("--fixtures-dir", default=FIXTURES_DIR)
+    parser.add_argument("--synthesize", action="store_true", help="rebuild fixtures from the saved JSON")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    
+    if args.synthesize or not load_fixtures(args.fixtures_dir, "listing"):
+        synthesize_fixtures(args.fixtures_dir)
+    print(json.dumps(bench(args.fixtures_dir, repeat=args.repeat), indent=3))
@@ -0,0 +1,147 @@
+import os
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+
+#---- Default location
+CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crawl_checkpoints.sqlite")
+
+
+def now_str(offset_seconds=0):
+    return (datetime.now() + timedelta(seconds=offset_seconds)).isoformat(timespec="seconds")
+
+
+#---- Errors
+class FetchError(Exception):
+    """An article that failed every attempt, with what went wrong last"""
+    def __init__(self, url, error_class, message, attempts):
+        super().__init__(f"{url} failed after {attempts} attempts ({error_class}: {message})")
+        self.url = url
+        self.error_class = error_class
+        self.message = message
+        self.attempts = attempts
+    
+    @classmethod
+    def from_exception(cls, url, error, attempts):
+        if isinstance(error, FetchError):
+            return error
+        return cls(url, type(error).__name__, str(error), attempts)
+
+
+#---- Checkpoints + dead letters
+class CheckpointStore():
+    """Per article commits and a dead-letter table of URLs that failed every attempt"""
+    def __init__(self, path=CHECKPOINT_PATH, backoff_seconds=300, max_backoff_seconds=86400):
+        self.path = path
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                url TEXT PRIMARY KEY,
+                page_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                title TEXT,
+                listed_time TEXT,
+                detail TEXT NOT NULL,
+                fetched_at TEXT NOT NULL
+            )
+        """)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS dead_letters (
+                url TEXT PRIMARY KEY,
+                page_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                title TEXT,
+                listed_time TEXT,
+                error_class TEXT,
+                error_message TEXT,
+                attempts INTEGER NOT NULL,
+                retries INTEGER NOT NULL DEFAULT 0,
+                first_failed_at TEXT NOT NULL,
+                last_failed_at TEXT NOT NULL,
+                next_retry_at TEXT NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_checkpoints_page_id ON checkpoints (page_id)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_dead_letters_next_retry_at ON dead_letters (next_retry_at)")
+        self.connection.commit()
+    
+    
+    #---- Checkpoints
+    def commit_article(self, page_id, position, item, news_detail_dict):
+        """Commit one finished article right away and clear it from the dead letters (it moves to the page it was last listed on)"""
+        self.connection.execute(
+            "INSERT INTO checkpoints (url, page_id, position, title, listed_time, detail, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (url) DO UPDATE SET page_id = excluded.page_id, position = excluded.position, title = excluded.title, "
+            "listed_time = excluded.listed_time, detail = excluded.detail, fetched_at = excluded.fetched_at",
+            (item["item_url"], str(page_id), position, item["title"], item["time"], json.dumps(news_detail_dict, ensure_ascii=False), now_str()),
+        )
+        self.connection.execute("DELETE FROM dead_letters WHERE url = ?", (item["item_url"],))
+        self.connection.commit()
+    
+    def done_urls(self, page_id):
+        rows = self.connection.execute("SELECT url FROM checkpoints WHERE page_id = ?", (str(page_id),)).fetchall()
+        return set(row["url"] for row in rows)
+    
+    def page_details(self, page_id):
+        """Checkpointed articles of a page in listing order, in the per page file format"""
+        rows = self.connection.execute(
+            "SELECT title, listed_time, detail FROM checkpoints WHERE page_id = ? ORDER BY position",
+            (str(page_id),),
+        ).fetchall()
+        return [{"title": row["title"], "time": row["listed_time"], **json.loads(row["detail"])} for row in rows]
+    
+    def page_urls(self, page_id):
+        """URLs matching page_details() row for row"""
+        rows = self.connection.execute("SELECT url FROM checkpoints WHERE page_id = ? ORDER BY position", (str(page_id),)).fetchall()
+        return [row["url"] for row in rows]
+    
+    
+    #---- Dead letters
+    def record_failure(self, page_id, position, item, error):
+        """Add / update a dead letter; each failed retry doubles the wait before the next one"""
+        row = self.connection.execute("SELECT retries, attempts FROM dead_letters WHERE url = ?", (item["item_url"],)).fetchone()
+        now = now_str()
+        retries = 0 if row is None else row["retries"] + 1
+        attempts = error.attempts + (0 if row is None else row["attempts"])
+        delay = min(self.backoff_seconds * 2 ** retries, self.max_backoff_seconds)
+        if row is None:
+            self.connection.execute(
+                "INSERT INTO dead_letters (url, page_id, position, title, listed_time, error_class, error_message, attempts, retries, first_failed_at, last_failed_at, next_retry_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?)",
+                (item["item_url"], str(page_id), position, item["title"], item["time"], error.error_class, error.message, attempts, now, now, now_str(delay)),
+            )
+        else:
+            self.connection.execute(
+                "UPDATE dead_letters SET error_class = ?, error_message = ?, attempts = ?, retries = ?, last_failed_at = ?, next_retry_at = ? WHERE url = ?",
+                (error.error_class, error.message, attempts, retries, now, now_str(delay), item["item_url"]),
+            )
+        self.connection.commit()
+    
+    def failed_urls(self, page_id):
+        rows = self.connection.execute("SELECT url FROM dead_letters WHERE page_id = ?", (str(page_id),)).fetchall()
+        return set(row["url"] for row in rows)
+    
+    def due_failures(self, max_retries=None):
+        """Dead letters whose backoff has elapsed, as (page_id, position, item)"""
+        query = "SELECT * FROM dead_letters WHERE next_retry_at <= ?"
+        params = [now_str()]
+        if max_retries is not None:
+            query += " AND retries < ?"
+            params.append(max_retries)
+        rows = self.connection.execute(query + " ORDER BY next_retry_at", params).fetchall()
+        return [
+            (row["page_id"], row["position"], {"item_url": row["url"], "title": row["title"], "time": row["listed_time"]})
+            for row in rows
+        ]
+    
+    def summary(self):
+        """error_class -> number of dead letters"""
+        rows = self.connection.execute("SELECT error_class, COUNT(*) AS n FROM dead_letters GROUP BY error_class").fetchall()
+        return {row["error_class"]: row["n"] for row in rows}
+    
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,152 @@
+import os
+import glob
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+
+
+#---- Default location
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crawl_index.sqlite")
+URLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "save_news_urls")
+CONTENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "save_news_contents")
+
+
+def now_str():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def content_hash(news_detail_dict):
+    text = news_detail_dict.get("posted_date", "") + "\n" + news_detail_dict.get("main_content", "")
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+#---- Saved pages -> URLs
+def saved_articles(contents_dir=CONTENTS_DIR, urls_dir=URLS_DIR):
+    """
+    (file id, position, item_url, news_detail_dict) for every article of the per page content files.
+    Content files carry no URL: it comes from the listing file of the same id, matched on the title
+    (positions shift when failed articles are left out or --retry-failed rewrites a page). Articles
+    without a listing match get item_url None.
+    """
+    for path in sorted(glob.glob(os.path.join(contents_dir, "all_news_content_*.json"))):
+        file_id = os.path.basename(path).split(".")[0].replace("all_news_content_", "")
+        with open(path, "r", encoding="utf-8") as file:
+            page_details = json.load(file)
+        urls_by_title = {}
+        listing_path = os.path.join(urls_dir, f"all_news_item_{file_id}.json")
+        if os.path.isfile(listing_path):
+            with open(listing_path, "r", encoding="utf-8") as file:
+                for item in json.load(file):
+                    urls_by_title.setdefault(item["title"], []).append(item["item_url"])
+        for position, news_detail_dict in enumerate(page_details):
+            urls = urls_by_title.get(news_detail_dict.get("title"))
+            yield file_id, position, urls.pop(0) if urls else None, news_detail_dict
+
+
+#---- Index
+class CrawlIndex():
+    """Persistent article index keyed by URL (listing info, content hash, fetch time, status)"""
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        #-- Concurrent listing shards share the file, wait on their locks instead of failing
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                title TEXT,
+                listed_time TEXT,
+                page_id INTEGER,
+                status TEXT NOT NULL,
+                content_hash TEXT,
+                first_seen_at TEXT NOT NULL,
+                fetched_at TEXT,
+                changed_at TEXT
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_articles_changed_at ON articles (changed_at)")
+        self.connection.commit()
+    
+    def get(self, url):
+        return self.connection.execute("SELECT * FROM articles WHERE url = ?", (url,)).fetchone()
+    
+    def add_listed(self, page_news_items, page_id):
+        """
+        Register listing items, return the ones to fetch (listing order kept): never seen, listed but
+        never fetched (crash) or with an edited headline. Fetched, unchanged URLs are left out, and so are
+        dead letters ('failed'): CheckpointStore.due_failures brings them back once their backoff elapsed.
+        """
+        new_items = []
+        now = now_str()
+        for item in page_news_items:
+            row = self.get(item["item_url"])
+            if row is None:
+                self.connection.execute(
+                    "INSERT INTO articles (url, title, listed_time, page_id, status, first_seen_at) VALUES (?, ?, ?, ?, 'listed', ?)",
+                    (item["item_url"], item["title"], item["time"], page_id, now),
+                )
+                new_items.append(item)
+            elif row["status"] == "failed":
+                continue
+            elif row["title"] != item["title"]:
+                #-- Edited headline: the article is worth fetching again
+                self.connection.execute(
+                    "UPDATE articles SET title = ?, listed_time = ?, changed_at = ? WHERE url = ?",
+                    (item["title"], item["time"], now, item["item_url"]),
+                )
+                new_items.append(item)
+            elif row["status"] == "listed":
+                new_items.append(item)
+        self.connection.commit()
+        return new_items
+    
+    def record_fetch(self, url, news_detail_dict):
+        """Store the fetch result, return True when the content differs from the last fetch"""
+        new_hash = content_hash(news_detail_dict)
+        row = self.get(url)
+        now = now_str()
+        if row is None:
+            self.connection.execute(
+                "INSERT INTO articles (url, status, content_hash, first_seen_at, fetched_at) VALUES (?, 'fetched', ?, ?, ?)",
+                (url, new_hash, now, now),
+            )
+            changed = True
+        else:
+            changed = row["content_hash"] != new_hash
+            #-- First fetch of a listed article is not a change
+            mark_changed = changed and row["content_hash"] is not None
+            self.connection.execute(
+                "UPDATE articles SET status = 'fetched', content_hash = ?, fetched_at = ?, changed_at = CASE WHEN ? THEN ? ELSE changed_at END WHERE url = ?",
+                (new_hash, now, mark_changed, now, url),
+            )
+        self.connection.commit()
+        return changed
+    
+    def record_failure(self, url):
+        self.connection.execute(
+            "UPDATE articles SET status = 'failed', fetched_at = ? WHERE url = ? AND status != 'fetched'",
+            (now_str(), url),
+        )
+        self.connection.commit()
+    
+    def changed_since(self, since):
+        """Articles whose listing entry or content changed at or after `since` (ISO date / datetime)"""
+        rows = self.connection.execute(
+            "SELECT url, title, listed_time, page_id FROM articles WHERE changed_at >= ? ORDER BY changed_at",
+            (since,),
+        ).fetchall()
+        return [{"item_url": row["url"], "title": row["title"], "time": row["listed_time"], "page_id": row["page_id"]} for row in rows]
+    
+    def pending(self, include_failed=True):
+        """Listed but never fetched successfully; `include_failed=False` leaves dead letters to their retry backoff"""
+        statuses = ("listed", "failed") if include_failed else ("listed",)
+        rows = self.connection.execute(
+            f"SELECT url, title, listed_time, page_id FROM articles WHERE status IN ({','.join('?' * len(statuses))}) ORDER BY first_seen_at",
+            statuses,
+        ).fetchall()
+        return [{"item_url": row["url"], "title": row["title"], "time": row["listed_time"], "page_id": row["page_id"]} for row in rows]
+    
+    def close(self):
+        self.connection.close()
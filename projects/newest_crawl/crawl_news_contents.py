@@ -1,43 +1,145 @@
 import os
+import sys
 import json
+import time
 import asyncio
+import argparse
+import aiohttp
 from tqdm import tqdm
 from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
+from investing_crawling_async import Crawler
+from html_extract import parse_article, parse_article_if_present, run_parser
+from site_extractors import EXTRACTORS, EXTRACTION_STATS
+from crawl_checkpoint import CheckpointStore, FetchError
+from fetch_profile import PROFILE_SPECS, make_profile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "monitoring"))
+from metrics import METRICS
 
 #---- Load json
 def load_json(path):
     with open(path, "r", encoding="utf-8") as file:
         json_content = json.load(file)
         return json_content
-    
+
 #---- Save json
 def save_json(path, content):
     with open(path, "w", encoding="utf-8") as file:
         json.dump(content, file, ensure_ascii=False, indent=3)
-        
+
+
+
+#---- Readiness selectors (the nodes parse_news_details reads, any primary or fallback selector of the registry)
+POSTED_DATE_SELECTOR = EXTRACTORS["investing_article"].any_css("posted_date", parent_field="date_box")
+ARTICLE_LINE_SELECTOR = EXTRACTORS["investing_article"].any_css("line", parent_field="body")
+
+
+#---- Page pool
+class PageSlot():
+    """Stands in the idle queue for a page that could not be reopened; acquire() opens it"""
+    def __init__(self, context):
+        self.context = context
+
+
+class PagePool():
+    """Fixed set of reusable pages spread over several browser contexts; `profile` (FetchProfile) is applied to every page opened"""
+    def __init__(self, contexts, pages_per_context=4, max_page_uses=50, profile=None):
+        self.contexts = contexts
+        self.pages_per_context = pages_per_context
+        self.max_page_uses = max_page_uses
+        self.profile = profile
+        self.idle_pages = asyncio.Queue()
+        self.page_contexts = {}
+        self.page_uses = {}
+    
+    @property
+    def size(self):
+        return len(self.contexts) * self.pages_per_context
+    
+    async def open_page(self, context):
+        page = await context.new_page()
+        if self.profile is not None:
+            await self.profile.apply(page)
+        self.page_contexts[page] = context
+        self.page_uses[page] = 0
+        return page
+    
+    async def fill(self):
+        for context in self.contexts:
+            for _ in range(self.pages_per_context):
+                page = await self.open_page(context)
+                self.idle_pages.put_nowait(page)
+    
+    async def recycle(self, page):
+        """Replace a worn out or broken page with a fresh one in the same context (a PageSlot when that fails twice)"""
+        context = self.page_contexts.pop(page)
+        self.page_uses.pop(page)
+        if self.profile is not None:
+            self.profile.forget(page)
+        try:
+            await page.close()
+        except Exception as e:
+            print(f"Error closing recycled page: {e}")
+        for attempt in range(2):
+            try:
+                return await self.open_page(context)
+            except Exception as e:
+                print(f"Error opening page (attempt {attempt + 1}/2): {e}")
+        #-- The pool never shrinks: the next acquire tries again
+        return PageSlot(context)
+    
+    async def acquire(self):
+        page = await self.idle_pages.get()
+        if isinstance(page, PageSlot):
+            try:
+                return await self.open_page(page.context)
+            except Exception:
+                self.idle_pages.put_nowait(page)
+                raise
+        return page
+    
+    async def release(self, page, broken=False):
+        self.page_uses[page] += 1
+        if broken or self.page_uses[page] >= self.max_page_uses:
+            page = await self.recycle(page)
+        self.idle_pages.put_nowait(page)
+    
+    async def close(self):
+        for page in list(self.page_contexts):
+            if self.profile is not None:
+                self.profile.forget(page)
+            try:
+                await page.close()
+            except Exception:
+                pass
+        self.page_contexts.clear()
+        self.page_uses.clear()
 
 
 # Playwright
 class PlaywrightScrolling():
-    def __init__(self):
+    def __init__(self, num_contexts=2, pages_per_context=4, max_page_uses=50, goto_timeout=60000, ready_timeout=15000, date_timeout=2000, profile=None):
         self.playwright = None
         self.browser = None
         self.page = None
         self.url = None
+        self.context = None
+        self.contexts = []
+        self.page_pool = None
+        
+        #-- Pool configuration: never more than num_contexts * pages_per_context open pages
+        self.num_contexts = num_contexts
+        self.pages_per_context = pages_per_context
+        self.max_page_uses = max_page_uses
+        self.goto_timeout = goto_timeout
+        self.ready_timeout = ready_timeout
+        self.date_timeout = date_timeout
+        
+        #-- Headless, images / fonts / css / ads / third party scripts aborted; make_profile("full", headless=False) is the old behaviour
+        self.profile = profile if profile is not None else make_profile("article")
     
-    async def initialize(self):
-        """Initialize the playwright instance and browser"""
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
-            headless=False,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--no-sandbox'
-            ]
-        )
-        self.context = await self.browser.new_context(
+    async def new_context(self):
+        context = await self.browser.new_context(
             user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             viewport={'width': 600, 'height': 600},
             locale='vi-VN',
@@ -51,68 +153,166 @@ class PlaywrightScrolling():
                 'Upgrade-Insecure-Requests': '1'
             }
         )
-        await self.context.add_init_script("""
+        await context.add_init_script("""
             Object.defineProperty(navigator, 'webdriver', {
                 get: () => undefined
             });
         """)
-        
-        
+        return context
+    
+    async def initialize(self):
+        """Initialize the playwright instance, browser and page pool"""
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(
+            headless=self.profile.headless,
+            args=[
+                '--disable-blink-features=AutomationControlled',
+                '--disable-dev-shm-usage',
+                '--no-sandbox'
+            ]
+        )
+        self.contexts = [await self.new_context() for _ in range(self.num_contexts)]
+        self.context = self.contexts[0]
+        self.page_pool = PagePool(
+            contexts=self.contexts,
+            pages_per_context=self.pages_per_context,
+            max_page_uses=self.max_page_uses,
+            profile=self.profile,
+        )
+        await self.page_pool.fill()
+    
+    
     async def get_page_content(self, page):
         return await page.content()
     
     
     async def parse_news_details(self, html):
-        soup = BeautifulSoup(html, "html.parser")
-        
-        #-- Date posted
-        posted_date_html = soup.find("div", class_="flex flex-col gap-2 text-warren-gray-700 md:flex-row md:items-center md:gap-0")
-        posted_date_html = posted_date_html.find("div", class_="flex flex-row items-center")
-        posted_date_str = posted_date_html.text
-        
-        #-- Main texts
-        main_content_html = soup.find("div", class_="article_WYSIWYG__O0uhw article_articlePage__UMz3q text-[18px] leading-8")
-        all_content_lines = main_content_html.find_all("p")
-        main_content = ""
-        for line in all_content_lines:
-            main_content += line.text.strip() + " \n "
-        
-        #-- Combined
-        news_detail_dict = {
-            "posted_date": posted_date_str,
-            "main_content": main_content,
-        }
-        return news_detail_dict
-        
+        return await run_parser(parse_article, html)
+    
+    
+    async def wait_until_ready(self, page):
+        """Wait for the nodes parse_news_details reads instead of sleeping a fixed time; only the body is required"""
+        await page.wait_for_selector(ARTICLE_LINE_SELECTOR, state="attached", timeout=self.ready_timeout)
+        try:
+            await page.wait_for_selector(POSTED_DATE_SELECTOR, state="attached", timeout=self.date_timeout)
+        except Exception:
+            #-- The parser degrades a missing date to ""
+            pass
+    
     
     async def get_news_details (self, url, attempts=3):
+        """Raises FetchError once every attempt failed"""
+        last_error = None
         for attempt in range(attempts):
+            if attempt:
+                METRICS.increment("browser.retries")
+            try:
+                page = await self.page_pool.acquire()
+            except Exception as e:
+                #-- The slot went back to the pool, this attempt failed
+                last_error = e
+                print(f"Attempt {attempt + 1}/{attempts} could not open a page for {url}: {e}")
+                continue
+            broken = False
+            start_time = time.perf_counter()
+            self.profile.reset(page)
             try:
-                page = await self.context.new_page()
-                await page.goto(url, wait_until='domcontentloaded', timeout=500000)
-                await asyncio.sleep(3)
+                await page.goto(url, wait_until='domcontentloaded', timeout=self.goto_timeout)
+                await self.wait_until_ready(page)
                 
                 page_html = await self.get_page_content(page)
+                METRICS.increment("browser.bytes_fetched", len(page_html.encode("utf-8")))
                 news_detail_dict = await self.parse_news_details(html=page_html)
+                METRICS.timing("browser.fetch", time.perf_counter() - start_time, tags={"outcome": "ok"})
                 return news_detail_dict
             except Exception as e:
+                broken = True
+                last_error = e
+                #-- Playwright raises its own TimeoutError class
+                outcome = "timeout" if "Timeout" in type(e).__name__ else type(e).__name__
+                METRICS.timing("browser.fetch", time.perf_counter() - start_time, tags={"outcome": outcome})
+                METRICS.increment("browser.timeouts" if outcome=="timeout" else "browser.errors", tags={"error": outcome})
                 print(f"Attempt {attempt + 1}/{attempts} failed for {url}: {e}")
                 if attempt < attempts - 1:
                     await asyncio.sleep(0.5)
             finally:
-                if page:
-                    await page.close()
-        return None
+                #-- Failed loads count too (before release, which may recycle the page)
+                await self.profile.collect(page)
+                await self.page_pool.release(page, broken=broken)
+        raise FetchError.from_exception(url, last_error, attempts)
     
     
     async def close(self):
         """Close browser and playwright"""
+        if self.page_pool:
+            await self.page_pool.close()
         if self.browser:
             await self.browser.close()
         if self.playwright:
             await self.playwright.stop()
-            
-            
+
+
+#---- Hybrid fetcher
+class HybridFetcher():
+    """Fetch articles with a pooled aiohttp session, render with Playwright only as a fallback"""
+    def __init__(self, scroller=None, max_connections=20, http_retries=1):
+        self.crawler = Crawler()
+        self.scroller = scroller if scroller is not None else PlaywrightScrolling()
+        self.max_connections = max_connections
+        self.http_retries = http_retries
+        self.session = None
+        self.browser_ready = False
+        self.browser_lock = asyncio.Lock()
+        self.stats = {"http": 0, "browser": 0, "failed": 0}
+    
+    async def initialize(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_connections)
+        self.session = aiohttp.ClientSession(connector=connector, trust_env=True)
+    
+    async def ensure_browser(self):
+        """Launch the browser on the first fallback only"""
+        async with self.browser_lock:
+            if not self.browser_ready:
+                await self.scroller.initialize()
+                self.browser_ready = True
+    
+    async def get_news_details_http(self, url):
+        html = await self.crawler.request_url(self.session, url, max_retries=self.http_retries)
+        #-- Blocked (non 200 / timeout)
+        if html is None:
+            return None
+        try:
+            #-- None when served without any known article container
+            return await run_parser(parse_article_if_present, html)
+        except Exception as e:
+            print(f"HTTP parse failed for {url}: {e}")
+            return None
+    
+    async def get_news_details(self, url, attempts=3):
+        news_detail_dict = await self.get_news_details_http(url)
+        if news_detail_dict is not None:
+            self.stats["http"] += 1
+            METRICS.increment("fetcher.articles", tags={"path": "http"})
+            return news_detail_dict
+        
+        await self.ensure_browser()
+        try:
+            news_detail_dict = await self.scroller.get_news_details(url, attempts=attempts)
+        except Exception:
+            self.stats["failed"] += 1
+            METRICS.increment("fetcher.articles", tags={"path": "failed"})
+            raise
+        self.stats["browser"] += 1
+        METRICS.increment("fetcher.articles", tags={"path": "browser"})
+        return news_detail_dict
+    
+    async def close(self):
+        if self.session:
+            await self.session.close()
+        if self.browser_ready:
+            await self.scroller.close()
+
+
 def get_id_from_path(path):
     template = "all_news_item_"
     basename = os.path.basename(path)
@@ -120,65 +320,105 @@ def get_id_from_path(path):
     page_id = basename.replace(template, "")
     return page_id
 
-            
+
+async def fetch_and_checkpoint(fetcher, checkpoints, page_id, position, item):
+    """Commit the article as soon as it is done, or dead-letter it"""
+    try:
+        news_detail_dict = await fetcher.get_news_details(item["item_url"])
+    except Exception as e:
+        error = FetchError.from_exception(item["item_url"], e, attempts=1)
+        print(f"Dead letter: {error}")
+        checkpoints.record_failure(page_id, position, item, error)
+        return False
+    checkpoints.commit_article(page_id, position, item, news_detail_dict)
+    return True
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crawl article contents of saved listing pages")
+    parser.add_argument("--retry-failed", action="store_true", help="only reprocess dead-lettered URLs whose backoff elapsed")
+    parser.add_argument("--max-retries", type=int, default=None, help="give up on dead letters retried this many times")
+    parser.add_argument("--profile", default="article", choices=sorted(PROFILE_SPECS), help="which requests the browser fallback aborts")
+    parser.add_argument("--headed", action="store_true", help="show the browser window")
+    return parser.parse_args()
+
+
 async def main():
     # url = "https://vn.investing.com/news/stock-market-news/2001-doc-gi-truoc-gio-giao-dich-chung-khoan-2514598"
     # cache_url = f"https://webcache.googleusercontent.com/search?q=cache:{quote(target_url)}"
-    
-    scroller = PlaywrightScrolling()
-    await scroller.initialize()
+    args = parse_args()
     
     #-- Configuration
     time_wait = 0.5
+    num_contexts = 2
+    pages_per_context = 4
+    
+    profile = make_profile(args.profile, headless=False if args.headed else None)
+    scroller = PlaywrightScrolling(num_contexts=num_contexts, pages_per_context=pages_per_context, profile=profile)
+    fetcher = HybridFetcher(scroller=scroller)
+    await fetcher.initialize()
+    checkpoints = CheckpointStore()
+    start_time = time.perf_counter()
+    num_articles = 0
     
-    #-- Parsing news
     # page_urls_dir = r"C:\APAC\all_projects\finetuning-airflow-project\projects\newest_crawl\save_news_urls"
     page_urls_dir = r"F:\UNIVERSITY\Project\Sentiment-Analysis-Airflow\Financial-Sentiment-Analysis\projects\newest_crawl\save_news_urls"
-    page_urls_paths = [os.path.join(page_urls_dir, file_name) for file_name in os.listdir(page_urls_dir)]
-    for page_urls_path in tqdm(page_urls_paths):
-        try:
-            # save_content_dir = r"C:\APAC\all_projects\finetuning-airflow-project\projects\newest_crawl\save_news_contents"
-            save_content_dir = r"F:\UNIVERSITY\Project\Sentiment-Analysis-Airflow\Financial-Sentiment-Analysis\projects\newest_crawl\save_news_contents"
-            save_id = get_id_from_path(page_urls_path)
-            save_path = os.path.join(save_content_dir, f"all_news_content_{save_id}.json")
-            page_urls_json = load_json(page_urls_path)
-            
-            #~ Gather
-            if os.path.isfile(save_path):
-                continue
-            
-            news_urls = []
-            news_titles = []
-            news_times = []
-            for item in page_urls_json:
-                news_urls.append(item["item_url"])
-                news_titles.append(item["title"])
-                news_times.append(item["time"])
+    # save_content_dir = r"C:\APAC\all_projects\finetuning-airflow-project\projects\newest_crawl\save_news_contents"
+    save_content_dir = r"F:\UNIVERSITY\Project\Sentiment-Analysis-Airflow\Financial-Sentiment-Analysis\projects\newest_crawl\save_news_contents"
+    
+    if args.retry_failed:
+        #-- Dead letters only, then rewrite the page files they belong to
+        due_failures = checkpoints.due_failures(max_retries=args.max_retries)
+        print(f"Retrying {len(due_failures)} failed articles")
+        tasks = [fetch_and_checkpoint(fetcher, checkpoints, page_id, position, item) for page_id, position, item in due_failures]
+        results = await asyncio.gather(*tasks)
+        num_articles = sum(results)
+        for page_id in sorted(set(page_id for page_id, _, _ in due_failures)):
+            save_json(
+                path=os.path.join(save_content_dir, f"all_news_content_{page_id}.json"),
+                content=checkpoints.page_details(page_id)
+            )
+    else:
+        #-- Parsing news
+        page_urls_paths = [os.path.join(page_urls_dir, file_name) for file_name in os.listdir(page_urls_dir)]
+        for page_urls_path in tqdm(page_urls_paths):
+            try:
+                save_id = get_id_from_path(page_urls_path)
+                save_path = os.path.join(save_content_dir, f"all_news_content_{save_id}.json")
+                page_urls_json = load_json(page_urls_path)
                 
-            tasks = []
-            for url in news_urls:
-                tasks.append(scroller.get_news_details(url))
+                #~ Gather
+                if os.path.isfile(save_path):
+                    continue
                 
-            news_details = await asyncio.gather(*tasks)
-            page_details = [
-                {
-                    "title": title,
-                    "time": time,
-                    **detail,
-                }
-                for title, time, detail in zip(news_titles, news_times, news_details) if detail is not None
-            ]
-            
-            #-- Save parsing news contents
-            save_json(
-                path=save_path, 
-                content=page_details
-            )    
-        except Exception as e:
-            print(f"Error is: {e}")
-        await asyncio.sleep(time_wait)
-    await scroller.close()
+                #-- Resume: articles committed (or dead-lettered) before a crash are not fetched again
+                handled_urls = checkpoints.done_urls(save_id) | checkpoints.failed_urls(save_id)
+                tasks = []
+                for position, item in enumerate(page_urls_json):
+                    if item["item_url"] not in handled_urls:
+                        tasks.append(fetch_and_checkpoint(fetcher, checkpoints, save_id, position, item))
+                results = await asyncio.gather(*tasks)
+                num_articles += sum(results)
+                
+                #-- Every article is committed or dead-lettered: the page file can be written
+                save_json(
+                    path=save_path, 
+                    content=checkpoints.page_details(save_id)
+                )    
+            except Exception as e:
+                print(f"Error is: {e}")
+            await asyncio.sleep(time_wait)
+    await fetcher.close()
+    print(f"Fetched over HTTP: {fetcher.stats['http']}, browser: {fetcher.stats['browser']}, failed: {fetcher.stats['failed']}")
+    print(f"Dead letters by error: {checkpoints.summary()}")
+    checkpoints.close()
+    
+    elapsed_minutes = (time.perf_counter() - start_time) / 60
+    if elapsed_minutes > 0:
+        print(f"Crawled {num_articles} articles ({num_articles / elapsed_minutes:.1f} articles/min)")
+    print(EXTRACTION_STATS.report())
+    print(profile.report())
 
 
 if __name__=="__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,357 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import aiohttp
+from datetime import datetime
+from tqdm import tqdm
+from investing_crawling_async import PageScheduler, AdaptiveLimit, Crawler, save_json
+from crawl_news_contents import PlaywrightScrolling, HybridFetcher
+from crawl_index import CrawlIndex
+from site_extractors import EXTRACTION_STATS
+from crawl_checkpoint import CheckpointStore, FetchError
+from article_dedup import DedupIndex
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "storage"))
+from corpus_store import CorpusStore, BufferedWriter
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "preprocessing"))
+from sentence_index import SentenceIndex
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "monitoring"))
+from metrics import METRICS
+
+
+#---- Default locations
+CRAWL_DIR = os.path.dirname(os.path.abspath(__file__))
+URLS_DIR = os.path.join(CRAWL_DIR, "save_news_urls")
+CONTENTS_DIR = os.path.join(CRAWL_DIR, "save_news_contents")
+STREAM_PATH = os.path.join(CRAWL_DIR, "news_contents_stream.jsonl")
+
+
+#---- Pipeline
+class CrawlPipeline():
+    """Listing crawl -> content crawl -> writer, joined by bounded queues"""
+    def __init__(
+        self,
+        fetcher,
+        index=None,
+        store=None,
+        checkpoints=None,
+        dedup=None,
+        sentence_index=None,
+        incremental=False,
+        max_pages=1001,
+        max_listing_concurrency=8,
+        num_content_workers=16,
+        queue_size=200,
+        urls_dir=URLS_DIR,
+        contents_dir=CONTENTS_DIR,
+        stream_path=STREAM_PATH,
+    ):
+        self.crawler = Crawler()
+        self.fetcher = fetcher
+        self.index = index
+        self.store = store
+        self.checkpoints = checkpoints
+        self.dedup = dedup
+        self.sentence_index = sentence_index
+        self.incremental = incremental
+        self.max_pages = max_pages
+        self.num_content_workers = num_content_workers
+        self.urls_dir = urls_dir
+        self.contents_dir = contents_dir
+        self.stream_path = stream_path
+        
+        #-- Page ids shift as news is published, so incremental runs get their own file names
+        self.run_tag = datetime.now().strftime("%Y%m%d%H%M%S") if incremental else None
+        self.scheduler = PageScheduler(
+            crawler=self.crawler,
+            max_pages=max_pages,
+            limit=AdaptiveLimit(initial=max_listing_concurrency, maximum=max_listing_concurrency),
+            skip_page=None if incremental else lambda page_id: os.path.isfile(self.get_content_path(page_id)),
+            on_page=self.on_listing_page,
+        )
+        
+        #-- Bounded queues give backpressure: listing waits when content workers fall behind
+        self.url_queue = asyncio.Queue(maxsize=queue_size)
+        self.result_queue = asyncio.Queue(maxsize=queue_size)
+        
+        self.page_sizes = {}
+        self.page_results = {}
+        self.num_articles = 0
+        self.retrying = False
+        #-- Pages resumed from the checkpoints, written back from them
+        self.resumed_pages = set()
+        #-- URLs already queued in this run (re-queued pending ones are not fed again from the listing)
+        self.queued_urls = set()
+    
+    def get_file_id(self, page_id):
+        if self.run_tag is None:
+            return page_id
+        return f"{self.run_tag}_{page_id}"
+    
+    def get_listing_path(self, page_id):
+        return os.path.join(self.urls_dir, f"all_news_item_{self.get_file_id(page_id)}.json")
+    
+    def get_content_path(self, page_id):
+        return os.path.join(self.contents_dir, f"all_news_content_{self.get_file_id(page_id)}.json")
+    
+    
+    #---- Stage 1: listing pages (driven by PageScheduler)
+    async def feed_items(self, page_id, page_news_items, positions=None):
+        """`positions` are the items' places in the listing page, when only part of it is fed"""
+        self.page_sizes[page_id] = len(page_news_items)
+        self.page_results[page_id] = [None] * len(page_news_items)
+        if positions is None:
+            positions = range(len(page_news_items))
+        self.queued_urls.update(item["item_url"] for item in page_news_items)
+        for index, (position, item) in enumerate(zip(positions, page_news_items)):
+            await self.url_queue.put((page_id, index, position, item))
+    
+    async def on_listing_page(self, page_id, page_news_items):
+        if self.index is not None:
+            new_items = self.index.add_listed(page_news_items, page_id)
+            if self.incremental and len(new_items) < len(page_news_items):
+                #-- Listing is newest first: stop at the first URL already fetched (and unchanged), skip dead letters
+                new_urls = set(item["item_url"] for item in new_items)
+                first_fetched = next(
+                    (i for i, item in enumerate(page_news_items) if item["item_url"] not in new_urls and self.index.get(item["item_url"])["status"] == "fetched"),
+                    None,
+                )
+                if first_fetched is not None:
+                    page_news_items = page_news_items[:first_fetched]
+                    self.scheduler.mark_last_page(page_id)
+                page_news_items = [item for item in page_news_items if item["item_url"] in new_urls]
+        page_news_items = [item for item in page_news_items if item["item_url"] not in self.queued_urls]
+        if not page_news_items:
+            return
+        save_json(path=self.get_listing_path(page_id), content=page_news_items)
+        if self.store is not None:
+            self.store.append("news_urls", [{"page_id": str(self.get_file_id(page_id)), **item} for item in page_news_items])
+        
+        #-- Resume: articles committed (or dead-lettered) before a crash are not fetched again
+        positions = range(len(page_news_items))
+        if self.checkpoints is not None:
+            handled_urls = self.checkpoints.done_urls(self.get_file_id(page_id)) | self.checkpoints.failed_urls(self.get_file_id(page_id))
+            if handled_urls:
+                self.resumed_pages.add(page_id)
+                positions = [position for position, item in enumerate(page_news_items) if item["item_url"] not in handled_urls]
+                page_news_items = [page_news_items[position] for position in positions]
+                if not page_news_items:
+                    self.write_page_from_checkpoints(page_id)
+                    return
+        await self.feed_items(page_id, page_news_items, positions=positions)
+    
+    
+    #---- Stage 2: article contents
+    async def content_worker(self):
+        while True:
+            job = await self.url_queue.get()
+            if job is None:
+                return
+            page_id, index, position, item = job
+            error = None
+            try:
+                detail = await self.fetcher.get_news_details(item["item_url"])
+            except Exception as e:
+                print(f"Error fetching {item['item_url']}: {e}")
+                detail = None
+                error = FetchError.from_exception(item["item_url"], e, attempts=1)
+            await self.result_queue.put((page_id, index, position, item, detail, error))
+    
+    
+    #---- Stage 3: writer
+    def write_page_from_checkpoints(self, page_id):
+        save_json(path=self.get_content_path(page_id), content=self.checkpoints.page_details(self.get_file_id(page_id)))
+    
+    def flush_page(self, page_id):
+        if self.retrying or page_id in self.resumed_pages:
+            #-- Whole page from the checkpoints, so retried / resumed articles land next to the earlier ones
+            self.page_results.pop(page_id)
+            self.page_sizes.pop(page_id)
+            self.write_page_from_checkpoints(page_id)
+            return
+        page_details = [
+            {
+                "title": item["title"],
+                "time": item["time"],
+                **detail,
+            }
+            for item, detail in self.page_results.pop(page_id) if detail is not None
+        ]
+        self.page_sizes.pop(page_id)
+        save_json(path=self.get_content_path(page_id), content=page_details)
+    
+    async def writer(self, progress):
+        pending = {}
+        store_writer = BufferedWriter(self.store, "news_contents") if self.store is not None else None
+        with open(self.stream_path, "a", encoding="utf-8") as stream_file:
+            while True:
+                result = await self.result_queue.get()
+                if result is None:
+                    break
+                page_id, index, position, item, detail, error = result
+                self.page_results[page_id][index] = (item, detail)
+                pending[page_id] = pending.get(page_id, 0) + 1
+                progress.update(1)
+                METRICS.increment("pipeline.articles", tags={"outcome": "ok" if detail is not None else "failed"})
+                METRICS.gauge("pipeline.queue_depth", self.url_queue.qsize(), tags={"queue": "url"})
+                METRICS.gauge("pipeline.queue_depth", self.result_queue.qsize(), tags={"queue": "result"})
+                
+                #-- Stream each article out as soon as it is done
+                if detail is not None:
+                    self.num_articles += 1
+                    record = {"page_id": page_id, "item_url": item["item_url"], "title": item["title"], "time": item["time"], **detail}
+                    #-- Duplicates point at the first copy so translation / scoring can reuse its results
+                    if self.dedup is not None:
+                        record.update(self.dedup.check_and_add(item["item_url"], detail.get("main_content", "")).to_dict())
+                    if self.sentence_index is not None:
+                        self.sentence_index.add_article(item["item_url"], detail.get("main_content", ""), title=item["title"], posted_date=detail.get("posted_date"))
+                    stream_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    stream_file.flush()
+                    if store_writer is not None:
+                        store_writer.write({**record, "page_id": str(self.get_file_id(page_id))})
+                if self.checkpoints is not None:
+                    if detail is not None:
+                        self.checkpoints.commit_article(self.get_file_id(page_id), position, item, detail)
+                    else:
+                        self.checkpoints.record_failure(self.get_file_id(page_id), position, item, error)
+                if self.index is not None:
+                    if detail is not None:
+                        self.index.record_fetch(item["item_url"], detail)
+                    else:
+                        self.index.record_failure(item["item_url"])
+                
+                #-- Page complete: write the per page file the downstream notebooks read
+                if pending[page_id] == self.page_sizes[page_id]:
+                    pending.pop(page_id)
+                    self.flush_page(page_id)
+        if store_writer is not None:
+            store_writer.close()
+    
+    
+    async def feed_retries(self, due_failures):
+        pages = {}
+        for page_id, position, item in due_failures:
+            pages.setdefault(page_id, []).append((position, item))
+        for page_id, entries in pages.items():
+            await self.feed_items(page_id, [item for _, item in entries], positions=[position for position, _ in entries])
+    
+    async def feed(self, session, content_tasks, refetch_items=None, due_failures=None):
+        """Stages 1 and 2 up to the writer's end marker"""
+        if due_failures is not None:
+            self.retrying = True
+            await self.feed_retries(due_failures)
+        elif refetch_items is None:
+            if self.index is not None:
+                pending_items = [{key: item[key] for key in ("item_url", "title", "time")} for item in self.index.pending(include_failed=False)]
+                if pending_items:
+                    print(f"Re-queueing {len(pending_items)} listed but unfetched articles")
+                    #-- Incremental runs tag their file names already
+                    pending_page_id = "pending" if self.run_tag is not None else f"pending_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+                    await self.feed_items(pending_page_id, pending_items)
+            await self.scheduler.run(session)
+        elif refetch_items:
+            await self.feed_items("refetch", refetch_items)
+        for _ in content_tasks:
+            await self.url_queue.put(None)
+        await asyncio.gather(*content_tasks)
+        await self.result_queue.put(None)
+    
+    async def run(self, refetch_items=None, due_failures=None):
+        """
+        Crawl the listing, or only `refetch_items` / dead-lettered `due_failures` when given.
+        A listing crawl first re-queues the indexed URLs a crash left unfetched.
+        """
+        progress = tqdm(desc="Articles")
+        async with aiohttp.ClientSession(trust_env=True) as session:
+            writer_task = asyncio.create_task(self.writer(progress))
+            content_tasks = [asyncio.create_task(self.content_worker()) for _ in range(self.num_content_workers)]
+            feed_task = asyncio.create_task(self.feed(session, content_tasks, refetch_items=refetch_items, due_failures=due_failures))
+            
+            #-- A crashed writer would leave the workers blocked on a full result queue (and a crashed feed the writer waiting)
+            await asyncio.wait([feed_task, writer_task], return_when=asyncio.FIRST_EXCEPTION)
+            if not (feed_task.done() and writer_task.done()):
+                for task in [feed_task, writer_task, *content_tasks]:
+                    task.cancel()
+                await asyncio.gather(feed_task, writer_task, *content_tasks, return_exceptions=True)
+            for task in (writer_task, feed_task):
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        progress.close()
+        return self.num_articles
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crawl vn.investing.com news listing and article contents")
+    parser.add_argument("--max-pages", type=int, default=1001)
+    parser.add_argument("--incremental", action="store_true", help="stop at the first already indexed article")
+    parser.add_argument("--refetch-changed-since", default=None, help="only refetch indexed articles changed since this ISO date")
+    parser.add_argument("--retry-failed", action="store_true", help="only reprocess dead-lettered URLs whose backoff elapsed")
+    parser.add_argument("--max-retries", type=int, default=None, help="give up on dead letters retried this many times")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    
+    #-- Configuration
+    max_listing_concurrency = 8
+    num_content_workers = 16
+    queue_size = 200
+    
+    os.makedirs(URLS_DIR, exist_ok=True)
+    os.makedirs(CONTENTS_DIR, exist_ok=True)
+    
+    index = CrawlIndex()
+    store = CorpusStore()
+    checkpoints = CheckpointStore()
+    dedup = DedupIndex()
+    sentence_index = SentenceIndex()
+    fetcher = HybridFetcher(scroller=PlaywrightScrolling())
+    await fetcher.initialize()
+    pipeline = CrawlPipeline(
+        fetcher=fetcher,
+        index=index,
+        store=store,
+        checkpoints=checkpoints,
+        dedup=dedup,
+        sentence_index=sentence_index,
+        incremental=args.incremental or args.refetch_changed_since is not None,
+        max_pages=args.max_pages,
+        max_listing_concurrency=max_listing_concurrency,
+        num_content_workers=num_content_workers,
+        queue_size=queue_size,
+    )
+    refetch_items = None
+    if args.refetch_changed_since is not None:
+        refetch_items = index.changed_since(args.refetch_changed_since)
+        print(f"Refetching {len(refetch_items)} changed articles")
+    due_failures = None
+    if args.retry_failed:
+        due_failures = checkpoints.due_failures(max_retries=args.max_retries)
+        print(f"Retrying {len(due_failures)} failed articles")
+    
+    start_time = time.perf_counter()
+    try:
+        num_articles = await pipeline.run(refetch_items=refetch_items, due_failures=due_failures)
+    finally:
+        await fetcher.close()
+        index.close()
+    print(f"Dead letters by error: {checkpoints.summary()}")
+    checkpoints.close()
+    print(f"Articles by duplicate kind: {dedup.summary()}")
+    dedup.close()
+    print(f"Sentence index: {sentence_index.summary()}")
+    sentence_index.close()
+    
+    elapsed_minutes = (time.perf_counter() - start_time) / 60
+    if elapsed_minutes > 0:
+        print(f"Crawled {num_articles} articles ({num_articles / elapsed_minutes:.1f} articles/min)")
+    print(EXTRACTION_STATS.report())
+
+
+if __name__=="__main__":
+    asyncio.run(main())
+    print("Crawling completed!")
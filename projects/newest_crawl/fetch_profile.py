@@ -0,0 +1,236 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+from urllib.parse import urlparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "monitoring"))
+from metrics import METRICS
+
+
+#---- What extraction never needs
+HEAVY_RESOURCE_TYPES = ("image", "media", "font", "manifest", "texttrack")
+AD_TRACKER_DOMAINS = (
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "googletagmanager.com", "google-analytics.com",
+    "googletagservices.com", "adservice.google.com", "amazon-adsystem.com", "adnxs.com", "criteo.com", "criteo.net",
+    "pubmatic.com", "rubiconproject.com", "openx.net", "casalemedia.com", "taboola.com", "outbrain.com",
+    "scorecardresearch.com", "quantserve.com", "moatads.com", "2mdn.net", "facebook.net", "connect.facebook.com",
+    "hotjar.com", "clarity.ms", "bat.bing.com", "onetrust.com", "cookielaw.org", "sentry.io", "newrelic.com", "nr-data.net",
+)
+#-- Article pages: first party, its CDN and the bot challenge; everything else is third party
+INVESTING_DOMAINS = ("investing.com", "i-invdn.com", "challenges.cloudflare.com")
+
+#-- Aborted requests report no size: bytes saved are estimated per block reason (rough transfer sizes of an
+#-- unblocked article load, see `compare` to measure them on a real URL)
+ESTIMATED_BLOCKED_BYTES = {
+    "image": 40 * 1024,
+    "media": 200 * 1024,
+    "font": 30 * 1024,
+    "manifest": 1024,
+    "texttrack": 4 * 1024,
+    "stylesheet": 25 * 1024,
+    "ad_tracker": 30 * 1024,
+    "third_party": 20 * 1024,
+}
+
+PROFILE_SPECS = {
+    #-- The old behaviour: headed, nothing intercepted
+    "full": {"headless": False},
+    #-- parse_news_details reads the date div and <p> tags from the DOM, layout does not matter
+    "article": {"blocked_resource_types": HEAVY_RESOURCE_TYPES + ("stylesheet",), "blocked_domains": AD_TRACKER_DOMAINS, "allowed_domains": INVESTING_DOMAINS},
+    #-- Yahoo's infinite scroll needs layout and its own scripts (several yahoo / yimg hosts)
+    "feed": {"blocked_resource_types": HEAVY_RESOURCE_TYPES, "blocked_domains": AD_TRACKER_DOMAINS},
+}
+
+
+def domain_matches(host, domains):
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+#---- Accounting
+class PageLoadStats():
+    """Requests made / blocked, bytes actually transferred and (estimated) bytes saved for one page load"""
+    def __init__(self):
+        self.requests = 0
+        self.blocked = 0
+        self.blocked_by_reason = {}
+        self.bytes_loaded = 0
+        self.bytes_saved = 0
+        self.pending = set()
+    
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "blocked_by_reason": dict(self.blocked_by_reason),
+            "bytes_loaded": self.bytes_loaded,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+class FetchProfile():
+    """How Playwright pages load: headless or not, and which requests page.route aborts"""
+    def __init__(
+        self,
+        name="custom",
+        headless=True,
+        blocked_resource_types=(),
+        blocked_domains=(),
+        allowed_domains=None,
+        track_bytes=True,
+        estimated_blocked_bytes=None,
+    ):
+        self.name = name
+        self.headless = headless
+        self.blocked_resource_types = set(blocked_resource_types)
+        self.blocked_domains = tuple(blocked_domains)
+        self.allowed_domains = tuple(allowed_domains) if allowed_domains is not None else None
+        self.track_bytes = track_bytes
+        self.estimated_blocked_bytes = dict(ESTIMATED_BLOCKED_BYTES, **(estimated_blocked_bytes or {}))
+        self.page_stats = {}
+        self.totals = {"pages": 0, "requests": 0, "blocked": 0, "bytes_loaded": 0, "bytes_saved": 0, "blocked_by_reason": {}}
+    
+    @property
+    def intercepts(self):
+        return bool(self.blocked_resource_types or self.blocked_domains or self.allowed_domains is not None)
+    
+    def block_reason(self, resource_type, url):
+        """None when the request may go through"""
+        if resource_type == "document" and url.startswith(("about:", "data:")):
+            return None
+        if resource_type in self.blocked_resource_types:
+            return resource_type
+        host = urlparse(url).hostname or ""
+        if domain_matches(host, self.blocked_domains):
+            return "ad_tracker"
+        if self.allowed_domains is not None and host and not domain_matches(host, self.allowed_domains):
+            return "third_party"
+        return None
+    
+    async def apply(self, page):
+        """Register the route / listeners once per page; stats are kept per load (see reset / collect)"""
+        self.page_stats[page] = PageLoadStats()
+        
+        #-- Events can still arrive after forget(page) while the page closes: they are not counted
+        def on_request(request):
+            stats = self.page_stats.get(page)
+            if stats is not None:
+                stats.requests += 1
+        
+        async def record_size(request, stats):
+            try:
+                sizes = await request.sizes()
+                stats.bytes_loaded += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+            except Exception:
+                pass
+        
+        def on_request_finished(request):
+            stats = self.page_stats.get(page)
+            if stats is None:
+                return
+            task = asyncio.ensure_future(record_size(request, stats))
+            stats.pending.add(task)
+            task.add_done_callback(stats.pending.discard)
+        
+        async def handle_route(route):
+            reason = self.block_reason(route.request.resource_type, route.request.url)
+            if reason is None:
+                await route.continue_()
+                return
+            stats = self.page_stats.get(page)
+            if stats is not None:
+                stats.blocked += 1
+                stats.blocked_by_reason[reason] = stats.blocked_by_reason.get(reason, 0) + 1
+                stats.bytes_saved += self.estimated_blocked_bytes.get(reason, 0)
+            await route.abort("blockedbyclient")
+        
+        page.on("request", on_request)
+        if self.track_bytes:
+            page.on("requestfinished", on_request_finished)
+        if self.intercepts:
+            await page.route("**/*", handle_route)
+    
+    def reset(self, page):
+        self.page_stats[page] = PageLoadStats()
+    
+    async def collect(self, page):
+        """Stats of the load since the last reset, folded into the totals and the metrics (None for a forgotten page)"""
+        stats = self.page_stats.get(page)
+        if stats is None:
+            return None
+        if stats.pending:
+            await asyncio.gather(*list(stats.pending), return_exceptions=True)
+        self.totals["pages"] += 1
+        self.totals["requests"] += stats.requests
+        self.totals["blocked"] += stats.blocked
+        self.totals["bytes_loaded"] += stats.bytes_loaded
+        self.totals["bytes_saved"] += stats.bytes_saved
+        for reason, count in stats.blocked_by_reason.items():
+            self.totals["blocked_by_reason"][reason] = self.totals["blocked_by_reason"].get(reason, 0) + count
+            METRICS.increment("browser.requests_blocked", count, tags={"profile": self.name, "reason": reason})
+        METRICS.increment("browser.requests", stats.requests, tags={"profile": self.name})
+        METRICS.observe("browser.page_bytes", stats.bytes_loaded, tags={"profile": self.name})
+        METRICS.increment("browser.bytes_saved", stats.bytes_saved, tags={"profile": self.name})
+        return stats.to_dict()
+    
+    def forget(self, page):
+        self.page_stats.pop(page, None)
+    
+    def report(self):
+        pages = max(self.totals["pages"], 1)
+        return (
+            f"Fetch profile {self.name}: {self.totals['pages']} loads, "
+            f"{self.totals['requests'] / pages:.1f} requests and {self.totals['bytes_loaded'] / pages / 1024:.0f} KiB per load, "
+            f"{self.totals['blocked']} requests blocked {self.totals['blocked_by_reason']}, "
+            f"~{self.totals['bytes_saved'] / 2**20:.1f} MiB saved (estimated)"
+        )
+
+
+def make_profile(name, headless=None):
+    """Fresh profile from PROFILE_SPECS (stats are per instance); `headless` overrides the spec"""
+    spec = dict(PROFILE_SPECS[name])
+    if headless is not None:
+        spec["headless"] = headless
+    return FetchProfile(name=name, **spec)
+
+
+#---- Measured savings: the same URL under several profiles
+async def measure(url, profile, wait_until="load", timeout=60000):
+    from playwright.async_api import async_playwright
+    playwright = await async_playwright().start()
+    browser = await playwright.chromium.launch(headless=True)
+    try:
+        page = await browser.new_page()
+        await profile.apply(page)
+        start_time = time.perf_counter()
+        try:
+            await page.goto(url, wait_until=wait_until, timeout=timeout)
+        except Exception as e:
+            print(f"{profile.name}: {e}")
+        elapsed = time.perf_counter() - start_time
+        return {"profile": profile.name, "seconds": round(elapsed, 2), **(await profile.collect(page))}
+    finally:
+        await browser.close()
+        await playwright.stop()
+
+
+async def compare(url, names):
+    results = [await measure(url, make_profile(name, headless=True)) for name in names]
+    baseline = results[0]
+    for result in results:
+        saved = baseline["bytes_loaded"] - result["bytes_loaded"]
+        print(
+            f"{result['profile']:>8}: {result['requests']} requests ({result['blocked']} blocked), "
+            f"{result['bytes_loaded'] / 1024:.0f} KiB, {result['seconds']}s, saved {saved / 1024:.0f} KiB vs {baseline['profile']} "
+            f"(estimated {result['bytes_saved'] / 1024:.0f} KiB)"
+        )
+    return results
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Compare bytes / requests / load time of fetch profiles on one URL")
+    parser.add_argument("url")
+    parser.add_argument("--profiles", nargs="+", default=["full", "article"], choices=sorted(PROFILE_SPECS))
+    args = parser.parse_args()
+    asyncio.run(compare(args.url, args.profiles))
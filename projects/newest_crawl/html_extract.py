@@ -0,0 +1,148 @@
+import asyncio
+import lxml.html
+from concurrent.futures import ProcessPoolExecutor
+from site_extractors import EXTRACTORS, EXTRACTION_STATS
+
+
+def text_of(element):
+    return element.text_content()
+
+
+def parse_html(html):
+    return lxml.html.fromstring(html)
+
+
+#---- vn.investing.com listing
+def parse_listing(source_content):
+    """Same output as Crawler.parse_news_details_in_page; items missing url / title are skipped, not fatal"""
+    extractor = EXTRACTORS["investing_listing"]
+    root = parse_html(source_content)
+    page_news_items = []
+    for new_html in extractor.select_all(root, "item"):
+        item_title_html = extractor.select(new_html, "title")
+        if item_title_html is None:
+            continue
+        item_url = item_title_html.get("href", "")
+        title = text_of(item_title_html)
+        item_time_html = extractor.select(new_html, "time")
+        item_posted_time = text_of(item_time_html) if item_time_html is not None else ""
+        
+        #-- preprocessing
+        if "•" in item_posted_time:
+            item_posted_time = item_posted_time.replace("•", "")
+        
+        page_news_items.append({
+            "item_url": item_url.strip(),
+            "title": title.strip(),
+            "time": item_posted_time.strip(),
+        })
+    return page_news_items
+
+
+#---- vn.investing.com article
+def parse_article(html):
+    """Same output as PlaywrightScrolling.parse_news_details; a missing date degrades to "", a missing body raises"""
+    return extract_article(parse_html(html))
+
+
+def parse_article_if_present(html):
+    """HTTP path: None when no body selector (primary or fallback) matches, e.g. a bot challenge page, so it is not counted as a miss"""
+    root = parse_html(html)
+    if not EXTRACTORS["investing_article"].matches_any(root, "body"):
+        return None
+    return extract_article(root)
+
+
+def extract_article(root):
+    extractor = EXTRACTORS["investing_article"]
+    
+    #-- Date posted
+    date_box = extractor.select(root, "date_box")
+    posted_date_html = extractor.select(date_box, "posted_date") if date_box is not None else None
+    posted_date_str = text_of(posted_date_html) if posted_date_html is not None else ""
+    
+    #-- Main texts
+    body = extractor.select(root, "body")
+    if body is None:
+        raise ValueError("Article body not found")
+    main_content = "".join(text_of(line).strip() + " \n " for line in extractor.select_all(body, "line"))
+    
+    return {
+        "posted_date": posted_date_str,
+        "main_content": main_content,
+    }
+
+
+#---- Yahoo Finance news feed
+def make_yahoo_item(item_url, title, item_posted_time):
+    """Raw link / content / footer texts -> feed item (also used on texts extracted in the browser)"""
+    if item_posted_time and item_posted_time in title:
+        title = title.replace(item_posted_time, "")
+    item_posted_time = item_posted_time.split("•")[-1]
+    return {
+        "item_url": item_url.strip(),
+        "title": title.strip(),
+        "time": item_posted_time.strip(),
+    }
+
+
+def parse_yahoo_feed(source_content):
+    """Same output as parse_thumnail_details_in_source"""
+    extractor = EXTRACTORS["yahoo_feed"]
+    root = parse_html(source_content)
+    all_news_items = []
+    for new_html in extractor.select_all(root, "item"):
+        item_title_html = extractor.select(new_html, "content")
+        item_link_html = extractor.select(item_title_html, "link") if item_title_html is not None else None
+        if item_link_html is None:
+            continue
+        item_url = item_link_html.get("href", "")
+        title = text_of(item_title_html)
+        item_footer_html = extractor.select(new_html, "footer")
+        item_posted_time = text_of(item_footer_html) if item_footer_html is not None else ""
+        all_news_items.append(make_yahoo_item(item_url, title, item_posted_time))
+    return all_news_items
+
+
+#---- Off-loop parsing
+def parse_with_stats(parser, html):
+    """Runs in the worker: hand the worker's counters back with the result, or on the exception when the parser raises"""
+    EXTRACTION_STATS.pop()
+    try:
+        result = parser(html)
+    except Exception as e:
+        #-- Exceptions pickle their __dict__, so the counts survive the trip back
+        e.extraction_counts = EXTRACTION_STATS.pop()
+        raise
+    return result, EXTRACTION_STATS.pop()
+
+
+class ParserPool():
+    """Run parsers in worker processes so the event loop keeps serving requests"""
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.executor = None
+    
+    async def run(self, parser, html):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        loop = asyncio.get_running_loop()
+        try:
+            result, counts = await loop.run_in_executor(self.executor, parse_with_stats, parser, html)
+        except Exception as e:
+            EXTRACTION_STATS.merge(getattr(e, "extraction_counts", {}))
+            raise
+        EXTRACTION_STATS.merge(counts)
+        return result
+    
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+PARSER_POOL = ParserPool()
+
+
+async def run_parser(parser, html):
+    return await PARSER_POOL.run(parser, html)
@@ -3,7 +3,7 @@
 # Retrieved 2026-01-20, License - CC BY-SA 4.0
 
 from urllib.request import urlopen, Request
-from bs4 import BeautifulSoup
+from html_extract import parse_listing
 import pandas as pd
 import os
 import json
@@ -44,27 +44,7 @@ class Crawler():
     
     
     def parse_news_details_in_page(self, source_content):
-        source_soup = BeautifulSoup(source_content, "html.parser")
-        all_news_html = source_soup.find_all("div", class_="block w-full sm:flex-1")
-        page_news_items = []
-        for new_html in all_news_html:
-            item_title_html = new_html.find("a", class_="block text-base font-bold leading-5 hover:underline sm:text-base sm:leading-6 md:text-lg md:leading-7")
-            item_url = item_title_html.get("href", "")
-            title = item_title_html.text
-            item_posted_time = new_html.find("li", class_="ml-2").text
-            
-            #-- preprocessing
-            if "•" in item_posted_time:
-                item_posted_time = item_posted_time.replace("•", "")
-            
-            #-- set variables
-            item = {
-                "item_url": item_url.strip(), 
-                "title": title.strip(),
-                "time": item_posted_time.strip(),
-            }
-            page_news_items.append(item)
-        return page_news_items
+        return parse_listing(source_content)
     
     
     def crawling_news_urls(self, page_url):
@@ -3,22 +3,27 @@
 # Retrieved 2026-01-20, License - CC BY-SA 4.0
 
 from urllib.request import urlopen, Request
-from bs4 import BeautifulSoup
+from html_extract import parse_listing, run_parser
 import pandas as pd
 import os
+import sys
 import json
 import aiohttp
 import asyncio
 import time
+from urllib.parse import urlparse
 from tqdm import tqdm
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "monitoring"))
+from metrics import METRICS
+
 
 #---- Load json
 def load_json(path):
     with open(path, "r", encoding="utf-8") as file:
         json_content = json.load(file)
         return json_content
-    
+
 #---- Save json
 def save_json(path, content):
     with open(path, "w", encoding="utf-8") as file:
@@ -26,10 +31,28 @@ def save_json(path, content):
 
 
 #---- Crawler
+def url_kind(url):
+    """Metric tag: listing pages vs article pages"""
+    return "listing" if "/indices/" in url else "article"
+
+
 class Crawler():
     def __init__(self):
         pass
     
+    def record_response(self, url, status, html, start_time):
+        tags = {"kind": url_kind(url)}
+        METRICS.increment("crawler.responses", tags={**tags, "status": status})
+        METRICS.timing("crawler.request", time.perf_counter() - start_time, tags={**tags, "outcome": "ok" if status==200 else "status"})
+        if html is not None:
+            METRICS.increment("crawler.bytes_fetched", len(html.encode("utf-8")), tags=tags)
+    
+    def record_error(self, url, error, start_time):
+        tags = {"kind": url_kind(url)}
+        outcome = "timeout" if isinstance(error, asyncio.TimeoutError) else type(error).__name__
+        METRICS.increment("crawler.timeouts" if outcome=="timeout" else "crawler.errors", tags={**tags, "error": outcome})
+        METRICS.timing("crawler.request", time.perf_counter() - start_time, tags={**tags, "outcome": outcome})
+    
     def get_page_url(self, page_id):
         url_template = "https://vn.investing.com/indices/vn-news/{page_id}"
         url = url_template.format(page_id=page_id)
@@ -43,46 +66,57 @@ class Crawler():
             'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
         }
         for attempt in range(max_retries):
+            if attempt:
+                METRICS.increment("crawler.retries", tags={"kind": url_kind(url)})
+            start_time = time.perf_counter()
             try:
                 async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=15)) as response:
                     if response.status==200:
-                        return await response.text()
+                        html = await response.text()
+                        self.record_response(url, response.status, html, start_time)
+                        return html
                     else:
+                        self.record_response(url, response.status, None, start_time)
                         print("Request OKE but status failed")
                         return None
-            except asyncio.TimeoutError:
+            except asyncio.TimeoutError as e:
+                self.record_error(url, e, start_time)
                 print(f"Timeout on attempt {attempt + 1}/{max_retries} for {url}")
                 if attempt < max_retries - 1:
                     await asyncio.sleep(1)
             except Exception as e:
+                self.record_error(url, e, start_time)
                 print(f"Error on attempt {attempt + 1}/{max_retries}: {e}")
                 if attempt < max_retries - 1:
                     await asyncio.sleep(1)
         return None
     
     
+    async def fetch_page(self, session, url, timeout=15):
+        """Single attempt that reports the status, (None, None) on timeout / connection error"""
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
+        }
+        start_time = time.perf_counter()
+        try:
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                html = await response.text() if response.status==200 else None
+                self.record_response(url, response.status, html, start_time)
+                return response.status, html
+        except asyncio.TimeoutError as e:
+            self.record_error(url, e, start_time)
+            print(f"Timeout for {url}")
+            return None, None
+        except aiohttp.ClientError as e:
+            self.record_error(url, e, start_time)
+            print(f"Error for {url}: {e}")
+            return None, None
+    
+    
     async def parse_news_details_in_page(self, source_content):
-        source_soup = BeautifulSoup(source_content, "html.parser")
-        all_news_html = source_soup.find_all("div", class_="block w-full sm:flex-1")
-        page_news_items = []
-        for new_html in all_news_html:
-            item_title_html = new_html.find("a", class_="block text-base font-bold leading-5 hover:underline sm:text-base sm:leading-6 md:text-lg md:leading-7")
-            item_url = item_title_html.get("href", "")
-            title = item_title_html.text
-            item_posted_time = new_html.find("li", class_="ml-2").text
-            
-            #-- preprocessing
-            if "•" in item_posted_time:
-                item_posted_time = item_posted_time.replace("•", "")
-            
-            #-- set variables
-            item = {
-                "item_url": item_url.strip(), 
-                "title": title.strip(),
-                "time": item_posted_time.strip(),
-            }
-            page_news_items.append(item)
-        return page_news_items
+        return await run_parser(parse_listing, source_content)
     
     
     async def crawling_news_urls(self, session, page_url):
@@ -93,57 +127,223 @@ class Crawler():
         else:
             print("Page doesn't exist")
             return []
+
+
+#---- Per host rate limiter
+class HostRateLimiter():
+    """Space out request starts to the same host"""
+    def __init__(self, requests_per_second=5):
+        self.interval = 1 / requests_per_second
+        self.next_slots = {}
+        self.lock = asyncio.Lock()
+    
+    async def wait(self, url):
+        host = urlparse(url).netloc
+        async with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slots.get(host, now))
+            self.next_slots[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+#---- Adaptive concurrency
+class AdaptiveLimit():
+    """AIMD limit: +1 after a run of clean responses, halved on 429/5xx/timeouts"""
+    def __init__(self, initial=10, minimum=1, maximum=32, increase_every=10):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase_every = increase_every
+        self.in_flight = 0
+        self.successes = 0
+        self.waiters = []
+    
+    async def acquire(self):
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+        self.in_flight += 1
+    
+    def release(self, throttled=False, cancelled=False):
+        """`cancelled`: the request never got an answer, free the slot without moving the limit"""
+        self.in_flight -= 1
+        if cancelled:
+            pass
+        elif throttled:
+            self.limit = max(self.minimum, self.limit // 2)
+            self.successes = 0
+        else:
+            self.successes += 1
+            if self.successes >= self.increase_every:
+                self.limit = min(self.maximum, self.limit + 1)
+                self.successes = 0
+        METRICS.gauge("crawler.concurrency_limit", self.limit)
         
+        #-- Waiters re-check the limit themselves
+        for waiter in self.waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self.waiters.clear()
+
+
+def is_throttled(status):
+    return status is None or status == 429 or status >= 500
+
+
+#---- Sliding window scheduler
+class PageScheduler():
+    """Keep listing pages in flight continuously instead of in fixed batches"""
+    def __init__(
+        self,
+        crawler,
+        max_pages=1001,
+        limit=None,
+        rate_limiter=None,
+        max_retries=3,
+        backoff=1,
+        skip_page=None,
+        on_page=None,
+    ):
+        self.crawler = crawler
+        self.max_pages = max_pages
+        self.limit = limit if limit is not None else AdaptiveLimit()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else HostRateLimiter()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.skip_page = skip_page
+        self.on_page = on_page
         
-async def main():
-    crawler = Crawler()
-    all_news_items = []
-    max_pages = 1001
+        self.next_page_id = 0
+        self.last_page_id = None
+        self.in_flight = {}
+        self.cancelled_page_ids = set()
+        self.failed_page_ids = []
     
-    batch_size = 10
-    stop_crawling = False
-    save_path_template = r"C:\APAC\all_projects\finetuning-airflow-project\projects\newest_crawl\save\all_news_item_{page_id}.json"
-    async with aiohttp.ClientSession(trust_env=True) as session:
-        for start_page_id in tqdm(range(0, max_pages, batch_size)):
-            if stop_crawling:
-                print("Stop Crawling")
-                break
-            
-            batch_page_ids = list(range(start_page_id, start_page_id+batch_size))
-            batch_page_urls = [crawler.get_page_url(page_id=page_id+1) for page_id in batch_page_ids]
-            batch_save_paths = [save_path_template.format(page_id=page_id) for page_id in batch_page_ids]
-
-            tasks = []
-            tasks_save_paths = []
-            for page_url, save_path in zip(batch_page_urls, batch_save_paths):
-                if os.path.isfile(save_path):
-                    continue
-                tasks.append(crawler.crawling_news_urls(session=session, page_url=page_url))
-                tasks_save_paths.append(save_path)
+    def take_page_id(self):
+        page_id = self.next_page_id
+        if page_id >= self.max_pages:
+            return None
+        if self.last_page_id is not None and page_id > self.last_page_id:
+            return None
+        self.next_page_id += 1
+        return page_id
+    
+    def mark_last_page(self, page_id):
+        """An empty page ends the listing: cancel everything requested beyond it"""
+        if self.last_page_id is not None and page_id >= self.last_page_id:
+            return
+        self.last_page_id = page_id
+        for in_flight_id, task in list(self.in_flight.items()):
+            if in_flight_id > page_id:
+                self.cancelled_page_ids.add(in_flight_id)
+                task.cancel()
+    
+    async def crawl_page(self, session, page_id):
+        page_url = self.crawler.get_page_url(page_id=page_id+1)
+        for attempt in range(self.max_retries):
+            if attempt:
+                METRICS.increment("crawler.retries", tags={"kind": "listing"})
+            await self.limit.acquire()
+            status = None
+            cancelled = False
+            try:
+                await self.rate_limiter.wait(page_url)
+                status, html_content = await self.crawler.fetch_page(session, page_url)
+            except asyncio.CancelledError:
+                #-- Pages beyond the last one are cancelled: not a sign of throttling
+                cancelled = True
+                raise
+            finally:
+                self.limit.release(throttled=is_throttled(status), cancelled=cancelled)
             
-            if not tasks:
+            if status==200:
+                #-- Only an empty 200 listing ends the crawl (see worker)
+                return await self.crawler.parse_news_details_in_page(source_content=html_content)
+            if not is_throttled(status):
+                #-- 403 (blocked), 404 and friends: a failed page, not the end of the listing
+                print(f"Listing page {page_id} answered {status}")
+                METRICS.increment("crawler.listing_failed", tags={"status": str(status)})
+                return None
+            if attempt < self.max_retries - 1:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        return None
+    
+    async def worker(self, session, progress):
+        while True:
+            page_id = self.take_page_id()
+            if page_id is None:
+                return
+            if self.skip_page is not None and self.skip_page(page_id):
+                progress.update(1)
                 continue
             
+            task = asyncio.create_task(self.crawl_page(session, page_id))
+            self.in_flight[page_id] = task
             try:
-                batch_news_items = await asyncio.gather(*tasks)
-            except Exception as e:
-                print(f"Error {e} when crawling batch of ids")
+                page_news_items = await task
+            except asyncio.CancelledError:
+                #-- Only a page mark_last_page cancelled is skipped; the worker's own cancellation goes through
+                if asyncio.current_task().cancelling() or page_id not in self.cancelled_page_ids:
+                    raise
                 continue
+            except Exception as e:
+                print(f"Error {e} when crawling page {page_id}")
+                page_news_items = None
+            finally:
+                self.in_flight.pop(page_id, None)
+                progress.update(1)
             
-            for page_news_items, page_save_path in zip(batch_news_items, tasks_save_paths):
-                if not page_news_items:
-                    stop_crawling = True
-                    break
-                save_json(
-                    path=page_save_path,
-                    content=page_news_items
-                )
-            await asyncio.sleep(0.5)
-        
+            if page_news_items is None:
+                self.failed_page_ids.append(page_id)
+            elif not page_news_items:
+                self.mark_last_page(page_id - 1)
+            elif self.on_page is not None:
+                await self.on_page(page_id, page_news_items)
+    
+    async def run(self, session):
+        progress = tqdm(total=self.max_pages, desc="Listing pages")
+        workers = [asyncio.create_task(self.worker(session, progress)) for _ in range(self.limit.maximum)]
+        await asyncio.gather(*workers)
+        progress.close()
+        if self.last_page_id is not None:
+            print(f"Stop Crawling: last page is {self.last_page_id}")
+        if self.failed_page_ids:
+            print(f"Failed pages: {sorted(self.failed_page_ids)}")
+
+
+async def main():
+    crawler = Crawler()
+    max_pages = 1001
+    
+    save_path_template = r"C:\APAC\all_projects\finetuning-airflow-project\projects\newest_crawl\save\all_news_item_{page_id}.json"
+    
+    async def save_page(page_id, page_news_items):
+        save_json(
+            path=save_path_template.format(page_id=page_id),
+            content=page_news_items
+        )
+    
+    scheduler = PageScheduler(
+        crawler=crawler,
+        max_pages=max_pages,
+        limit=AdaptiveLimit(initial=10, minimum=1, maximum=32),
+        rate_limiter=HostRateLimiter(requests_per_second=5),
+        skip_page=lambda page_id: os.path.isfile(save_path_template.format(page_id=page_id)),
+        on_page=save_page,
+    )
+    async with aiohttp.ClientSession(trust_env=True) as session:
+        await scheduler.run(session)
+
 
 
 if __name__=="__main__":
     asyncio.run(main())
     print("Crawling completed!")
-    
-    
\ No newline at end of file
+
+
@@ -0,0 +1,164 @@
+import re
+from lxml.cssselect import CSSSelector
+
+
+#---- Selector helpers
+def escape_class(class_name):
+    """Tailwind class names (sm:flex-1, text-[18px]) need CSS escaping"""
+    return re.sub(r"([^a-zA-Z0-9_-])", r"\\\1", class_name)
+
+
+def selector_css(selector):
+    """("tag", "class string") -> every class of the string on `tag`; plain strings are CSS"""
+    if isinstance(selector, tuple):
+        tag, class_string = selector
+        return tag + "".join("." + escape_class(class_name) for class_name in class_string.split())
+    return selector
+
+
+def compile_selector(selector):
+    return CSSSelector(selector_css(selector))
+
+
+#---- Registry: ordered fallbacks per field, the first entry is the current site markup
+SITE_SPECS = {
+    "investing_listing": {
+        "item": [
+            ("div", "block w-full sm:flex-1"),
+            "article div[class*='sm:flex-1']",
+            "[data-test='article-item']",
+        ],
+        "title": [
+            ("a", "block text-base font-bold leading-5 hover:underline sm:text-base sm:leading-6 md:text-lg md:leading-7"),
+            "a[data-test='article-title-link']",
+            "a.font-bold[href]",
+        ],
+        "time": [
+            ("li", "ml-2"),
+            "time",
+            "li[class*='ml-']",
+        ],
+    },
+    "investing_article": {
+        "date_box": [
+            ("div", "flex flex-col gap-2 text-warren-gray-700 md:flex-row md:items-center md:gap-0"),
+            "div[class*='text-warren-gray-700']",
+        ],
+        "posted_date": [
+            ("div", "flex flex-row items-center"),
+            "time",
+            "span",
+        ],
+        "body": [
+            ("div", "article_WYSIWYG__O0uhw article_articlePage__UMz3q text-[18px] leading-8"),
+            "div[class*='article_WYSIWYG']",
+            "div#article",
+        ],
+        "line": [
+            "p",
+        ],
+    },
+    "yahoo_feed": {
+        "item": [
+            ("li", "stream-item story-item yf-9xydx9"),
+            "li.stream-item.story-item",
+            "li[class*='stream-item']",
+        ],
+        "content": [
+            ("div", "content yf-1u32w3i"),
+            "div.content",
+        ],
+        "link": [
+            ("a", "subtle-link fin-size-small titles noUnderline yf-119g04z"),
+            "a.subtle-link.titles",
+            "a[href]",
+        ],
+        "footer": [
+            ("div", "footer yf-1u32w3i"),
+            "div.footer",
+        ],
+    },
+}
+
+
+#---- Hit / miss counters
+class ExtractionStats():
+    """site -> field -> {"hit", "fallback", "miss"} counts"""
+    def __init__(self):
+        self.counts = {}
+    
+    def record(self, site, field, outcome):
+        field_counts = self.counts.setdefault(site, {}).setdefault(field, {"hit": 0, "fallback": 0, "miss": 0})
+        field_counts[outcome] += 1
+    
+    def merge(self, counts):
+        for site, fields in counts.items():
+            for field, outcomes in fields.items():
+                for outcome, count in outcomes.items():
+                    field_counts = self.counts.setdefault(site, {}).setdefault(field, {"hit": 0, "fallback": 0, "miss": 0})
+                    field_counts[outcome] += count
+    
+    def pop(self):
+        counts = self.counts
+        self.counts = {}
+        return counts
+    
+    def broken_fields(self, max_miss_rate=0.2):
+        """Fields whose primary selector stopped matching or that mostly miss"""
+        broken = []
+        for site, fields in self.counts.items():
+            for field, outcomes in fields.items():
+                total = sum(outcomes.values())
+                if not total:
+                    continue
+                if outcomes["miss"] / total > max_miss_rate or outcomes["fallback"] > outcomes["hit"]:
+                    broken.append((site, field, outcomes))
+        return broken
+    
+    def report(self):
+        lines = []
+        for site, fields in sorted(self.counts.items()):
+            for field, outcomes in sorted(fields.items()):
+                lines.append(f"{site}.{field}: hit={outcomes['hit']} fallback={outcomes['fallback']} miss={outcomes['miss']}")
+        for site, field, _ in self.broken_fields():
+            lines.append(f"WARNING selector for {site}.{field} looks broken")
+        return "\n".join(lines)
+
+
+EXTRACTION_STATS = ExtractionStats()
+
+
+#---- Extractor
+class SiteExtractor():
+    def __init__(self, site, spec, stats=EXTRACTION_STATS):
+        self.site = site
+        self.stats = stats
+        self.css = {field: [selector_css(selector) for selector in selectors] for field, selectors in spec.items()}
+        self.selectors = {field: [CSSSelector(css) for css in selectors] for field, selectors in self.css.items()}
+    
+    def any_css(self, field, parent_field=None):
+        """One CSS selector list matching any primary or fallback selector (e.g. for page.wait_for_selector)"""
+        if parent_field is None:
+            return ", ".join(self.css[field])
+        return ", ".join(f"{parent} {child}" for parent in self.css[parent_field] for child in self.css[field])
+    
+    def matches_any(self, node, field):
+        """Whether any selector of `field` matches, without touching the counters"""
+        return any(len(selector(node)) for selector in self.selectors[field])
+    
+    def select_all(self, node, field):
+        """Matches of the first selector that matches anything, counted as hit / fallback / miss"""
+        for rank, selector in enumerate(self.selectors[field]):
+            matches = selector(node)
+            if matches:
+                self.stats.record(self.site, field, "hit" if rank == 0 else "fallback")
+                return matches
+        self.stats.record(self.site, field, "miss")
+        return []
+    
+    def select(self, node, field):
+        matches = self.select_all(node, field)
+        return matches[0] if matches else None
+
+
+EXTRACTORS = {site: SiteExtractor(site, spec) for site, spec in SITE_SPECS.items()}
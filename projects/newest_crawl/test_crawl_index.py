@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from crawl_index import CrawlIndex
+from crawl_checkpoint import CheckpointStore, FetchError
+
+
+ITEM = {"item_url": "https://vn.investing.com/news/a-1", "title": "A", "time": "1 giờ trước"}
+
+
+def dead_letter(index, checkpoints):
+    index.add_listed([ITEM], 0)
+    index.record_failure(ITEM["item_url"])
+    checkpoints.record_failure(0, 0, ITEM, FetchError(ITEM["item_url"], "TimeoutError", "timeout", attempts=3))
+
+
+def test_relisted_dead_letter_waits_for_its_backoff(tmp_path):
+    index = CrawlIndex(path=str(tmp_path / "index.sqlite"))
+    checkpoints = CheckpointStore(path=str(tmp_path / "checkpoints.sqlite"), backoff_seconds=300)
+    dead_letter(index, checkpoints)
+    
+    #-- Listed again (same or edited headline) before the backoff elapsed: nothing to fetch
+    assert index.add_listed([ITEM], 1) == []
+    assert index.add_listed([{**ITEM, "title": "A (edited)"}], 1) == []
+    assert index.pending(include_failed=False) == []
+    assert checkpoints.due_failures() == []
+
+
+def test_dead_letter_comes_back_through_due_failures(tmp_path):
+    index = CrawlIndex(path=str(tmp_path / "index.sqlite"))
+    checkpoints = CheckpointStore(path=str(tmp_path / "checkpoints.sqlite"), backoff_seconds=0)
+    dead_letter(index, checkpoints)
+    
+    assert index.add_listed([ITEM], 1) == []
+    assert [item["item_url"] for _, _, item in checkpoints.due_failures()] == [ITEM["item_url"]]
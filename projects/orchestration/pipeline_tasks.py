@@ -0,0 +1,351 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+import pandas as pd
+from datetime import date, datetime
+
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for sub_dir in ["newest_crawl", "preprocessing", "storage", "sentiment_analysis"]:
+    sys.path.append(os.path.join(PROJECTS_DIR, sub_dir))
+
+
+#---- Default locations
+CRAWL_DIR = os.path.join(PROJECTS_DIR, "newest_crawl")
+URLS_DIR = os.path.join(CRAWL_DIR, "save_news_urls")
+CONTENTS_DIR = os.path.join(CRAWL_DIR, "save_news_contents")
+DATA_DIR = os.path.join(PROJECTS_DIR, "data")
+RUNS_DIR = os.path.join(DATA_DIR, "runs")
+WATCHLIST_PATH = os.path.join(DATA_DIR, "watchlist.json")
+HISTORY_PATH = os.path.join(DATA_DIR, "history.csv")
+HISTORY_START = "2021-09-22"
+
+#-- Every task returns a small manifest (ids, counts, paths): data stays on disk / in the corpus store
+#-- Row ids here are sentence index article numbers, kept apart from the legacy gather_all_contents row ids
+TRANSLATIONS_DATASET = "watchlist_translations"
+
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_json(path, content):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(content, file, ensure_ascii=False, indent=3)
+
+
+def listing_path(file_id):
+    return os.path.join(URLS_DIR, f"all_news_item_{file_id}.json")
+
+
+def content_path(file_id):
+    return os.path.join(CONTENTS_DIR, f"all_news_content_{file_id}.json")
+
+
+#---- Stage 1: listing pages
+def plan_listing_shards(run_tag, max_pages=50, shard_size=10):
+    """Page id ranges [start, end) for the mapped listing tasks"""
+    return [{"run_tag": run_tag, "start": start, "end": min(start + shard_size, max_pages)} for start in range(0, max_pages, shard_size)]
+
+
+def run_listing_pages(run_tag, start, end):
+    """Listing files this run saved for page ids start..end-1 (a retried task finds the first attempt's)"""
+    pages = []
+    for page_id in range(start, end):
+        file_id = f"{run_tag}_{page_id}"
+        if os.path.isfile(listing_path(file_id)):
+            pages.append({"file_id": file_id, "num_items": len(load_json(listing_path(file_id)))})
+    return pages
+
+
+def crawl_listing_shard(run_tag, start, end, max_concurrency=8):
+    """
+    Listing pages start..end-1; URLs not fetched yet are saved, as all_news_item_<run_tag>_<page_id>.json.
+    The manifest is built from the files on disk, so pages saved by a failed attempt are not lost on retry.
+    `max_concurrency` x listing_pool slots bounds the requests all shards send to the site.
+    """
+    import aiohttp
+    from investing_crawling_async import PageScheduler, AdaptiveLimit, Crawler
+    from crawl_index import CrawlIndex
+    
+    os.makedirs(URLS_DIR, exist_ok=True)
+    index = CrawlIndex()
+    #-- Pages shift while the listing is crawled: a URL already saved by an earlier attempt is not saved twice
+    saved_urls = set(item["item_url"] for page in run_listing_pages(run_tag, start, end) for item in load_json(listing_path(page["file_id"])))
+    
+    async def save_page(page_id, page_news_items):
+        file_id = f"{run_tag}_{page_id}"
+        if os.path.isfile(listing_path(file_id)):
+            return
+        new_items = [item for item in index.add_listed(page_news_items, page_id) if item["item_url"] not in saved_urls]
+        if not new_items:
+            return
+        save_json(path=listing_path(file_id), content=new_items)
+        saved_urls.update(item["item_url"] for item in new_items)
+    
+    async def run():
+        concurrency = min(max_concurrency, end - start)
+        scheduler = PageScheduler(
+            crawler=Crawler(),
+            max_pages=end,
+            limit=AdaptiveLimit(initial=concurrency, maximum=concurrency),
+            on_page=save_page,
+        )
+        scheduler.next_page_id = start
+        async with aiohttp.ClientSession(trust_env=True) as session:
+            await scheduler.run(session)
+        return scheduler
+    
+    try:
+        scheduler = asyncio.run(run())
+    finally:
+        index.close()
+    return {
+        "run_tag": run_tag,
+        "start": start,
+        "end": end,
+        "pages": run_listing_pages(run_tag, start, end),
+        "last_page_id": scheduler.last_page_id,
+        "failed_page_ids": sorted(scheduler.failed_page_ids),
+    }
+
+
+#---- Stage 2: article contents
+def save_pending_pages(run_tag, listed_urls, page_size=100):
+    """
+    Indexed URLs left 'listed' by earlier runs (an article batch that failed every retry, a crash)
+    and not in this run's listing, saved as extra listing pages so they get fetched
+    """
+    from crawl_index import CrawlIndex
+    
+    index = CrawlIndex()
+    try:
+        pending_items = [
+            {key: item[key] for key in ("item_url", "title", "time")}
+            for item in index.pending(include_failed=False) if item["item_url"] not in listed_urls
+        ]
+    finally:
+        index.close()
+    pages = []
+    for start in range(0, len(pending_items), page_size):
+        file_id = f"{run_tag}_pending_{start // page_size}"
+        save_json(path=listing_path(file_id), content=pending_items[start: start+page_size])
+        pages.append({"file_id": file_id, "num_items": len(pending_items[start: start+page_size])})
+    return pages
+
+
+def plan_article_batches(listing_manifests, batch_size=100, include_pending=True):
+    """Group the saved listing pages (and the still pending URLs of earlier runs) into batches of about `batch_size` articles"""
+    pages = [page for manifest in listing_manifests for page in manifest["pages"]]
+    if include_pending and listing_manifests:
+        listed_urls = set(item["item_url"] for page in pages for item in load_json(listing_path(page["file_id"])))
+        pages += save_pending_pages(listing_manifests[0]["run_tag"], listed_urls, page_size=batch_size)
+    
+    batches = []
+    file_ids, num_items = [], 0
+    for page in pages:
+        file_ids.append(page["file_id"])
+        num_items += page["num_items"]
+        if num_items >= batch_size:
+            batches.append({"file_ids": file_ids, "num_items": num_items})
+            file_ids, num_items = [], 0
+    if file_ids:
+        batches.append({"file_ids": file_ids, "num_items": num_items})
+    return batches
+
+
+def crawl_article_batch(file_ids, num_items=None):
+    """
+    Fetch the articles of the listing pages; each one is checkpointed so a retried task resumes.
+    Writes the per page content files and the news_contents dataset, flags duplicates and
+    feeds the sentence index.
+    """
+    from crawl_news_contents import PlaywrightScrolling, HybridFetcher, fetch_and_checkpoint
+    from crawl_checkpoint import CheckpointStore
+    from crawl_index import CrawlIndex
+    from article_dedup import DedupIndex
+    from sentence_index import SentenceIndex
+    from corpus_store import CorpusStore
+    
+    os.makedirs(CONTENTS_DIR, exist_ok=True)
+    checkpoints = CheckpointStore()
+    
+    async def fetch_all():
+        #-- One browser context per task: the browser_pool caps how many run at once
+        fetcher = HybridFetcher(scroller=PlaywrightScrolling(num_contexts=1, pages_per_context=4))
+        await fetcher.initialize()
+        try:
+            for file_id in file_ids:
+                handled_urls = checkpoints.done_urls(file_id) | checkpoints.failed_urls(file_id)
+                tasks = [
+                    fetch_and_checkpoint(fetcher, checkpoints, file_id, position, item)
+                    for position, item in enumerate(load_json(listing_path(file_id)))
+                    if item["item_url"] not in handled_urls
+                ]
+                await asyncio.gather(*tasks)
+        finally:
+            await fetcher.close()
+        return fetcher.stats
+    
+    fetch_stats = asyncio.run(fetch_all())
+    
+    index = CrawlIndex()
+    dedup = DedupIndex()
+    sentence_index = SentenceIndex()
+    store = CorpusStore()
+    records = []
+    num_duplicates = 0
+    try:
+        for file_id in file_ids:
+            page_details = checkpoints.page_details(file_id)
+            save_json(path=content_path(file_id), content=page_details)
+            #-- Dead letters leave the 'listed' state, so pending() only re-queues articles never attempted
+            for item_url in checkpoints.failed_urls(file_id):
+                index.record_failure(item_url)
+            for item_url, news_detail_dict in zip(checkpoints.page_urls(file_id), page_details):
+                index.record_fetch(item_url, news_detail_dict)
+                result = dedup.check_and_add(item_url, news_detail_dict.get("main_content", ""))
+                num_duplicates += result.is_duplicate
+                sentence_index.add_article(item_url, news_detail_dict.get("main_content", ""), title=news_detail_dict["title"], posted_date=news_detail_dict.get("posted_date"))
+                records.append({"page_id": file_id, "item_url": item_url, **news_detail_dict, **result.to_dict()})
+        store.append("news_contents", records)
+    finally:
+        index.close()
+        dedup.close()
+        sentence_index.close()
+        checkpoints.close()
+    return {
+        "file_ids": file_ids,
+        "num_articles": len(records),
+        "num_failed": fetch_stats["failed"],
+        "num_duplicates": num_duplicates,
+    }
+
+
+#---- Stage 3: relevant sentences -> translation
+def select_relevant_sentences(run_tag, watchlist_path=WATCHLIST_PATH, max_sentences=5, rows_per_batch=500):
+    """
+    Watchlist sentences for every indexed article in one index query, saved in the
+    gather_all_contents.csv layout. Rows are keyed by the index's article number, which
+    never changes, so translations already in the store are not redone.
+    """
+    from sentence_index import SentenceIndex, load_watchlist
+    
+    sentence_index = SentenceIndex()
+    try:
+        relevant_df = sentence_index.relative_sentences(load_watchlist(watchlist_path), max_sentences=max_sentences)
+    finally:
+        sentence_index.close()
+    if len(relevant_df):
+        relevant_df = relevant_df.set_index("article_no").rename_axis(None)
+    
+    run_dir = os.path.join(RUNS_DIR, run_tag)
+    os.makedirs(run_dir, exist_ok=True)
+    path = os.path.join(run_dir, "gather_all_contents.csv")
+    relevant_df.to_csv(path)
+    batches = [{"path": path, "start": start, "end": min(start + rows_per_batch, len(relevant_df))} for start in range(0, len(relevant_df), rows_per_batch)]
+    return {"path": path, "num_rows": len(relevant_df), "batches": batches}
+
+
+def translate_batch(path, start, end, rate=5.0, max_concurrency=10):
+    """Translate rows start..end-1 of the relevant sentences into the translations dataset"""
+    from corpus_store import CorpusStore, BufferedWriter
+    from translation_service import TranslationService, GoogleBackend, TranslationMemory, translate_frame
+    
+    df = pd.read_csv(path).iloc[start:end]
+    columns = [col_name for col_name in df.columns if "relative_sen" in col_name]
+    store = CorpusStore()
+    done_row_ids = store.read(TRANSLATIONS_DATASET, columns=["row_id"])["row_id"]
+    writer = BufferedWriter(store, TRANSLATIONS_DATASET, flush_every=50)
+    memory = TranslationMemory()
+    service = TranslationService(backend=GoogleBackend(), memory=memory, rate=rate, max_concurrency=max_concurrency)
+    
+    async def run():
+        await service.open()
+        try:
+            await translate_frame(df, service, columns, writer, done_row_ids=done_row_ids)
+        finally:
+            await service.close()
+    
+    try:
+        asyncio.run(run())
+    finally:
+        writer.close()
+        memory.close()
+    return {"start": start, "end": end, **service.stats}
+
+
+#---- Stage 4: prices, FinBERT, daily features
+def fetch_price_history(symbol="VNINDEX", history_path=HISTORY_PATH):
+    """Extend history.csv with the sessions since its last row"""
+    from vnstock import Quote
+    
+    history_df = pd.read_csv(history_path, index_col=0) if os.path.isfile(history_path) else None
+    start_date = history_df["time"].max() if history_df is not None else HISTORY_START
+    new_df = Quote(symbol=symbol, source="VCI").history(start=str(start_date)[:10], end=date.today().isoformat())
+    new_df["time"] = pd.to_datetime(new_df["time"]).dt.strftime("%Y-%m-%d")
+    if history_df is not None:
+        new_df = pd.concat([history_df, new_df], ignore_index=True).drop_duplicates(subset=["time"], keep="last")
+    new_df = new_df.sort_values("time").reset_index(drop=True)
+    new_df.to_csv(history_path)
+    return {"path": history_path, "num_sessions": len(new_df), "last_session": new_df["time"].iloc[-1] if len(new_df) else None}
+
+
+def score_sentiment(path, batch_size=32):
+    """Join the stored translations onto the relevant rows and fold new articles (keyed by URL) into the daily state"""
+    from corpus_store import CorpusStore
+    from finbert_inference import FinbertInference, SENTENCE_SEP
+    from sentiment_features import SentimentFeatures, score_and_update
+    
+    store = CorpusStore()
+    df = pd.read_csv(path)
+    translations_df = store.read(TRANSLATIONS_DATASET, columns=["row_id", "translated"])
+    translations = dict(zip(translations_df["row_id"], translations_df["translated"]))
+    df = df[df["Unnamed: 0"].isin(list(translations))].reset_index(drop=True)
+    df["joined_translated"] = [SENTENCE_SEP.join(value for value in translations[row_id] if isinstance(value, str)) for row_id in df["Unnamed: 0"]]
+    
+    aggregator = SentimentFeatures(store=store)
+    df = df[~df["article_id"].astype(str).isin(aggregator.seen_ids)].reset_index(drop=True)
+    if not len(df):
+        return {"num_scored": 0}
+    engine = FinbertInference(batch_size=batch_size)
+    try:
+        new_articles = score_and_update(df, engine, aggregator, id_column="article_id")
+    finally:
+        engine.close()
+    return {"num_scored": len(new_articles)}
+
+
+def write_daily_features(realign=True):
+    from corpus_store import CorpusStore
+    from sentiment_features import SentimentFeatures
+    
+    aggregator = SentimentFeatures(store=CorpusStore())
+    if realign:
+        #-- history.csv may have gained sessions since the articles were folded in
+        aggregator.realign()
+    return {"path": aggregator.write_features(), "num_trading_days": len(aggregator.state)}
+
+
+if __name__=="__main__":
+    #-- Run the stages serially, without Airflow (debugging / a single machine)
+    parser = argparse.ArgumentParser(description="Run the news sentiment pipeline stages in one process")
+    parser.add_argument("--max-pages", type=int, default=50)
+    parser.add_argument("--watchlist", default=WATCHLIST_PATH)
+    parser.add_argument("--skip-translation", action="store_true")
+    args = parser.parse_args()
+    
+    run_tag = datetime.now().strftime("%Y%m%d%H%M%S")
+    listing_manifests = [crawl_listing_shard(**shard) for shard in plan_listing_shards(run_tag, max_pages=args.max_pages)]
+    for batch in plan_article_batches(listing_manifests):
+        print(crawl_article_batch(**batch))
+    relevant = select_relevant_sentences(run_tag, watchlist_path=args.watchlist)
+    print(f"{relevant['num_rows']} relevant articles in {relevant['path']}")
+    if not args.skip_translation:
+        for batch in relevant["batches"]:
+            print(translate_batch(**batch))
+    print(fetch_price_history())
+    print(score_sentiment(relevant["path"]))
+    print(write_daily_features())
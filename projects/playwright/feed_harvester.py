@@ -0,0 +1,222 @@
+import os
+import re
+import sys
+import json
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from playwright.async_api import async_playwright
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "newest_crawl"))
+from html_extract import make_yahoo_item
+from fetch_profile import PROFILE_SPECS, make_profile
+
+
+#---- Default locations
+FEED_DIR = os.path.dirname(os.path.abspath(__file__))
+FEED_PATH = os.path.join(FEED_DIR, "yahoo_feed_items.jsonl")
+
+
+def get_keyword_news_url(keyword="TSLA"):
+    return f"https://finance.yahoo.com/quote/{keyword}/news"
+
+
+#---- In page extraction: only the stream items not returned yet, marked so the next call skips them
+EXTRACT_NEW_ITEMS_JS = """
+() => {
+    const items = [];
+    for (const li of document.querySelectorAll("li.stream-item:not([data-harvested])")) {
+        li.setAttribute("data-harvested", "1");
+        const content = li.querySelector("div.content");
+        const link = content && (content.querySelector("a.subtle-link.titles") || content.querySelector("a[href]"));
+        if (!link) continue;
+        const footer = li.querySelector("div.footer");
+        items.push({
+            href: link.getAttribute("href") || "",
+            title: content.textContent,
+            footer: footer ? footer.textContent : "",
+        });
+    }
+    return items;
+}
+"""
+
+COUNT_ITEMS_JS = "() => document.querySelectorAll('li.stream-item').length"
+MORE_ITEMS_JS = "n => document.querySelectorAll('li.stream-item').length > n"
+
+
+#---- Relative times ("Reuters • 3 hours ago")
+RELATIVE_TIME_PATTERN = re.compile(r"(\d+|an?)\s+(second|minute|hour|day|week|month|year)s?\s+ago", re.IGNORECASE)
+UNIT_SECONDS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+    "month": 30 * 86400,
+    "year": 365 * 86400,
+}
+
+
+def parse_relative_time(text, now=None):
+    """Approximate publish time of a feed item, None when the text is not relative"""
+    now = now if now is not None else datetime.now()
+    text = text.strip().lower()
+    if text == "yesterday":
+        return now - timedelta(days=1)
+    match = RELATIVE_TIME_PATTERN.search(text)
+    if match is None:
+        return None
+    amount = 1 if match.group(1) in ("a", "an") else int(match.group(1))
+    return now - timedelta(seconds=amount * UNIT_SECONDS[match.group(2).lower()])
+
+
+def load_known_urls(path=FEED_PATH):
+    """ticker -> URLs already harvested, so incremental runs stop where the last one started"""
+    known_urls = {}
+    if not os.path.isfile(path):
+        return known_urls
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                item = json.loads(line)
+                known_urls.setdefault(item["ticker"], set()).add(item["item_url"])
+    return known_urls
+
+
+#---- Harvester
+class FeedHarvester():
+    """Scroll Yahoo news feeds until they stop growing, extracting only new items after each scroll"""
+    def __init__(self, max_pages=4, scroll_timeout=4000, patience=2, max_scrolls=200, profile=None, headless=None):
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.page_slots = asyncio.Semaphore(max_pages)
+        self.scroll_timeout = scroll_timeout
+        self.patience = patience
+        self.max_scrolls = max_scrolls
+        #-- Headless with images / fonts / ads aborted; `headless` overrides the profile's setting
+        self.profile = profile if profile is not None else make_profile("feed")
+        if headless is not None:
+            self.profile.headless = headless
+    
+    async def initialize(self):
+        """One browser and context shared by every ticker"""
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=self.profile.headless)
+        self.context = await self.browser.new_context(
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        )
+    
+    async def scroll_once(self, page):
+        """Press End and wait until the feed grows (or the timeout passes) instead of sleeping"""
+        count = await page.evaluate(COUNT_ITEMS_JS)
+        await page.keyboard.press("End")
+        try:
+            await page.wait_for_function(MORE_ITEMS_JS, arg=count, timeout=self.scroll_timeout)
+        except Exception:
+            pass
+    
+    async def harvest(self, ticker, known_urls=None, since=None, on_items=None):
+        """
+        Return the new items of `ticker`, newest first. Stops when a scroll brings nothing new
+        `patience` times in a row, at the first URL in `known_urls` or at the first item older than `since`.
+        """
+        known_urls = known_urls if known_urls is not None else set()
+        seen_urls = set()
+        items = []
+        async with self.page_slots:
+            page = await self.context.new_page()
+            await self.profile.apply(page)
+            try:
+                await page.goto(get_keyword_news_url(keyword=ticker), wait_until='domcontentloaded', timeout=60000)
+                idle_scrolls = 0
+                for _ in range(self.max_scrolls):
+                    new_items = []
+                    stop = False
+                    for raw_item in await page.evaluate(EXTRACT_NEW_ITEMS_JS):
+                        item = make_yahoo_item(raw_item["href"], raw_item["title"], raw_item["footer"])
+                        if item["item_url"] in seen_urls:
+                            continue
+                        seen_urls.add(item["item_url"])
+                        posted_time = parse_relative_time(item["time"])
+                        if item["item_url"] in known_urls or (since is not None and posted_time is not None and posted_time < since):
+                            stop = True
+                            break
+                        new_items.append({"ticker": ticker, **item})
+                    
+                    if new_items:
+                        items.extend(new_items)
+                        if on_items is not None:
+                            on_items(new_items)
+                        idle_scrolls = 0
+                    else:
+                        idle_scrolls += 1
+                    if stop or idle_scrolls >= self.patience:
+                        break
+                    await self.scroll_once(page)
+            finally:
+                #-- One load per ticker, every scroll included (failed ones too)
+                await self.profile.collect(page)
+                self.profile.forget(page)
+                await page.close()
+        return items
+    
+    async def harvest_many(self, tickers, known_urls=None, since=None, on_items=None):
+        """ticker -> items; at most max_pages tickers are scrolled at the same time"""
+        known_urls = known_urls if known_urls is not None else {}
+        
+        async def harvest_ticker(ticker):
+            try:
+                return await self.harvest(ticker, known_urls=known_urls.get(ticker), since=since, on_items=on_items)
+            except Exception as e:
+                print(f"Error harvesting {ticker}: {e}")
+                return []
+        
+        results = await asyncio.gather(*[harvest_ticker(ticker) for ticker in tickers])
+        return dict(zip(tickers, results))
+    
+    async def close(self):
+        """Close browser and playwright"""
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Harvest Yahoo Finance news feeds for a watchlist")
+    parser.add_argument("--tickers", nargs="+", default=["NVDA", "TSLA", "AAPL", "MSFT"])
+    parser.add_argument("--max-pages", type=int, default=4, help="tickers scrolled at the same time")
+    parser.add_argument("--since-hours", type=float, default=None, help="stop at items older than this")
+    parser.add_argument("--output", default=FEED_PATH)
+    parser.add_argument("--profile", default="feed", choices=sorted(PROFILE_SPECS), help="which requests the browser aborts")
+    parser.add_argument("--headed", action="store_true", help="show the browser window")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    since = datetime.now() - timedelta(hours=args.since_hours) if args.since_hours is not None else None
+    known_urls = load_known_urls(args.output)
+    
+    harvester = FeedHarvester(max_pages=args.max_pages, profile=make_profile(args.profile, headless=False if args.headed else None))
+    await harvester.initialize()
+    with open(args.output, "a", encoding="utf-8") as output_file:
+        #-- Stream items out as soon as a scroll yields them
+        def write_items(items):
+            for item in items:
+                output_file.write(json.dumps(item, ensure_ascii=False) + "\n")
+            output_file.flush()
+        
+        try:
+            results = await harvester.harvest_many(args.tickers, known_urls=known_urls, since=since, on_items=write_items)
+        finally:
+            await harvester.close()
+    for ticker, items in results.items():
+        print(f"{ticker}: {len(items)} new items")
+    print(harvester.profile.report())
+
+
+if __name__=="__main__":
+    asyncio.run(main())
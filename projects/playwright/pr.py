@@ -2,25 +2,32 @@
 # Posted by ggorlen, modified by community. See post 'Timeline' for change history
 # Retrieved 2026-01-20, License - CC BY-SA 4.0
 
+import os
+import sys
 import json
 import asyncio
 from tqdm import tqdm
 from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "newest_crawl"))
+from html_extract import parse_yahoo_feed
+from feed_harvester import FeedHarvester
+from fetch_profile import make_profile
 
 
 class PlaywrightScrolling():
-    def __init__(self):
+    def __init__(self, profile=None):
         self.playwright = None
         self.browser = None
         self.page = None
         self.url = None
+        self.profile = profile if profile is not None else make_profile("feed")
     
     async def initialize(self, url, resume_page=None):
         """Initialize the playwright instance and browser"""
         self.url = url
         self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=False)
+        self.browser = await self.playwright.chromium.launch(headless=self.profile.headless)
         if resume_page:
             self.page = resume_page
         else:
@@ -28,6 +35,7 @@ class PlaywrightScrolling():
                 user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
             )
             self.page = await context.new_page()
+            await self.profile.apply(self.page)
             
             # Set longer timeout and wait for network idle
             try:
@@ -59,8 +67,8 @@ class PlaywrightScrolling():
             else:
                 prev_height = new_height
                 break
-        
-        
+    
+    
     async def get_page_content(self):
         return await self.page.content()
     
@@ -70,10 +78,10 @@ class PlaywrightScrolling():
             await self.browser.close()
         if self.playwright:
             await self.playwright.stop()
-        
-        
-        
-        
+
+
+
+
 # BEAUTIFUL SOUP
 def save_html(content, path):
     with open(path, 'w', encoding='utf-8') as f:
@@ -88,51 +96,28 @@ def get_keyword_news_url(keyword="TSLA"):
 
 
 def parse_thumnail_details_in_source(source_content):
-    source_soup = BeautifulSoup(source_content)
-    all_news_html = source_soup.find_all("li", class_="stream-item story-item yf-9xydx9")
-    all_news_items = []
-    for new_html in tqdm(all_news_html):
-        item_title_html = new_html.find("div", class_="content yf-1u32w3i")
-        
-        item_url = item_title_html.find("a", "subtle-link fin-size-small titles noUnderline yf-119g04z").get("href", "")
-        title = item_title_html.text
-        item_posted_time = new_html.find("div", class_="footer yf-1u32w3i").text
-        if item_posted_time in title:
-            title = title.replace(item_posted_time, "")
-        item_posted_time = item_posted_time.split("•")[-1]
-
-        item = {
-            "item_url": item_url.strip(), 
-            "title": title.strip(),
-            "time": item_posted_time.strip(),
-        }
-        all_news_items.append(item)
-    return all_news_items
+    return parse_yahoo_feed(source_content)
 
 
 async def main():
-    url = get_keyword_news_url(keyword="NVDA")
-    scroller = PlaywrightScrolling()
-    await scroller.initialize(url=url)
-    
-    #-- Scrolling
-    for i in tqdm(range(30)):
-        await scroller.scroll()
-    page_content = await scroller.get_page_content()
-    all_news_items = parse_thumnail_details_in_source(page_content)
+    #-- Scroll until the feed stops growing, extracting new items in the page after each scroll
+    harvester = FeedHarvester(max_pages=1)
+    await harvester.initialize()
+    try:
+        all_news_items = await harvester.harvest("NVDA")
+    finally:
+        await harvester.close()
     
     
     #-- Parse
     save_json({
-        "all_news_items": all_news_items
+        "all_news_items": [{key: item[key] for key in ("item_url", "title", "time")} for item in all_news_items]
     }, path="all_news_items.json")
-    
-    await scroller.close()
 
 
 if __name__=="__main__":
     asyncio.run(main())
-    
-    
-        
+
+
+
 # https://www.investing.com/equities/nvidia-corp-news # Update annually
\ No newline at end of file
@@ -0,0 +1,314 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import unicodedata
+import pandas as pd
+
+
+#---- Defaults
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sentence_index.sqlite")
+CRAWL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "newest_crawl")
+CONTENTS_DIR = os.path.join(CRAWL_DIR, "save_news_contents")
+URLS_DIR = os.path.join(CRAWL_DIR, "save_news_urls")
+
+#-- Sentence ends, but not the thousands / decimal dots inside numbers (12.000, 1.5)
+SENTENCE_END = re.compile(r"(?<!\d)[.!?]+(?!\d)|[.!?]+(?=\s)|\n+")
+WORD_PATTERN = re.compile(r"\w+")
+QUERY_TOKEN = re.compile(r'"[^"]*"|\(|\)|[^\s()"]+')
+OPERATORS = {"AND", "OR", "NOT"}
+
+
+def split_sentences(text):
+    if not isinstance(text, str):
+        return []
+    return [sentence.strip() for sentence in SENTENCE_END.split(text) if sentence and sentence.strip()]
+
+
+def tokenize(text):
+    """NFC, lowercase, words only: "HM:DPM" -> ["hm", "dpm"]"""
+    return WORD_PATTERN.findall(unicodedata.normalize("NFC", text).lower())
+
+
+def contains_phrase(words, phrase):
+    size = len(phrase)
+    return any(words[i: i+size] == phrase for i in range(len(words) - size + 1))
+
+
+#---- Query parsing
+def parse_query(query):
+    """
+    Boolean query -> nested tuples. Terms and "quoted phrases", AND / OR / NOT (upper case),
+    parentheses; terms next to each other are ANDed. A bare term spanning several words is a phrase.
+    """
+    tokens = QUERY_TOKEN.findall(query)
+    position = 0
+    
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+    
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+    
+    def parse_or():
+        node = parse_and()
+        while peek() == "OR":
+            take()
+            node = ("or", node, parse_and())
+        return node
+    
+    def parse_and():
+        node = parse_not()
+        while peek() is not None and peek() not in ("OR", ")"):
+            if peek() == "AND":
+                take()
+            node = ("and", node, parse_not())
+        return node
+    
+    def parse_not():
+        if peek() == "NOT":
+            take()
+            return ("not", parse_not())
+        return parse_atom()
+    
+    def parse_atom():
+        token = peek()
+        if token is None or token in OPERATORS or token == ")":
+            raise ValueError(f"Unexpected {token!r} in query {query!r}")
+        take()
+        if token == "(":
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError(f"Unbalanced parentheses in query {query!r}")
+            take()
+            return node
+        words = tokenize(token.strip('"'))
+        if not words:
+            raise ValueError(f"Empty term in query {query!r}")
+        return ("term", words[0]) if len(words) == 1 else ("phrase", tuple(words))
+    
+    node = parse_or()
+    if peek() is not None:
+        raise ValueError(f"Unexpected {peek()!r} in query {query!r}")
+    return node
+
+
+def watchlist_query(ticker, aliases=()):
+    """Ticker symbol or any of its aliases, as phrases"""
+    return " OR ".join(f'"{name}"' for name in [ticker, *aliases])
+
+
+#---- Index
+class SentenceIndex():
+    """Sentence level inverted index (term -> sentence ids) over crawled articles, built incrementally"""
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS articles (
+                article_no INTEGER PRIMARY KEY,
+                article_id TEXT NOT NULL UNIQUE,
+                title TEXT,
+                posted_date TEXT
+            );
+            CREATE TABLE IF NOT EXISTS sentences (
+                sentence_id INTEGER PRIMARY KEY,
+                article_no INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                sentence_id INTEGER NOT NULL,
+                PRIMARY KEY (term, sentence_id)
+            ) WITHOUT ROWID;
+        """)
+        self.connection.commit()
+    
+    def __contains__(self, article_id):
+        return self.connection.execute("SELECT 1 FROM articles WHERE article_id = ?", (article_id,)).fetchone() is not None
+    
+    def add_article(self, article_id, text, title=None, posted_date=None, commit=True):
+        """Index one article's sentences; already indexed ids are skipped. Returns the number of sentences added"""
+        if article_id in self:
+            return 0
+        cursor = self.connection.execute("INSERT INTO articles (article_id, title, posted_date) VALUES (?, ?, ?)", (article_id, title, posted_date))
+        article_no = cursor.lastrowid
+        num_sentences = 0
+        for position, sentence in enumerate(split_sentences(text)):
+            words = tokenize(sentence)
+            if not words:
+                continue
+            sentence_id = self.connection.execute(
+                "INSERT INTO sentences (article_no, position, text) VALUES (?, ?, ?)", (article_no, position, sentence)
+            ).lastrowid
+            self.connection.executemany("INSERT OR IGNORE INTO postings (term, sentence_id) VALUES (?, ?)", [(word, sentence_id) for word in set(words)])
+            num_sentences += 1
+        if commit:
+            self.connection.commit()
+        return num_sentences
+    
+    def add_articles(self, articles):
+        """(article_id, text, title, posted_date) tuples in one transaction"""
+        num_sentences = sum(self.add_article(*article, commit=False) for article in articles)
+        self.connection.commit()
+        return num_sentences
+    
+    def postings(self, term, cache):
+        if term not in cache:
+            rows = self.connection.execute("SELECT sentence_id FROM postings WHERE term = ?", (term,))
+            cache[term] = {sentence_id for sentence_id, in rows}
+        return cache[term]
+    
+    def all_sentence_ids(self, cache):
+        if None not in cache:
+            cache[None] = {sentence_id for sentence_id, in self.connection.execute("SELECT sentence_id FROM sentences")}
+        return cache[None]
+    
+    def sentence_texts(self, sentence_ids, chunk_size=500):
+        sentence_ids = list(sentence_ids)
+        texts = {}
+        for start in range(0, len(sentence_ids), chunk_size):
+            chunk = sentence_ids[start: start+chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            texts.update(self.connection.execute(f"SELECT sentence_id, text FROM sentences WHERE sentence_id IN ({placeholders})", chunk))
+        return texts
+    
+    def evaluate(self, node, cache):
+        kind = node[0]
+        if kind == "term":
+            return self.postings(node[1], cache)
+        if kind == "phrase":
+            #-- Every word present, then an exact check on the (short) candidate sentences
+            candidates = set.intersection(*[self.postings(word, cache) for word in node[1]])
+            phrase = list(node[1])
+            return {sentence_id for sentence_id, text in self.sentence_texts(candidates).items() if contains_phrase(tokenize(text), phrase)}
+        if kind == "and":
+            left, right = node[1], node[2]
+            #-- "x AND NOT y" is a difference, no need to materialize NOT y
+            if right[0] == "not":
+                return self.evaluate(left, cache) - self.evaluate(right[1], cache)
+            if left[0] == "not":
+                return self.evaluate(right, cache) - self.evaluate(left[1], cache)
+            return self.evaluate(left, cache) & self.evaluate(right, cache)
+        if kind == "or":
+            return self.evaluate(node[1], cache) | self.evaluate(node[2], cache)
+        if kind == "not":
+            return self.all_sentence_ids(cache) - self.evaluate(node[1], cache)
+        raise ValueError(f"Unknown query node {kind!r}")
+    
+    def search_ids(self, query, cache=None):
+        return self.evaluate(parse_query(query), {} if cache is None else cache)
+    
+    def sentences_frame(self, sentence_ids, chunk_size=500):
+        """article_id, title, posted_date, position, text for the sentence ids, in article / position order"""
+        sentence_ids = list(sentence_ids)
+        frames = []
+        for start in range(0, len(sentence_ids), chunk_size):
+            chunk = sentence_ids[start: start+chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            frames.append(pd.read_sql_query(
+                f"""
+                SELECT s.sentence_id, a.article_no, a.article_id, a.title, a.posted_date, s.position, s.text
+                FROM sentences s JOIN articles a ON a.article_no = s.article_no
+                WHERE s.sentence_id IN ({placeholders})
+                """,
+                self.connection,
+                params=chunk,
+            ))
+        if not frames:
+            return pd.DataFrame(columns=["sentence_id", "article_no", "article_id", "title", "posted_date", "position", "text"])
+        return pd.concat(frames, ignore_index=True).sort_values(["article_no", "position"], ignore_index=True)
+    
+    def search(self, query):
+        return self.sentences_frame(self.search_ids(query))
+    
+    def relative_sentences(self, watchlist, max_sentences=5):
+        """
+        One row per article mentioning the watchlist: matched tickers and the first `max_sentences`
+        matching sentences as relative_sen_0.. columns, the layout translate.ipynb reads.
+        """
+        cache = {}
+        tickers_by_sentence = {}
+        for ticker, aliases in watchlist.items():
+            for sentence_id in self.search_ids(watchlist_query(ticker, aliases), cache=cache):
+                tickers_by_sentence.setdefault(sentence_id, []).append(ticker)
+        sentences_df = self.sentences_frame(tickers_by_sentence)
+        
+        rows = []
+        for (article_no, article_id, title, posted_date), article_df in sentences_df.groupby(["article_no", "article_id", "title", "posted_date"], sort=True, dropna=False):
+            row = {"article_no": article_no, "article_id": article_id, "title": title, "posted_date": posted_date}
+            row["tickers"] = " ".join(sorted({ticker for sentence_id in article_df["sentence_id"] for ticker in tickers_by_sentence[sentence_id]}))
+            for i, text in enumerate(article_df["text"].iloc[:max_sentences]):
+                row[f"relative_sen_{i}"] = text
+            rows.append(row)
+        return pd.DataFrame(rows)
+    
+    def summary(self):
+        return {
+            table: self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("articles", "sentences", "postings")
+        }
+    
+    def close(self):
+        self.connection.close()
+
+
+def load_watchlist(path):
+    """JSON {ticker: [aliases, ...]} or a plain list of tickers"""
+    with open(path, "r", encoding="utf-8") as file:
+        watchlist = json.load(file)
+    if isinstance(watchlist, list):
+        watchlist = {ticker: [] for ticker in watchlist}
+    return watchlist
+
+
+def index_saved_pages(index, contents_dir=CONTENTS_DIR, urls_dir=URLS_DIR):
+    """Backfill from the per page JSON files, keyed by item_url like the crawl pipeline / DAG"""
+    sys.path.append(CRAWL_DIR)
+    from crawl_index import saved_articles
+    
+    return index.add_articles([
+        (item_url, news_detail_dict.get("main_content", ""), news_detail_dict.get("title"), news_detail_dict.get("posted_date"))
+        for _, _, item_url, news_detail_dict in saved_articles(contents_dir, urls_dir) if item_url is not None
+    ])
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Sentence level inverted index over crawled articles")
+    parser.add_argument("--path", default=INDEX_PATH)
+    parser.add_argument("--build", action="store_true", help="index new articles from the saved content pages")
+    parser.add_argument("--contents-dir", default=CONTENTS_DIR)
+    parser.add_argument("--urls-dir", default=URLS_DIR)
+    parser.add_argument("--query", default=None, help='e.g. \'(dpm OR "đạm phú mỹ") AND NOT "khuyến nghị"\'')
+    parser.add_argument("--watchlist", default=None, help="JSON {ticker: [aliases]} to turn into relative_sen columns")
+    parser.add_argument("--save-path", default=None)
+    parser.add_argument("--max-sentences", type=int, default=5)
+    args = parser.parse_args()
+    
+    index = SentenceIndex(path=args.path)
+    if args.build:
+        start_time = time.perf_counter()
+        num_sentences = index_saved_pages(index, args.contents_dir, args.urls_dir)
+        print(f"Indexed {num_sentences} new sentences in {time.perf_counter() - start_time:.1f}s")
+    print(index.summary())
+    
+    if args.query is not None:
+        start_time = time.perf_counter()
+        results_df = index.search(args.query)
+        print(f"{len(results_df)} sentences in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+        print(results_df[["article_id", "position", "text"]].head(20).to_string())
+    if args.watchlist is not None:
+        start_time = time.perf_counter()
+        relative_df = index.relative_sentences(load_watchlist(args.watchlist), max_sentences=args.max_sentences)
+        print(f"{len(relative_df)} articles for the watchlist in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+        if args.save_path is not None:
+            relative_df.to_csv(args.save_path)
+    index.close()
@@ -0,0 +1,265 @@
+import os
+import sys
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import unicodedata
+import pandas as pd
+from abc import ABC, abstractmethod
+from tqdm import tqdm
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "storage"))
+from corpus_store import CorpusStore, BufferedWriter
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "monitoring"))
+from metrics import METRICS
+
+
+#---- Defaults
+MEMORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translation_memory.sqlite")
+
+
+def normalize_sentence(sentence):
+    """Translation memory key: NFC, collapsed whitespace"""
+    sentence = unicodedata.normalize("NFC", sentence)
+    return " ".join(sentence.split())
+
+
+def is_blank(sentence):
+    return not isinstance(sentence, str) or not sentence.strip()
+
+
+#---- Backends
+class TranslationBackend(ABC):
+    """open / close are optional, translate is not"""
+    async def open(self):
+        pass
+    
+    @abstractmethod
+    async def translate(self, sentence, src="vi", dest="en"):
+        pass
+    
+    async def close(self):
+        pass
+
+
+class GoogleBackend(TranslationBackend):
+    """One googletrans client for the whole run instead of one per sentence"""
+    def __init__(self):
+        self.translator = None
+    
+    async def open(self):
+        from googletrans import Translator
+        self.translator = Translator()
+        await self.translator.__aenter__()
+    
+    async def translate(self, sentence, src="vi", dest="en"):
+        result = await self.translator.translate(sentence, src=src, dest=dest)
+        return result.text
+    
+    async def close(self):
+        if self.translator is not None:
+            await self.translator.__aexit__(None, None, None)
+            self.translator = None
+
+
+class LocalBackend(TranslationBackend):
+    """Offline stand-in for tests / benchmarks: lookup table, else a tagged echo"""
+    def __init__(self, mapping=None, latency=0.0, fail_every=0):
+        self.mapping = mapping or {}
+        self.latency = latency
+        self.fail_every = fail_every
+        self.num_calls = 0
+    
+    async def translate(self, sentence, src="vi", dest="en"):
+        self.num_calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_every and self.num_calls % self.fail_every == 0:
+            raise ConnectionError("simulated backend failure")
+        return self.mapping.get(sentence, f"[{dest}] {sentence}")
+
+
+#---- Rate limiting
+class TokenBucket():
+    """Global limiter: `rate` requests per second with bursts up to `capacity`"""
+    def __init__(self, rate=5.0, capacity=5):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+#---- Translation memory
+class TranslationMemory():
+    """Persistent normalized source sentence -> translation"""
+    def __init__(self, path=MEMORY_PATH):
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                src TEXT NOT NULL,
+                dest TEXT NOT NULL,
+                source TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                PRIMARY KEY (src, dest, source)
+            )
+        """)
+        self.connection.commit()
+    
+    def get_many(self, keys, src="vi", dest="en", chunk_size=500):
+        found = {}
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start: start+chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT source, translation FROM translations WHERE src = ? AND dest = ? AND source IN ({placeholders})",
+                (src, dest, *chunk),
+            )
+            found.update(rows)
+        return found
+    
+    def put(self, key, translation, src="vi", dest="en"):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO translations (src, dest, source, translation) VALUES (?, ?, ?, ?)",
+            (src, dest, key, translation),
+        )
+        self.connection.commit()
+    
+    def close(self):
+        self.connection.close()
+
+
+#---- Service
+class TranslationService():
+    """Deduplicating, rate limited translation with per sentence retries"""
+    def __init__(self, backend, memory=None, rate=5.0, burst=5, max_concurrency=10, max_retries=5, backoff=1.0, src="vi", dest="en"):
+        self.backend = backend
+        self.memory = memory
+        self.bucket = TokenBucket(rate=rate, capacity=burst)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.src = src
+        self.dest = dest
+        self.in_flight = {}
+        self.stats = {"requests": 0, "memory_hits": 0, "retries": 0, "failures": 0}
+    
+    async def open(self):
+        await self.backend.open()
+    
+    async def close(self):
+        await self.backend.close()
+    
+    async def request(self, key):
+        for attempt in range(self.max_retries):
+            await self.bucket.acquire()
+            start_time = time.perf_counter()
+            try:
+                async with self.semaphore:
+                    self.stats["requests"] += 1
+                    translation = await self.backend.translate(key, src=self.src, dest=self.dest)
+                METRICS.timing("translator.request", time.perf_counter() - start_time, tags={"outcome": "ok"})
+                if self.memory is not None:
+                    self.memory.put(key, translation, src=self.src, dest=self.dest)
+                return translation
+            except Exception as e:
+                outcome = "timeout" if isinstance(e, (asyncio.TimeoutError, TimeoutError)) else type(e).__name__
+                METRICS.timing("translator.request", time.perf_counter() - start_time, tags={"outcome": outcome})
+                if attempt == self.max_retries - 1:
+                    self.stats["failures"] += 1
+                    METRICS.increment("translator.failures", tags={"error": outcome})
+                    print(f"Translation failed after {self.max_retries} attempts: {e}")
+                    return None
+                self.stats["retries"] += 1
+                METRICS.increment("translator.retries", tags={"error": outcome})
+                await asyncio.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+    
+    async def translate_one(self, key):
+        #-- Concurrent callers asking for the same sentence share one request
+        if key not in self.in_flight:
+            self.in_flight[key] = asyncio.ensure_future(self.request(key))
+        try:
+            return await self.in_flight[key]
+        finally:
+            self.in_flight.pop(key, None)
+    
+    async def translate_many(self, sentences):
+        """Translations in input order; blank inputs come back unchanged, failures as None"""
+        keys = [None if is_blank(sentence) else normalize_sentence(sentence) for sentence in sentences]
+        unique_keys = list(dict.fromkeys(key for key in keys if key is not None))
+        known = self.memory.get_many(unique_keys, src=self.src, dest=self.dest) if self.memory is not None else {}
+        self.stats["memory_hits"] += len(known)
+        
+        missing = [key for key in unique_keys if key not in known]
+        METRICS.increment("translator.sentences", len(sentences))
+        METRICS.increment("translator.memory_hits", len(known))
+        METRICS.gauge("translator.in_flight", len(self.in_flight) + len(missing))
+        translations = await asyncio.gather(*[self.translate_one(key) for key in missing])
+        known.update(zip(missing, translations))
+        return [sentence if key is None else known[key] for sentence, key in zip(sentences, keys)]
+
+
+async def translate_frame(df, service, columns, writer, id_column="Unnamed: 0", done_row_ids=(), rows_per_chunk=50):
+    """Translate `columns` row by row in chunks and write one record per finished row"""
+    todo_df = df[~df[id_column].isin(set(done_row_ids))]
+    for start in tqdm(range(0, len(todo_df), rows_per_chunk), desc="Translate"):
+        chunk_df = todo_df.iloc[start: start+rows_per_chunk]
+        values = chunk_df[columns].values
+        translated = await service.translate_many([value for row in values for value in row])
+        for i, row_id in enumerate(chunk_df[id_column]):
+            row_translations = translated[i * len(columns): (i+1) * len(columns)]
+            #-- A row with a failed sentence is left for the next run
+            if any(translation is None and not is_blank(value) for translation, value in zip(row_translations, values[i])):
+                continue
+            writer.write({
+                "row_id": int(row_id),
+                "translated": [translation if isinstance(translation, str) else None for translation in row_translations],
+            })
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Translate relative_sen columns vi -> en")
+    parser.add_argument("data_path")
+    parser.add_argument("--rate", type=float, default=5.0)
+    parser.add_argument("--max-concurrency", type=int, default=10)
+    parser.add_argument("--local", action="store_true", help="use the offline stand-in backend")
+    args = parser.parse_args()
+    
+    df = pd.read_csv(args.data_path)
+    columns = [col_name for col_name in df.columns if "relative_sen" in col_name]
+    
+    store = CorpusStore()
+    done_row_ids = store.read("translations", columns=["row_id"])["row_id"]
+    writer = BufferedWriter(store, "translations", flush_every=50)
+    memory = TranslationMemory()
+    service = TranslationService(
+        backend=LocalBackend() if args.local else GoogleBackend(),
+        memory=memory,
+        rate=args.rate,
+        max_concurrency=args.max_concurrency,
+    )
+    await service.open()
+    try:
+        await translate_frame(df, service, columns, writer, done_row_ids=done_row_ids)
+    finally:
+        writer.close()
+        await service.close()
+        memory.close()
+    print(service.stats)
+
+
+if __name__=="__main__":
+    asyncio.run(main())
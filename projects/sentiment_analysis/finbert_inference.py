@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+import pandas as pd
+from tqdm import tqdm
+from transformers import pipeline
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "monitoring"))
+from metrics import METRICS
+
+
+#---- Defaults
+MODEL_NAME = "ProsusAI/finbert"
+LABEL2ID = {"negative": 0, "positive": 1, "neutral": 2}
+SENTENCE_SEP = "<SEP>"
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "finbert_cache.sqlite")
+
+
+def backend_model_name(backend, model_name=MODEL_NAME):
+    """Cache namespace of a backend: ONNX / INT8 scores must not be served as PyTorch FP32 ones (and vice versa)"""
+    return model_name if backend == "pytorch" else f"{model_name}+{backend}"
+
+
+def sentence_key(sentence, model_name, max_length):
+    return hashlib.sha1(f"{model_name}\x00{max_length}\x00{sentence}".encode("utf-8")).hexdigest()
+
+
+def split_sentences(joined_text, sep=SENTENCE_SEP):
+    if not isinstance(joined_text, str) or not joined_text:
+        return []
+    return joined_text.split(sep)
+
+
+#---- On disk cache
+class SentimentCache():
+    """sentence hash -> (label, score), shared across runs"""
+    def __init__(self, path=CACHE_PATH):
+        #-- Sharded workers share the file, wait on their locks instead of failing
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, label TEXT NOT NULL, score REAL NOT NULL)")
+        self.connection.commit()
+    
+    def get_many(self, keys, chunk_size=500):
+        found = {}
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start: start+chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(f"SELECT key, label, score FROM scores WHERE key IN ({placeholders})", chunk)
+            for key, label, score in rows:
+                found[key] = (label, score)
+        return found
+    
+    def put_many(self, items):
+        self.connection.executemany("INSERT OR REPLACE INTO scores (key, label, score) VALUES (?, ?, ?)", items)
+        self.connection.commit()
+    
+    def close(self):
+        self.connection.close()
+
+
+#---- Inference engine
+class FinbertInference():
+    """Batched, cached FinBERT scoring over flattened sentences"""
+    def __init__(self, model_name=MODEL_NAME, batch_size=32, max_length=256, chunk_size=1024, cache_path=CACHE_PATH, pipe=None, device=-1):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.chunk_size = chunk_size
+        self.pipe = pipe if pipe is not None else pipeline("text-classification", model=model_name, device=device)
+        self.cache = SentimentCache(cache_path) if cache_path else None
+    
+    def predict(self, sentences):
+        """Raw pipeline call, sentences should already be length sorted"""
+        start_time = time.perf_counter()
+        results = self.pipe(
+            sentences,
+            truncation=True,
+            max_length=self.max_length,
+            padding=True,
+            batch_size=self.batch_size,
+        )
+        METRICS.timing("scorer.chunk", time.perf_counter() - start_time)
+        METRICS.increment("scorer.sentences_scored", len(sentences))
+        return [(item["label"], item["score"]) for item in results]
+    
+    def score_sentences(self, sentences, show_progress=True):
+        """(label, score) per sentence; duplicates and cached sentences are scored once"""
+        unique_sentences = list(dict.fromkeys(sentences))
+        keys = {sentence: sentence_key(sentence, self.model_name, self.max_length) for sentence in unique_sentences}
+        cached = self.cache.get_many(list(keys.values())) if self.cache is not None else {}
+        results = {sentence: cached[key] for sentence, key in keys.items() if key in cached}
+        METRICS.increment("scorer.sentences", len(sentences))
+        METRICS.increment("scorer.cache_hits", len(results))
+        
+        #-- Length sorted so each batch pads to similar lengths
+        missing = sorted((sentence for sentence in unique_sentences if sentence not in results), key=len)
+        for start in tqdm(range(0, len(missing), self.chunk_size), disable=not show_progress, desc="FinBERT"):
+            chunk = missing[start: start+self.chunk_size]
+            chunk_results = self.predict(chunk)
+            results.update(zip(chunk, chunk_results))
+            if self.cache is not None:
+                self.cache.put_many([(keys[sentence], label, score) for sentence, (label, score) in zip(chunk, chunk_results)])
+        return [results[sentence] for sentence in sentences]
+    
+    def score_rows(self, rows, show_progress=True):
+        """Flatten rows of sentences into one scoring pass and split the results back per row"""
+        flat_sentences = [sentence for row in rows for sentence in row]
+        flat_results = self.score_sentences(flat_sentences, show_progress=show_progress)
+        row_results = []
+        offset = 0
+        for row in rows:
+            row_results.append(flat_results[offset: offset+len(row)])
+            offset += len(row)
+        return row_results
+    
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+
+def sentiment_analysis(pipe, texts):
+    """Same contract as the notebook helper: space joined label ids. `pipe` may be a FinbertInference"""
+    if isinstance(pipe, FinbertInference):
+        results = pipe.score_sentences(list(texts), show_progress=False)
+        labels = [label for label, _ in results]
+    else:
+        labels = [item["label"] for item in pipe(texts)]
+    label_ids = [str(LABEL2ID[label]) for label in labels]
+    return " ".join(label_ids)
+
+
+def label_frame(df, engine, text_column="joined_translated", sep=SENTENCE_SEP):
+    """Write `labels` (space joined ids, as before) and `scores` back onto the rows"""
+    rows = [split_sentences(text, sep=sep) for text in df[text_column]]
+    row_results = engine.score_rows(rows)
+    df["labels"] = [" ".join(str(LABEL2ID[label]) for label, _ in results) for results in row_results]
+    df["scores"] = [" ".join(f"{score:.4f}" for _, score in results) for results in row_results]
+    return df
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Score translated news with FinBERT")
+    parser.add_argument("data_path")
+    parser.add_argument("save_path")
+    parser.add_argument("--text-column", default="joined_translated")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--backend", default="pytorch", choices=["pytorch", "onnx", "onnx-int8"])
+    args = parser.parse_args()
+    
+    pipe = None
+    if args.backend != "pytorch":
+        #-- optimum / onnxruntime are only needed for the ONNX backends
+        from finbert_onnx import load_pipeline
+        pipe = load_pipeline(args.backend)
+    engine = FinbertInference(
+        model_name=backend_model_name(args.backend),
+        pipe=pipe,
+        batch_size=args.batch_size,
+        max_length=args.max_length,
+        cache_path=None if args.no_cache else CACHE_PATH,
+    )
+    df = pd.read_csv(args.data_path)
+    df = label_frame(df, engine, text_column=args.text_column)
+    df.to_csv(args.save_path, index=False)
+    engine.close()
@@ -0,0 +1,105 @@
+import os
+import time
+import argparse
+import pandas as pd
+from transformers import AutoTokenizer, pipeline
+from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from finbert_inference import MODEL_NAME, LABEL2ID, FinbertInference
+
+
+#---- Defaults
+ONNX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "save", "finbert_onnx")
+QUANTIZED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "save", "finbert_onnx_int8")
+TEST_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "project_2_training", "data", "test.csv")
+
+
+#---- Export
+def export_onnx(model_name=MODEL_NAME, save_dir=ONNX_DIR):
+    """Export once; later calls reuse the saved model"""
+    if not os.path.isfile(os.path.join(save_dir, "model.onnx")):
+        model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model.save_pretrained(save_dir)
+        tokenizer.save_pretrained(save_dir)
+    return save_dir
+
+
+def quantize_onnx(onnx_dir=ONNX_DIR, save_dir=QUANTIZED_DIR):
+    """Dynamic INT8 quantization of the exported model (weights only, no calibration data)"""
+    if not os.path.isfile(os.path.join(save_dir, "model_quantized.onnx")):
+        quantizer = ORTQuantizer.from_pretrained(onnx_dir)
+        quantization_config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=save_dir, quantization_config=quantization_config)
+        AutoTokenizer.from_pretrained(onnx_dir).save_pretrained(save_dir)
+    return save_dir
+
+
+#---- Pipelines
+def load_pipeline(backend="pytorch", model_name=MODEL_NAME):
+    """text-classification pipeline for `pytorch`, `onnx` or `onnx-int8`; all serve sentiment_analysis(pipe, texts)"""
+    if backend == "pytorch":
+        return pipeline("text-classification", model=model_name)
+    
+    model_dir = export_onnx(model_name=model_name)
+    file_name = "model.onnx"
+    if backend == "onnx-int8":
+        model_dir = quantize_onnx(onnx_dir=model_dir)
+        file_name = "model_quantized.onnx"
+    elif backend != "onnx":
+        raise ValueError(f"Unknown backend: {backend}")
+    model = ORTModelForSequenceClassification.from_pretrained(model_dir, file_name=file_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    return pipeline("text-classification", model=model, tokenizer=tokenizer)
+
+
+#---- Parity check
+def evaluate_backend(backend, texts, labels, batch_size=32, max_length=256):
+    engine = FinbertInference(pipe=load_pipeline(backend), batch_size=batch_size, max_length=max_length, cache_path=None)
+    
+    #-- Warm up so session / graph setup is not timed
+    engine.predict(texts[:batch_size])
+    start_time = time.perf_counter()
+    results = engine.score_sentences(texts, show_progress=False)
+    elapsed = time.perf_counter() - start_time
+    
+    pred_ids = [LABEL2ID[label] for label, _ in results]
+    accuracy = sum(int(pred == label) for pred, label in zip(pred_ids, labels)) / len(labels)
+    return {
+        "backend": backend,
+        "accuracy": accuracy,
+        "sentences_per_second": len(texts) / elapsed,
+        "seconds": elapsed,
+        "pred_ids": pred_ids,
+    }
+
+
+def parity_check(test_path=TEST_PATH, backends=("pytorch", "onnx", "onnx-int8"), batch_size=32, max_length=256):
+    test_df = pd.read_csv(test_path)
+    texts = [str(text) for text in test_df["title"].values]
+    labels = list(test_df["label"].values)
+    
+    reports = [evaluate_backend(backend, texts, labels, batch_size=batch_size, max_length=max_length) for backend in backends]
+    reference = reports[0]
+    rows = []
+    for report in reports:
+        agreement = sum(int(a == b) for a, b in zip(report["pred_ids"], reference["pred_ids"])) / len(texts)
+        rows.append({
+            "backend": report["backend"],
+            "accuracy": round(report["accuracy"], 4),
+            "accuracy_drift": round(report["accuracy"] - reference["accuracy"], 4),
+            "agreement": round(agreement, 4),
+            "sentences_per_second": round(report["sentences_per_second"], 1),
+            "speedup": round(report["sentences_per_second"] / reference["sentences_per_second"], 2),
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Export FinBERT to ONNX and compare it with the PyTorch pipeline")
+    parser.add_argument("--test-path", default=TEST_PATH)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-length", type=int, default=256)
+    args = parser.parse_args()
+    
+    print(parity_check(test_path=args.test_path, batch_size=args.batch_size, max_length=args.max_length).to_string(index=False))
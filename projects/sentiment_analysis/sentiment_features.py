@@ -0,0 +1,249 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "storage"))
+from corpus_store import CorpusStore
+
+
+#---- Default locations
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_PATH = os.path.join(PROJECTS_DIR, "data", "history.csv")
+FEATURES_DIR = os.path.join(PROJECTS_DIR, "data", "features")
+
+#-- Same ids as finbert_inference.LABEL2ID (kept here so aggregation does not need transformers)
+LABEL2ID = {"negative": 0, "positive": 1, "neutral": 2}
+NEGATIVE, POSITIVE, NEUTRAL = LABEL2ID["negative"], LABEL2ID["positive"], LABEL2ID["neutral"]
+
+#-- News after the close counts for the next session (HOSE closes at 15:00)
+MARKET_CLOSE_HOUR = 15
+
+#-- Additive per day state; every output feature is derived from these sums
+STATE_COLUMNS = ["article_volume", "sentence_count", "negative_count", "positive_count", "neutral_count", "score_sum", "signed_score_sum", "article_net_sum"]
+
+
+#---- Per sentence arrays
+class SentenceArrays():
+    """Ragged per article sentences as flat numeric arrays: article i owns [offsets[i], offsets[i+1])"""
+    def __init__(self, offsets, label_ids, scores):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.label_ids = np.asarray(label_ids, dtype=np.int8)
+        self.scores = np.asarray(scores, dtype=np.float32)
+    
+    @classmethod
+    def from_row_results(cls, row_results):
+        """FinbertInference.score_rows output -> arrays, no string round trip"""
+        lengths = [len(results) for results in row_results]
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        label_ids = [LABEL2ID[label] for results in row_results for label, _ in results]
+        scores = [score for results in row_results for _, score in results]
+        return cls(offsets, label_ids, scores)
+    
+    @classmethod
+    def from_label_strings(cls, labels, scores=None):
+        """Legacy `labels` / `scores` columns of label_frame ("2 0 1", "0.91 0.85 0.77")"""
+        label_rows = [np.array(text.split(), dtype=np.int8) if isinstance(text, str) else np.zeros(0, dtype=np.int8) for text in labels]
+        if scores is None:
+            score_rows = [np.ones(len(row), dtype=np.float32) for row in label_rows]
+        else:
+            score_rows = [np.array(text.split(), dtype=np.float32) if isinstance(text, str) else np.zeros(0, dtype=np.float32) for text in scores]
+        offsets = np.concatenate([[0], np.cumsum([len(row) for row in label_rows])])
+        label_ids = np.concatenate(label_rows) if label_rows else np.zeros(0, dtype=np.int8)
+        flat_scores = np.concatenate(score_rows) if score_rows else np.zeros(0, dtype=np.float32)
+        return cls(offsets, label_ids, flat_scores)
+    
+    @property
+    def num_articles(self):
+        return len(self.offsets) - 1
+    
+    def lengths(self):
+        return np.diff(self.offsets)
+    
+    def to_arrow(self):
+        """List columns (one numeric array per article) for the columnar store"""
+        offsets = pa.array(self.offsets.astype(np.int32))
+        return {
+            "label_ids": pa.ListArray.from_arrays(offsets, pa.array(self.label_ids)),
+            "scores": pa.ListArray.from_arrays(offsets, pa.array(self.scores)),
+        }
+
+
+def article_features(arrays):
+    """Per article counts and scores, vectorized over the flat sentence arrays"""
+    num_articles = arrays.num_articles
+    lengths = arrays.lengths()
+    article_index = np.repeat(np.arange(num_articles), lengths)
+    label_counts = np.bincount(article_index * 3 + arrays.label_ids, minlength=num_articles * 3).reshape(num_articles, 3)
+    polarity = np.zeros(len(arrays.label_ids), dtype=np.float32)
+    polarity[arrays.label_ids == POSITIVE] = 1
+    polarity[arrays.label_ids == NEGATIVE] = -1
+    score_sum = np.bincount(article_index, weights=arrays.scores, minlength=num_articles)
+    signed_score_sum = np.bincount(article_index, weights=arrays.scores * polarity, minlength=num_articles)
+    
+    safe_lengths = np.maximum(lengths, 1)
+    return pd.DataFrame({
+        "sentence_count": lengths.astype(np.int32),
+        "negative_count": label_counts[:, NEGATIVE].astype(np.int32),
+        "positive_count": label_counts[:, POSITIVE].astype(np.int32),
+        "neutral_count": label_counts[:, NEUTRAL].astype(np.int32),
+        "score_sum": score_sum,
+        "signed_score_sum": signed_score_sum,
+        "mean_score": np.where(lengths > 0, score_sum / safe_lengths, np.nan),
+        "net_sentiment": np.where(lengths > 0, (label_counts[:, POSITIVE] - label_counts[:, NEGATIVE]) / safe_lengths, np.nan),
+    })
+
+
+#---- Dates
+def parse_posted_date(posted_dates):
+    """"Ngày đăng 06:24 23/01/2026" -> Timestamp (NaT when the text has no date)"""
+    parts = pd.Series(posted_dates, dtype=object).astype("string").str.extract(r"(\d{1,2}):(\d{2})\s+(\d{1,2})/(\d{1,2})/(\d{4})")
+    parts.columns = ["hour", "minute", "day", "month", "year"]
+    return pd.to_datetime(parts.astype("float64"), errors="coerce")
+
+
+def load_trading_days(history_path=HISTORY_PATH):
+    history = pd.read_csv(history_path, index_col=0)
+    return pd.to_datetime(history["time"]).values.astype("datetime64[D]")
+
+
+def align_to_trading_days(posted_at, trading_days, close_hour=MARKET_CLOSE_HOUR):
+    """First session whose close is after the article; NaT past the last known session"""
+    posted_at = pd.DatetimeIndex(posted_at)
+    effective = posted_at.normalize() + pd.to_timedelta((posted_at.hour >= close_hour).astype(int), unit="D")
+    effective = effective.values.astype("datetime64[D]")
+    positions = np.searchsorted(trading_days, effective, side="left")
+    valid = ~np.isnat(effective) & (positions < len(trading_days))
+    aligned = np.full(len(effective), np.datetime64("NaT"), dtype="datetime64[D]")
+    aligned[valid] = trading_days[positions[valid]]
+    return aligned
+
+
+#---- Aggregator
+class SentimentFeatures():
+    """Incremental article -> trading day sentiment features aligned to history.csv"""
+    def __init__(self, store=None, history_path=HISTORY_PATH, features_dir=FEATURES_DIR, dataset_name="article_sentiment"):
+        self.store = store
+        self.history_path = history_path
+        self.features_dir = features_dir
+        self.dataset_name = dataset_name
+        self.state_path = os.path.join(features_dir, "daily_state.parquet")
+        self.trading_days = load_trading_days(history_path)
+        os.makedirs(features_dir, exist_ok=True)
+        
+        self.state = self.load_state()
+        self.seen_ids = set()
+        if store is not None:
+            self.seen_ids = set(store.read(dataset_name, columns=["article_id"])["article_id"].astype(str))
+    
+    def load_state(self):
+        if os.path.isfile(self.state_path):
+            return pd.read_parquet(self.state_path)
+        return pd.DataFrame({column: pd.Series(dtype=np.float64) for column in STATE_COLUMNS}, index=pd.DatetimeIndex([], name="trading_day"))
+    
+    def save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        self.state.to_parquet(tmp_path)
+        os.replace(tmp_path, self.state_path)
+    
+    def update(self, article_ids, posted_dates, arrays):
+        """Fold newly scored articles into the daily state; articles already seen are ignored"""
+        article_ids = pd.Series(article_ids, dtype=object).astype(str).reset_index(drop=True)
+        features = article_features(arrays)
+        features.insert(0, "article_id", article_ids)
+        features["posted_at"] = parse_posted_date(posted_dates).values
+        features["trading_day"] = pd.to_datetime(align_to_trading_days(features["posted_at"], self.trading_days))
+        
+        keep = (~article_ids.isin(self.seen_ids) & ~article_ids.duplicated()).values
+        if not keep.any():
+            return features.iloc[0:0]
+        features = features[keep].reset_index(drop=True)
+        self.seen_ids.update(features["article_id"])
+        
+        if self.store is not None:
+            #-- Sentence level arrays stay queryable next to the article features
+            kept_arrays = self.subset(arrays, np.flatnonzero(keep))
+            table = pa.Table.from_pandas(features, preserve_index=False)
+            for name, column in kept_arrays.to_arrow().items():
+                table = table.append_column(name, column)
+            self.store.append(self.dataset_name, table)
+        
+        #-- Articles after the last known session wait in the store until history.csv catches up
+        daily = features.dropna(subset=["trading_day"]).assign(article_volume=1, article_net_sum=lambda frame: frame["net_sentiment"].fillna(0))
+        daily = daily.groupby("trading_day")[STATE_COLUMNS].sum()
+        self.state = self.state.add(daily, fill_value=0).sort_index()
+        self.save_state()
+        return features
+    
+    def subset(self, arrays, article_positions):
+        lengths = arrays.lengths()[article_positions]
+        sentence_positions = np.concatenate([np.arange(arrays.offsets[i], arrays.offsets[i + 1]) for i in article_positions]) if len(article_positions) else np.zeros(0, dtype=np.int64)
+        return SentenceArrays(np.concatenate([[0], np.cumsum(lengths)]), arrays.label_ids[sentence_positions], arrays.scores[sentence_positions])
+    
+    def realign(self):
+        """Rebuild the daily state from the stored article features after history.csv gained sessions"""
+        self.trading_days = load_trading_days(self.history_path)
+        articles = self.store.read(self.dataset_name, columns=["article_id", "posted_at"] + STATE_COLUMNS[1:-1] + ["net_sentiment"])
+        articles["trading_day"] = pd.to_datetime(align_to_trading_days(articles["posted_at"], self.trading_days))
+        articles = articles.dropna(subset=["trading_day"]).assign(article_volume=1, article_net_sum=lambda frame: frame["net_sentiment"].fillna(0))
+        self.state = articles.groupby("trading_day")[STATE_COLUMNS].sum().sort_index()
+        self.save_state()
+    
+    def daily_features(self):
+        """history.csv rows joined with the derived daily features (sessions without news get zero volume)"""
+        history = pd.read_csv(self.history_path, index_col=0)
+        history["time"] = pd.to_datetime(history["time"])
+        state = self.state.reindex(pd.DatetimeIndex(history["time"])).fillna(0)
+        sentences = state["sentence_count"].to_numpy()
+        articles = state["article_volume"].to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            features = pd.DataFrame({
+                "article_volume": articles.astype(np.int32),
+                "sentence_count": sentences.astype(np.int32),
+                "negative_count": state["negative_count"].to_numpy().astype(np.int32),
+                "positive_count": state["positive_count"].to_numpy().astype(np.int32),
+                "neutral_count": state["neutral_count"].to_numpy().astype(np.int32),
+                "mean_score": np.where(sentences > 0, state["score_sum"].to_numpy() / sentences, np.nan).astype(np.float32),
+                "mean_signed_score": np.where(sentences > 0, state["signed_score_sum"].to_numpy() / sentences, np.nan).astype(np.float32),
+                "net_sentiment": np.where(sentences > 0, (state["positive_count"].to_numpy() - state["negative_count"].to_numpy()) / sentences, np.nan).astype(np.float32),
+                "mean_article_net": np.where(articles > 0, state["article_net_sum"].to_numpy() / articles, np.nan).astype(np.float32),
+            })
+        return pd.concat([history.reset_index(drop=True), features], axis=1)
+    
+    def write_features(self, path=None):
+        path = path if path is not None else os.path.join(self.features_dir, "daily_sentiment_features.parquet")
+        table = pa.Table.from_pandas(self.daily_features(), preserve_index=False)
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+        return path
+
+
+def score_and_update(df, engine, aggregator, text_column="joined_translated", id_column="Unnamed: 0", date_column="posted_date"):
+    """Score new articles with a FinbertInference engine and fold them in without the label string round trip"""
+    from finbert_inference import split_sentences
+    rows = [split_sentences(text) for text in df[text_column]]
+    arrays = SentenceArrays.from_row_results(engine.score_rows(rows))
+    return aggregator.update(df[id_column], df[date_column], arrays)
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Daily sentiment features aligned to history.csv")
+    parser.add_argument("--labeled-path", default=None, help="label_frame output (labels / scores columns) to fold in")
+    parser.add_argument("--id-column", default="Unnamed: 0")
+    parser.add_argument("--date-column", default="posted_date")
+    parser.add_argument("--realign", action="store_true", help="rebuild the daily state after history.csv was updated")
+    args = parser.parse_args()
+    
+    aggregator = SentimentFeatures(store=CorpusStore())
+    if args.realign:
+        aggregator.realign()
+    if args.labeled_path is not None:
+        labeled_df = pd.read_csv(args.labeled_path)
+        arrays = SentenceArrays.from_label_strings(labeled_df["labels"], labeled_df["scores"] if "scores" in labeled_df else None)
+        new_articles = aggregator.update(labeled_df[args.id_column], labeled_df[args.date_column], arrays)
+        print(f"Folded in {len(new_articles)} new articles")
+    print(f"Features written to {aggregator.write_features()}")
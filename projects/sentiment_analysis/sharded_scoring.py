@@ -0,0 +1,154 @@
+import os
+import glob
+import hashlib
+import argparse
+import multiprocessing
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tqdm import tqdm
+from finbert_inference import CACHE_PATH
+
+
+#---- Defaults
+SHARD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "save", "shards")
+
+#-- One model replica per worker process
+WORKER_ENGINE = None
+
+
+def init_worker(backend, batch_size, max_length, num_threads, cache_path):
+    global WORKER_ENGINE
+    #-- Bound intra-op threads so workers don't oversubscribe the cores
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    import torch
+    torch.set_num_threads(num_threads)
+    
+    from finbert_inference import FinbertInference, backend_model_name
+    pipe = None
+    if backend != "pytorch":
+        from finbert_onnx import load_pipeline
+        pipe = load_pipeline(backend)
+    WORKER_ENGINE = FinbertInference(model_name=backend_model_name(backend), pipe=pipe, batch_size=batch_size, max_length=max_length, cache_path=cache_path)
+
+
+def run_key(texts, backend, text_column, max_length):
+    """Shards are only reused by a run over the same texts with the same scoring settings"""
+    digest = hashlib.sha1(f"{backend}\x00{text_column}\x00{max_length}".encode("utf-8"))
+    for text in texts:
+        digest.update(b"\x00" + str(text).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def get_shard_path(shard_dir, start, end):
+    return os.path.join(shard_dir, f"shard_{start:08d}_{end:08d}.parquet")
+
+
+def score_shard(texts, start, end, shard_path, text_column):
+    from finbert_inference import label_frame
+    shard_df = pd.DataFrame({text_column: texts})
+    shard_df = label_frame(shard_df, WORKER_ENGINE, text_column=text_column)
+    shard_df["row"] = range(start, end)
+    
+    #-- Rename into place so a crash never leaves a half written shard behind
+    tmp_path = shard_path + ".tmp"
+    shard_df[["row", "labels", "scores"]].to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, shard_path)
+    return shard_path
+
+
+#---- Runner
+def run_sharded(
+    df,
+    text_column="joined_translated",
+    shard_dir=SHARD_DIR,
+    shard_size=2000,
+    num_workers=None,
+    threads_per_worker=1,
+    backend="pytorch",
+    batch_size=32,
+    max_length=256,
+    cache_path=CACHE_PATH,
+):
+    """Score row ranges in a process pool; shards already on disk for the same input and settings are not redone"""
+    if num_workers is None:
+        num_workers = max(1, os.cpu_count() // threads_per_worker)
+    
+    texts = df[text_column].tolist()
+    shard_dir = os.path.join(shard_dir, run_key(texts, backend, text_column, max_length))
+    os.makedirs(shard_dir, exist_ok=True)
+    ranges = [(start, min(start+shard_size, len(df))) for start in range(0, len(df), shard_size)]
+    todo = [(start, end) for start, end in ranges if not os.path.isfile(get_shard_path(shard_dir, start, end))]
+    print(f"{len(ranges) - len(todo)}/{len(ranges)} shards already done")
+    
+    if todo:
+        executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(backend, batch_size, max_length, threads_per_worker, cache_path),
+        )
+        with executor:
+            futures = {
+                executor.submit(score_shard, texts[start:end], start, end, get_shard_path(shard_dir, start, end), text_column): (start, end)
+                for start, end in todo
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Shards"):
+                start, end = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Shard {start}-{end} failed, rerun to resume: {e}")
+    return merge_shards(df, ranges, shard_dir)
+
+
+def merge_shards(df, ranges, shard_dir):
+    """Concatenate shards in row order and attach labels / scores to the frame"""
+    missing = [(start, end) for start, end in ranges if not os.path.isfile(get_shard_path(shard_dir, start, end))]
+    if missing:
+        raise RuntimeError(f"{len(missing)} shards missing, first: {missing[0]}")
+    scored = pd.concat([pd.read_parquet(get_shard_path(shard_dir, start, end)) for start, end in ranges], ignore_index=True)
+    scored = scored.sort_values("row").reset_index(drop=True)
+    df = df.reset_index(drop=True).copy()
+    df["labels"] = scored["labels"].values
+    df["scores"] = scored["scores"].values
+    return df
+
+
+def clear_shards(shard_dir=SHARD_DIR):
+    """Every run's shards (one sub directory per run key)"""
+    for path in glob.glob(os.path.join(shard_dir, "**", "shard_*.parquet*"), recursive=True):
+        os.remove(path)
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Sharded multi-process FinBERT scoring")
+    parser.add_argument("data_path")
+    parser.add_argument("save_path")
+    parser.add_argument("--text-column", default="joined_translated")
+    parser.add_argument("--shard-dir", default=SHARD_DIR)
+    parser.add_argument("--shard-size", type=int, default=2000)
+    parser.add_argument("--num-workers", type=int, default=None)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--backend", default="pytorch", choices=["pytorch", "onnx", "onnx-int8"])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--fresh", action="store_true", help="drop shards from a previous run")
+    args = parser.parse_args()
+    
+    if args.fresh:
+        clear_shards(args.shard_dir)
+    df = pd.read_csv(args.data_path)
+    df = run_sharded(
+        df,
+        text_column=args.text_column,
+        shard_dir=args.shard_dir,
+        shard_size=args.shard_size,
+        num_workers=args.num_workers,
+        threads_per_worker=args.threads_per_worker,
+        backend=args.backend,
+        batch_size=args.batch_size,
+        max_length=args.max_length,
+        cache_path=None if args.no_cache else CACHE_PATH,
+    )
+    df.to_csv(args.save_path, index=False)
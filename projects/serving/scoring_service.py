@@ -0,0 +1,310 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import joblib
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web, ClientSession, UnixConnector
+
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT_DIR = os.path.dirname(PROJECTS_DIR)
+sys.path.append(os.path.join(ROOT_DIR, "project_2_training", "preprocessing"))
+sys.path.append(os.path.join(ROOT_DIR, "project_2_training", "inference"))
+sys.path.append(os.path.join(PROJECTS_DIR, "sentiment_analysis"))
+sys.path.append(os.path.join(PROJECTS_DIR, "monitoring"))
+from text_cleaning import preprocess_series
+from metrics import METRICS
+
+
+#---- Default locations
+SAVE_DIR = os.path.join(ROOT_DIR, "project_2_training", "save")
+MODEL_PATH = os.path.join(SAVE_DIR, "random_forest_model.pkl")
+TFIDF_PATH = os.path.join(SAVE_DIR, "tfidf.pkl")
+LINEAR_DIR = os.path.join(SAVE_DIR, "distilled_linear")
+
+#-- Same ids as finbert_inference.LABEL2ID / the training labels
+LABEL2ID = {"negative": 0, "positive": 1, "neutral": 2}
+
+
+#---- Models (built and called on the batcher's own thread)
+class ForestModel():
+    """TF-IDF + RandomForest from train.ipynb / train_search.py, with the training text cleaning"""
+    def __init__(self, model_path=MODEL_PATH, tfidf_path=TFIDF_PATH):
+        self.model = joblib.load(model_path)
+        self.vectorizer = joblib.load(tfidf_path)
+        self.model.n_jobs = 1
+    
+    def predict(self, texts):
+        features = self.vectorizer.transform(preprocess_series(texts).tolist())
+        probabilities = self.model.predict_proba(features)
+        best = probabilities.argmax(axis=1)
+        label_ids = self.model.classes_[best]
+        return [(int(label_id), float(score)) for label_id, score in zip(label_ids, probabilities[np.arange(len(best)), best])]
+
+
+class DistilledModel():
+    """Linear model distilled from the forest (distilled_linear.py), memory mapped"""
+    def __init__(self, linear_dir=LINEAR_DIR, tfidf_path=TFIDF_PATH):
+        from distilled_linear import LinearModel
+        self.model = LinearModel.load(linear_dir)
+        self.vectorizer = joblib.load(tfidf_path)
+    
+    def predict(self, texts):
+        scores = self.model.decision_function(self.vectorizer.transform(preprocess_series(texts).tolist()))
+        probabilities = np.exp(scores - scores.max(axis=1, keepdims=True))
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        label_ids = np.asarray(self.model.classes)[best]
+        return [(int(label_id), float(score)) for label_id, score in zip(label_ids, probabilities[np.arange(len(best)), best])]
+
+
+class FinbertModel():
+    """FinbertInference with its sentence cache; loaded only when the service is started with --finbert"""
+    def __init__(self, batch_size=32, max_length=256):
+        from finbert_inference import FinbertInference
+        self.engine = FinbertInference(batch_size=batch_size, max_length=max_length)
+    
+    def predict(self, texts):
+        results = self.engine.score_sentences(list(texts), show_progress=False)
+        return [(LABEL2ID[label], float(score)) for label, score in results]
+
+
+#---- Metrics
+class LatencyStats():
+    """Rolling request latencies and batch sizes"""
+    def __init__(self, window=10000):
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.failed = 0
+        self.texts = 0
+        self.batches = 0
+    
+    def record_request(self, latency, num_texts, failed=False):
+        self.latencies.append(latency)
+        self.requests += 1
+        self.failed += failed
+        self.texts += num_texts
+    
+    def record_batch(self, batch_size):
+        self.batch_sizes.append(batch_size)
+        self.batches += 1
+    
+    def snapshot(self):
+        latencies_ms = np.array(self.latencies) * 1000
+        batch_sizes = np.array(self.batch_sizes)
+        return {
+            "requests": self.requests,
+            "failed": self.failed,
+            "texts": self.texts,
+            "batches": self.batches,
+            "latency_p50_ms": round(float(np.percentile(latencies_ms, 50)), 2) if len(latencies_ms) else None,
+            "latency_p99_ms": round(float(np.percentile(latencies_ms, 99)), 2) if len(latencies_ms) else None,
+            "batch_size_mean": round(float(batch_sizes.mean()), 2) if len(batch_sizes) else None,
+            "batch_size_p50": float(np.percentile(batch_sizes, 50)) if len(batch_sizes) else None,
+            "batch_size_max": int(batch_sizes.max()) if len(batch_sizes) else None,
+        }
+
+
+#---- Micro batching
+class MicroBatcher():
+    """Collect concurrent requests for up to max_latency_ms (or max_batch_size texts) and score them in one call"""
+    def __init__(self, load_model, max_batch_size=64, max_latency_ms=10, stats=None):
+        self.load_model = load_model
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.stats = stats if stats is not None else LatencyStats()
+        self.queue = asyncio.Queue()
+        
+        #-- One thread owns the model (sqlite caches and sklearn state stay on it)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.model = None
+        self.task = None
+    
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.model = await loop.run_in_executor(self.executor, self.load_model)
+        self.task = asyncio.create_task(self.run())
+    
+    async def score(self, texts):
+        start_time = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((list(texts), future))
+        try:
+            results = await future
+        except BaseException:
+            #-- Model errors and cancelled (disconnected) requests count too, with their latency
+            self.stats.record_request(time.perf_counter() - start_time, len(texts), failed=True)
+            raise
+        self.stats.record_request(time.perf_counter() - start_time, len(texts))
+        return results
+    
+    async def next_batch(self):
+        jobs = [await self.queue.get()]
+        size = len(jobs[0][0])
+        deadline = time.perf_counter() + self.max_latency
+        while size < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                job = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            jobs.append(job)
+            size += len(job[0])
+        return jobs
+    
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = await self.next_batch()
+            texts = [text for job_texts, _ in jobs for text in job_texts]
+            self.stats.record_batch(len(texts))
+            METRICS.gauge("serving.queue_depth", self.queue.qsize())
+            METRICS.observe("serving.batch_size", len(texts))
+            start_time = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self.model.predict, texts)
+                METRICS.timing("serving.batch", time.perf_counter() - start_time, tags={"outcome": "ok"})
+            except Exception as e:
+                METRICS.timing("serving.batch", time.perf_counter() - start_time, tags={"outcome": type(e).__name__})
+                for _, future in jobs:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            offset = 0
+            for job_texts, future in jobs:
+                if not future.done():
+                    future.set_result(results[offset: offset+len(job_texts)])
+                offset += len(job_texts)
+    
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+
+#---- HTTP / Unix socket API
+async def handle_score(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text='body must be a JSON object {"texts": [...], "model": ...}')
+    texts = body.get("texts")
+    model_name = body.get("model", "rf")
+    batchers = request.app["batchers"]
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        raise web.HTTPBadRequest(text="'texts' must be a list of strings")
+    if model_name not in batchers:
+        raise web.HTTPBadRequest(text=f"unknown model '{model_name}', loaded: {sorted(batchers)}")
+    if not texts:
+        return web.json_response({"labels": [], "scores": []})
+    results = await batchers[model_name].score(texts)
+    return web.json_response({
+        "labels": [label_id for label_id, _ in results],
+        "scores": [score for _, score in results],
+    })
+
+
+async def handle_metrics(request):
+    return web.json_response({name: batcher.stats.snapshot() for name, batcher in request.app["batchers"].items()})
+
+
+async def handle_health(request):
+    return web.json_response({"status": "ok", "models": sorted(request.app["batchers"])})
+
+
+def create_app(batchers):
+    """`batchers`: model name -> MicroBatcher, started with the app and closed with it"""
+    app = web.Application()
+    app["batchers"] = batchers
+    
+    async def start_batchers(app):
+        for batcher in app["batchers"].values():
+            await batcher.start()
+    
+    async def close_batchers(app):
+        for batcher in app["batchers"].values():
+            await batcher.close()
+    
+    app.on_startup.append(start_batchers)
+    app.on_cleanup.append(close_batchers)
+    app.router.add_post("/score", handle_score)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/health", handle_health)
+    return app
+
+
+#---- Client (for Airflow tasks / notebooks)
+class ScoringClient():
+    def __init__(self, base_url="http://127.0.0.1:8765", unix_socket=None):
+        self.base_url = "http://localhost" if unix_socket else base_url
+        self.unix_socket = unix_socket
+        self.session = None
+    
+    async def __aenter__(self):
+        connector = UnixConnector(path=self.unix_socket) if self.unix_socket else None
+        self.session = ClientSession(connector=connector)
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+    
+    async def score(self, texts, model="rf"):
+        async with self.session.post(f"{self.base_url}/score", json={"texts": list(texts), "model": model}) as response:
+            response.raise_for_status()
+            body = await response.json()
+        return body["labels"], body["scores"]
+    
+    async def metrics(self):
+        async with self.session.get(f"{self.base_url}/metrics") as response:
+            return await response.json()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Long lived sentiment scoring service with micro batching")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", default=None, help="listen on a Unix socket instead of host:port")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--tfidf-path", default=TFIDF_PATH)
+    parser.add_argument("--distilled", action="store_true", help="also serve the distilled linear model as 'rf-linear'")
+    parser.add_argument("--linear-dir", default=LINEAR_DIR)
+    parser.add_argument("--finbert", action="store_true", help="also load FinBERT")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-latency-ms", type=float, default=10)
+    return parser.parse_args()
+
+
+if __name__=="__main__":
+    args = parse_args()
+    batchers = {
+        "rf": MicroBatcher(
+            lambda: ForestModel(model_path=args.model_path, tfidf_path=args.tfidf_path),
+            max_batch_size=args.max_batch_size,
+            max_latency_ms=args.max_latency_ms,
+        ),
+    }
+    if args.distilled:
+        batchers["rf-linear"] = MicroBatcher(
+            lambda: DistilledModel(linear_dir=args.linear_dir, tfidf_path=args.tfidf_path),
+            max_batch_size=args.max_batch_size,
+            max_latency_ms=args.max_latency_ms,
+        )
+    if args.finbert:
+        batchers["finbert"] = MicroBatcher(FinbertModel, max_batch_size=args.max_batch_size, max_latency_ms=args.max_latency_ms)
+    app = create_app(batchers)
+    if args.unix_socket:
+        web.run_app(app, path=args.unix_socket)
+    else:
+        web.run_app(app, host=args.host, port=args.port)
@@ -0,0 +1,181 @@
+import os
+import glob
+import json
+import uuid
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+from datetime import date, datetime
+from tqdm import tqdm
+
+
+#---- Default locations
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_DIR = os.path.join(PROJECTS_DIR, "data", "corpus")
+
+#-- Hive style partition key, kept as an ISO string so range filters compare lexicographically
+PARTITION_KEY = "crawl_date"
+PARTITIONING = ds.partitioning(pa.schema([(PARTITION_KEY, pa.string())]), flavor="hive")
+
+
+def to_date_str(value):
+    if value is None:
+        return date.today().isoformat()
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
+
+
+#---- Store
+class CorpusStore():
+    """Append-only Parquet datasets (news_urls, news_contents, translations, ...) partitioned by crawl date"""
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+    
+    def dataset_dir(self, name):
+        return os.path.join(self.root, name)
+    
+    def partition_dir(self, name, crawl_date):
+        return os.path.join(self.dataset_dir(name), f"{PARTITION_KEY}={to_date_str(crawl_date)}")
+    
+    def append(self, name, records, crawl_date=None):
+        """Write records (list of dicts, DataFrame or Arrow table) as a new file in the crawl date partition"""
+        if isinstance(records, pa.Table):
+            table = records
+        elif isinstance(records, pd.DataFrame):
+            table = pa.Table.from_pandas(records, preserve_index=False)
+        else:
+            if not records:
+                return None
+            table = pa.Table.from_pylist(records)
+        if PARTITION_KEY in table.column_names:
+            table = table.drop([PARTITION_KEY])
+        
+        partition_dir = self.partition_dir(name, crawl_date)
+        os.makedirs(partition_dir, exist_ok=True)
+        file_name = f"part-{datetime.now().strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+        path = os.path.join(partition_dir, file_name)
+        
+        #-- Write to a temp name first so readers never see half written files
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+        return path
+    
+    def dataset(self, name):
+        return ds.dataset(self.dataset_dir(name), format="parquet", partitioning=PARTITIONING)
+    
+    def read(self, name, columns=None, start_date=None, end_date=None):
+        """Load selected columns for an inclusive crawl date range"""
+        if not os.path.isdir(self.dataset_dir(name)):
+            return pd.DataFrame(columns=columns)
+        filter_expression = None
+        if start_date is not None:
+            filter_expression = ds.field(PARTITION_KEY) >= to_date_str(start_date)
+        if end_date is not None:
+            end_expression = ds.field(PARTITION_KEY) <= to_date_str(end_date)
+            filter_expression = end_expression if filter_expression is None else filter_expression & end_expression
+        table = self.dataset(name).to_table(columns=columns, filter=filter_expression)
+        return table.to_pandas()
+    
+    def compact(self, name, crawl_date):
+        """Merge the small files appended during a crawl day into one"""
+        partition_dir = self.partition_dir(name, crawl_date)
+        part_paths = sorted(glob.glob(os.path.join(partition_dir, "part-*.parquet")))
+        if len(part_paths) < 2:
+            return
+        table = pa.concat_tables([pq.read_table(path) for path in part_paths], promote_options="default")
+        self.append(name, table.to_pandas(), crawl_date=crawl_date)
+        for path in part_paths:
+            os.remove(path)
+
+
+class BufferedWriter():
+    """Collect streamed records and append them to the store in chunks"""
+    def __init__(self, store, name, flush_every=500, crawl_date=None):
+        self.store = store
+        self.name = name
+        self.flush_every = flush_every
+        self.crawl_date = crawl_date
+        self.buffer = []
+    
+    def write(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+    
+    def flush(self):
+        if self.buffer:
+            self.store.append(self.name, self.buffer, crawl_date=self.crawl_date)
+            self.buffer = []
+    
+    def close(self):
+        self.flush()
+
+
+#---- Legacy migration (per page JSON / per row .npy)
+def file_date(path):
+    return datetime.fromtimestamp(os.path.getmtime(path)).date()
+
+
+def get_file_id(path, template):
+    return os.path.basename(path).split(".")[0].replace(template, "")
+
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def load_npy(path):
+    npy_file = np.load(path, allow_pickle=True)
+    if hasattr(npy_file, 'item') and npy_file.size == 1:
+        return npy_file.item()
+    return npy_file
+
+
+def migrate_json_pages(store, name, json_dir, template):
+    records_by_date = {}
+    for path in tqdm(glob.glob(os.path.join(json_dir, "*.json")), desc=name):
+        page_id = get_file_id(path, template)
+        records = records_by_date.setdefault(file_date(path), [])
+        for item in load_json(path):
+            records.append({"page_id": page_id, **item})
+    for crawl_date, records in records_by_date.items():
+        store.append(name, records, crawl_date=crawl_date)
+
+
+def migrate_translations(store, translation_dir):
+    records_by_date = {}
+    for path in tqdm(glob.glob(os.path.join(translation_dir, "*.npy")), desc="translations"):
+        translation_dict = load_npy(path)
+        records_by_date.setdefault(file_date(path), []).append({
+            "row_id": int(get_file_id(path, "")),
+            "translated": [value if isinstance(value, str) else None for value in translation_dict.values()],
+        })
+    for crawl_date, records in records_by_date.items():
+        store.append("translations", records, crawl_date=crawl_date)
+
+
+def migrate_legacy(store):
+    crawl_dir = os.path.join(PROJECTS_DIR, "newest_crawl")
+    migrate_json_pages(store, "news_urls", os.path.join(crawl_dir, "save_news_urls"), "all_news_item_")
+    migrate_json_pages(store, "news_contents", os.path.join(crawl_dir, "save_news_contents"), "all_news_content_")
+    migrate_translations(store, os.path.join(PROJECTS_DIR, "data", "save_translation"))
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Columnar corpus store")
+    parser.add_argument("--root", default=STORE_DIR)
+    parser.add_argument("--migrate", action="store_true", help="convert the per page JSON and per row .npy files")
+    args = parser.parse_args()
+    
+    store = CorpusStore(root=args.root)
+    if args.migrate:
+        migrate_legacy(store)
+    for name in sorted(os.listdir(store.root)):
+        print(name, store.dataset(name).count_rows())